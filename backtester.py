@@ -0,0 +1,406 @@
+import argparse
+import heapq
+import itertools
+import numpy as np
+from tabulate import tabulate
+from data_manager import DataManager
+from order_book import LocalOrderBook, OrderBookOutOfSync
+from order_manager import diff_quotes
+from recorder import SNAPSHOT, TOP_OF_BOOK_EVENT, MarketDataReader
+
+# Fill record layout
+FILL_DTYPE = np.dtype([
+    ("ts", "<i8"),
+    ("side", "i1"),  # +1 buy, -1 sell
+    ("price", "<f8"),
+    ("qty", "<f8"),
+    ("fee", "<f8"),  # In quote currency
+    ("maker", "?"),
+])
+
+
+def run_sync(coroutine):
+    """
+    Run a coroutine that never actually suspends, without an event loop.
+
+    Strategies written for the live OrderGateway are async, but against the
+    simulated order manager nothing they await ever blocks, so driving them
+    directly avoids the per-tick cost of scheduling them on a loop.
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError("Strategy awaited something the backtester cannot simulate")
+
+
+class SimulatedOrderManager:
+    """
+    Stand-in for AsyncOrderManager that sends orders to a SimulatedExchange.
+
+    Orders are kept in the REST layout so strategies and diff_quotes treat them
+    exactly like live ones. Methods are async for interface compatibility but
+    complete without suspending.
+    """
+
+    def __init__(self, exchange, pair, tick_size=None, step_size=None):
+        self.exchange = exchange
+        self.pair = pair
+        self.tick_size = tick_size
+        self.step_size = step_size
+        self.active_orders = {}  # Track active orders by their IDs
+
+    async def place_order(self, side: str, price: float, order_size: float):
+        order = self.exchange.submit(self, side, price, order_size)
+        self.active_orders[order["orderId"]] = order
+        return order
+
+    async def cancel_order(self, order_id):
+        order = self.active_orders.pop(order_id, None)
+        if order is not None:
+            self.exchange.cancel(order)
+        return order
+
+    async def replace_order(self, order_id, side: str, price: float, order_size: float):
+        await self.cancel_order(order_id)
+        return await self.place_order(side, price, order_size)
+
+    async def cancel_all_orders(self):
+        orders = list(self.active_orders.values())
+        for order in orders:
+            self.exchange.cancel(order)
+        self.active_orders.clear()
+        return orders
+
+    async def sync_quotes(self, desired_quotes):
+        replace, place, cancel = diff_quotes(list(self.active_orders.values()), desired_quotes, self.tick_size, self.step_size)
+        results = [await self.replace_order(order["orderId"], *quote) for order, quote in replace]
+        results += [await self.place_order(*quote) for quote in place]
+        results += [await self.cancel_order(order["orderId"]) for order in cancel]
+        return results
+
+    async def get_active_orders(self):
+        return list(self.active_orders.values())
+
+
+class SimulatedExchange:
+    """
+    Matches a strategy's limit orders against recorded market data.
+
+    Latency: new orders and cancels reach the exchange `latency` seconds after
+    they are sent; until then an order cannot fill, and a cancelled order can
+    still fill.
+
+    Queue position: an order joins the back of its price level, behind the
+    quantity visible there when it arrives. Decreases in that level's quantity
+    are assumed to come from ahead of the order (cancels and trades), so the
+    order fills once the decreases exceed the quantity that was ahead of it.
+    An order fills in full as soon as the opposite best price trades through
+    it, and an order that is marketable on arrival fills at once as taker at
+    the opposite best price.
+    """
+
+    def __init__(self, latency=0.005, maker_fee=0.001, taker_fee=0.001):
+        """
+        Args:
+            latency (float or callable): Order entry latency in seconds, or a function returning one per order.
+            maker_fee (float): Fee rate on passive fills (negative for a rebate).
+            taker_fee (float): Fee rate on fills that cross the spread.
+        """
+        self.latency = latency
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.now = 0  # Current time, ns
+        self.book = LocalOrderBook()
+        self.best_bid = self.best_ask = None
+        self.position = 0.0
+        self.cash = 0.0
+        self.fills = []
+        self._pending = []  # Heap of (arrival ts, seq, action, order)
+        self._live = {}  # Order ID -> order resting on the simulated book
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+
+    def _arrival(self):
+        latency = self.latency() if callable(self.latency) else self.latency
+        return self.now + int(latency * 1e9)
+
+    def submit(self, order_manager, side, price, qty):
+        """Send a new limit order; returns it in the REST layout."""
+        order = {
+            "symbol": order_manager.pair,
+            "orderId": next(self._ids),
+            "price": price,
+            "origQty": qty,
+            "executedQty": 0.0,
+            "side": side,
+            "type": "LIMIT",
+            "timeInForce": "GTC",
+            "status": "PENDING_NEW",
+            "_manager": order_manager,
+            "_queue_ahead": 0.0,
+            "_level_qty": 0.0,
+        }
+        heapq.heappush(self._pending, (self._arrival(), next(self._seq), "new", order))
+        return order
+
+    def cancel(self, order):
+        """Send a cancel for an order."""
+        heapq.heappush(self._pending, (self._arrival(), next(self._seq), "cancel", order))
+
+    def advance(self, ts):
+        """Move the clock to ts, letting requests that have arrived by then take effect."""
+        self.now = ts
+        while self._pending and self._pending[0][0] <= ts:
+            _, _, action, order = heapq.heappop(self._pending)
+            if action == "cancel":
+                self._live.pop(order["orderId"], None)
+                if order["status"] != "FILLED":
+                    order["status"] = "CANCELED"
+            elif order["status"] == "PENDING_NEW":
+                self._arrive(order)
+
+    def _arrive(self, order):
+        order["status"] = "NEW"
+        price, is_buy = order["price"], order["side"] == "BUY"
+        opposite = self.best_ask if is_buy else self.best_bid
+        if opposite is not None and (price >= opposite if is_buy else price <= opposite):
+            self._fill(order, order["origQty"], opposite, maker=False)
+            return
+        side = self.book.bids if is_buy else self.book.asks
+        order["_level_qty"] = order["_queue_ahead"] = side.qty_at(price)
+        self._live[order["orderId"]] = order
+
+    def on_top_of_book(self, best_bid, best_ask):
+        """Fill live orders the market has traded through."""
+        self.best_bid, self.best_ask = best_bid, best_ask
+        if not self._live:
+            return
+        for order in list(self._live.values()):
+            if order["side"] == "BUY" and best_ask < order["price"] or \
+                    order["side"] == "SELL" and best_bid > order["price"]:
+                self._fill(order, order["origQty"] - order["executedQty"], order["price"], maker=True)
+
+    def on_depth(self):
+        """Advance queue positions from the change in each order's price level."""
+        for order in list(self._live.values()):
+            side = self.book.bids if order["side"] == "BUY" else self.book.asks
+            level_qty = side.qty_at(order["price"])
+            decrease = order["_level_qty"] - level_qty
+            order["_level_qty"] = level_qty
+            if decrease <= 0:
+                continue
+            if decrease <= order["_queue_ahead"]:
+                order["_queue_ahead"] -= decrease
+                continue
+            filled = decrease - order["_queue_ahead"]
+            order["_queue_ahead"] = 0.0
+            self._fill(order, min(filled, order["origQty"] - order["executedQty"]), order["price"], maker=True)
+
+    def _fill(self, order, qty, price, maker):
+        if qty <= 0:
+            return
+        sign = 1 if order["side"] == "BUY" else -1
+        fee = qty * price * (self.maker_fee if maker else self.taker_fee)
+        self.position += sign * qty
+        self.cash -= sign * qty * price + fee
+        self.fills.append((self.now, sign, price, qty, fee, maker))
+        order["executedQty"] += qty
+        if order["executedQty"] >= order["origQty"] - 1e-12:
+            order["status"] = "FILLED"
+            self._live.pop(order["orderId"], None)
+            order["_manager"].active_orders.pop(order["orderId"], None)
+        else:
+            order["status"] = "PARTIALLY_FILLED"
+
+
+class SimulatedSession:
+    """Stand-in for TradingSession backed by a SimulatedExchange."""
+
+    def __init__(self, exchange, filters):
+        """
+        Args:
+            exchange (SimulatedExchange): Where orders are sent.
+            filters (dict): What TradingSession.get_filters would return (at least tick_size).
+        """
+        self.exchange = exchange
+        self.filters = filters
+        self.order_managers = {}
+
+    def order_manager(self, symbol):
+        if symbol not in self.order_managers:
+            self.order_managers[symbol] = SimulatedOrderManager(
+                self.exchange, symbol, self.filters.get("tick_size"), self.filters.get("step_size")
+            )
+        return self.order_managers[symbol]
+
+    def get_filters(self, symbol):
+        return self.filters
+
+    def get_position(self, symbol):
+        """Return the simulated position in the TradingSession layout."""
+        return {
+            "base": {"free": self.exchange.position, "locked": 0},
+            "quote": {"free": self.exchange.cash, "locked": 0},
+        }
+
+    def get_active_orders(self, symbol):
+        return list(self.order_manager(symbol).active_orders.values())
+
+
+class BacktestResult:
+    """Fills and mid prices of a backtest, with vectorized PnL and inventory."""
+
+    def __init__(self, fills, mid_ts, mids, events):
+        self.fills = fills  # FILL_DTYPE array
+        self.mid_ts = mid_ts
+        self.mids = mids
+        self.events = events
+
+    def curves(self):
+        """Return (ts, inventory, pnl) marked to the mid price at every top-of-book update."""
+        signed_qty = self.fills["side"] * self.fills["qty"]
+        inventory = np.cumsum(signed_qty)
+        cash = np.cumsum(-signed_qty * self.fills["price"] - self.fills["fee"])
+        # Number of fills that happened at or before each mid sample
+        n = np.searchsorted(self.fills["ts"], self.mid_ts, side="right")
+        inventory_at = np.where(n > 0, inventory[np.maximum(n - 1, 0)], 0.0) if len(inventory) else np.zeros(len(n))
+        cash_at = np.where(n > 0, cash[np.maximum(n - 1, 0)], 0.0) if len(cash) else np.zeros(len(n))
+        return self.mid_ts, inventory_at, cash_at + inventory_at * self.mids
+
+    def summary(self):
+        """Return the headline statistics as a dict."""
+        _, inventory, pnl = self.curves()
+        drawdown = np.maximum.accumulate(pnl) - pnl if len(pnl) else np.zeros(1)
+        return {
+            "events": self.events,
+            "fills": len(self.fills),
+            "maker_fills": int(self.fills["maker"].sum()),
+            "volume": float((self.fills["qty"] * self.fills["price"]).sum()),
+            "fees": float(self.fills["fee"].sum()),
+            "final_inventory": float(inventory[-1]) if len(inventory) else 0.0,
+            "max_abs_inventory": float(np.abs(inventory).max()) if len(inventory) else 0.0,
+            "pnl": float(pnl[-1]) if len(pnl) else 0.0,
+            "max_drawdown": float(drawdown.max()),
+        }
+
+    def report(self):
+        """Return the summary as a text table."""
+        return tabulate(self.summary().items(), headers=["Metric", "Value"], tablefmt="grid")
+
+
+class Backtester:
+    """
+    Replays a recording through a DataManager into a submit_orders-style strategy.
+
+    Market data is read straight from the memory-mapped recording and the
+    strategy is called synchronously on every top-of-book update, against a
+    SimulatedSession, so a run is deterministic and needs no event loop.
+    """
+
+    def __init__(self, reader, make_strategy, filters, latency=0.005, maker_fee=0.001, taker_fee=0.001,
+                 start=None, end=None):
+        """
+        Args:
+            reader (MarketDataReader): The recording to replay.
+            make_strategy (callable): Called with the SimulatedSession, returns the
+                strategy coroutine function, e.g. lambda s: make_submit_orders(s, verbose=False).
+            filters (dict): Symbol filters for the session (at least tick_size).
+            latency (float or callable): Order entry latency, see SimulatedExchange.
+            maker_fee (float): Fee rate on passive fills.
+            taker_fee (float): Fee rate on aggressive fills.
+            start (int, optional): First timestamp to replay, ns since the epoch.
+            end (int, optional): Timestamp to stop before, ns since the epoch.
+        """
+        self.reader = reader
+        self.start = start
+        self.end = end
+        self.exchange = SimulatedExchange(latency, maker_fee, taker_fee)
+        self.exchange.book.symbol = reader.symbol
+        self.session = SimulatedSession(self.exchange, filters)
+        self.strategy = make_strategy(self.session)
+        self.data_manager = DataManager()
+        self.data_manager.register_recorder(self)
+
+    # DataManager recorder interface: called synchronously on every update
+    def on_top_of_book(self, top_of_book):
+        self.exchange.on_top_of_book(top_of_book.best_bid_price, top_of_book.best_ask_price)
+        run_sync(self.strategy(top_of_book, self.data_manager.order_book_depth))
+
+    def on_order_book_depth(self, order_book_depth):
+        self.exchange.on_depth()
+
+    def run(self):
+        """Run the backtest and return a BacktestResult."""
+        book = self.exchange.book
+        start = self.start
+        # Depth diffs need a book to apply to, so rebuild it from the last snapshot before start, as replay does
+        depth_start = start if start is None else (self.reader.last_snapshot_time(start) or start)
+        events = heapq.merge(
+            ((ts, TOP_OF_BOOK_EVENT, update) for ts, update in self.reader.book_ticker_events(start, self.end)),
+            self.reader.depth_events(depth_start, self.end),
+            key=lambda item: item[0],
+        )
+        mid_ts, mids = [], []
+        count = 0
+        for ts, kind, payload in events:
+            if start is not None and ts < start:
+                # Catching the book up to start; the strategy and the exchange see nothing yet
+                if kind == SNAPSHOT:
+                    book.load_snapshot(payload)
+                elif book.last_update_id is not None:
+                    try:
+                        book.apply_update(payload)
+                    except OrderBookOutOfSync:
+                        book.clear()
+                continue
+            self.exchange.advance(ts)
+            count += 1
+            if kind == TOP_OF_BOOK_EVENT:
+                mid_ts.append(ts)
+                mids.append((payload.best_bid_price + payload.best_ask_price) / 2)
+                self.data_manager.update_top_of_book(payload)
+                continue
+            if kind == SNAPSHOT:
+                book.load_snapshot(payload)
+            elif book.last_update_id is None:
+                continue
+            else:
+                try:
+                    if not book.apply_update(payload):
+                        continue
+                except OrderBookOutOfSync:
+                    book.clear()
+                    continue
+            self.data_manager.update_order_book_depth(book)
+
+        fills = np.array(self.exchange.fills, dtype=FILL_DTYPE)
+        return BacktestResult(fills, np.array(mid_ts, dtype=np.int64), np.array(mids), count)
+
+
+def main():
+    from market_maker import DESIRED_ORDER_SIZE, SPREAD, make_submit_orders
+
+    parser = argparse.ArgumentParser(description="Backtest the market maker on recorded data")
+    parser.add_argument("--data", required=True, help="Recording directory (see terminal_view.py --record)")
+    parser.add_argument("--pair", required=True, help="Trading pair to backtest (e.g., DOGEUSDT)")
+    parser.add_argument("--tick-size", type=float, required=True, help="Price tick size of the pair")
+    parser.add_argument("--order-size", type=float, default=DESIRED_ORDER_SIZE, help="Size quoted on each side")
+    parser.add_argument("--spread", type=float, default=SPREAD, help="Minimum quoted spread as a fraction of mid")
+    parser.add_argument("--latency", type=float, default=0.005, help="Order entry latency in seconds")
+    parser.add_argument("--maker-fee", type=float, default=0.001, help="Maker fee rate")
+    parser.add_argument("--taker-fee", type=float, default=0.001, help="Taker fee rate")
+    args = parser.parse_args()
+
+    backtester = Backtester(
+        MarketDataReader(args.data, args.pair),
+        lambda session: make_submit_orders(session, args.order_size, args.spread, verbose=False),
+        {"tick_size": args.tick_size},
+        latency=args.latency, maker_fee=args.maker_fee, taker_fee=args.taker_fee,
+    )
+    print(backtester.run().report())
+
+
+if __name__ == "__main__":
+    main()
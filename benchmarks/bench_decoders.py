@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from tabulate import tabulate
+
+# Add the root directory to the Python module path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from decoders import BACKENDS, BookTickerDecoder, DepthDecoder, get_loads
+
+
+def synthetic_frames(count, levels=20):
+    """Generate bookTicker and depth frames shaped like Binance's."""
+    book_ticker, depth = [], []
+    price = 30000.0
+    for i in range(count):
+        price += random.uniform(-1, 1)
+        book_ticker.append(json.dumps({
+            "u": i, "s": "BTCUSDT",
+            "b": f"{price:.2f}", "B": f"{random.uniform(0, 5):.8f}",
+            "a": f"{price + 0.01:.2f}", "A": f"{random.uniform(0, 5):.8f}",
+        }).encode())
+        depth.append(json.dumps({
+            "e": "depthUpdate", "E": i, "s": "BTCUSDT", "U": i * 10, "u": i * 10 + 9,
+            "b": [[f"{price - j * 0.01:.2f}", f"{random.uniform(0, 5):.8f}"] for j in range(levels)],
+            "a": [[f"{price + 0.01 + j * 0.01:.2f}", f"{random.uniform(0, 5):.8f}"] for j in range(levels)],
+        }).encode())
+    return book_ticker, depth
+
+
+def load_frames(path):
+    """Load recorded raw frames (one JSON message per line), split by stream type."""
+    book_ticker, depth = [], []
+    with open(path, "rb") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            if b'"depthUpdate"' in line:
+                depth.append(line)
+            else:
+                book_ticker.append(line)
+    return book_ticker, depth
+
+
+def baseline_book_ticker(frame):
+    """The original stdlib path: json.loads then a dict of floats."""
+    data = json.loads(frame)
+    return {
+        "best_bid_price": float(data["b"]),
+        "best_bid_qty": float(data["B"]),
+        "best_ask_price": float(data["a"]),
+        "best_ask_qty": float(data["A"]),
+    }
+
+
+def baseline_depth(frame):
+    """The original stdlib path: json.loads then fresh lists of floats per level."""
+    data = json.loads(frame)
+    return {
+        "bids": [[float(bid[0]), float(bid[1])] for bid in data["b"]],
+        "asks": [[float(ask[0]), float(ask[1])] for ask in data["a"]],
+    }
+
+
+def time_decoder(decode, frames, repeat):
+    """Return the best per-frame decode time in microseconds over several passes."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for frame in frames:
+            decode(frame)
+        best = min(best, time.perf_counter() - start)
+    return best / len(frames) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare websocket frame decoders")
+    parser.add_argument("--frames", help="File of recorded raw frames, one per line (synthetic if omitted)")
+    parser.add_argument("--count", type=int, default=20000, help="Number of synthetic frames per stream")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing passes per decoder")
+    args = parser.parse_args()
+
+    if args.frames:
+        book_ticker, depth = load_frames(args.frames)
+    else:
+        book_ticker, depth = synthetic_frames(args.count)
+
+    rows = [[
+        "baseline",
+        "-", f"{time_decoder(baseline_book_ticker, book_ticker, args.repeat):.2f}" if book_ticker else "-",
+        "-", f"{time_decoder(baseline_depth, depth, args.repeat):.2f}" if depth else "-",
+    ]]
+    for backend in BACKENDS:
+        row = [backend]
+        for frames, schema_decoder in ((book_ticker, BookTickerDecoder(backend)), (depth, DepthDecoder(backend))):
+            if frames:
+                row.append(f"{time_decoder(get_loads(backend), frames, args.repeat):.2f}")
+                row.append(f"{time_decoder(schema_decoder.decode, frames, args.repeat):.2f}")
+            else:
+                row += ["-", "-"]
+        rows.append(row)
+
+    print(f"{len(book_ticker)} bookTicker frames, {len(depth)} depth frames (us per frame, best of {args.repeat})")
+    print(tabulate(
+        rows,
+        headers=["Backend", "bookTicker loads", "bookTicker decoded", "depth loads", "depth decoded"],
+        tablefmt="grid",
+    ))
+
+
+if __name__ == "__main__":
+    main()
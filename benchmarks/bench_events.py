@@ -0,0 +1,149 @@
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+from tabulate import tabulate
+
+# Add the root directory to the Python module path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from bench_decoders import load_frames, synthetic_frames, time_decoder
+from decoders import BookTickerDecoder, DepthDecoder, TradeDecoder, get_loads
+
+
+def synthetic_trades(count):
+    """Generate @trade frames shaped like Binance's."""
+    frames = []
+    price = 30000.0
+    for i in range(count):
+        price += random.uniform(-1, 1)
+        frames.append(json.dumps({
+            "e": "trade", "E": i, "s": "BTCUSDT", "t": i,
+            "p": f"{price:.2f}", "q": f"{random.uniform(0, 5):.8f}", "T": i, "m": i % 2 == 0, "M": True,
+        }).encode())
+    return frames
+
+
+def dict_decoders():
+    """The previous event layout: a fresh dict per message, floats parsed from the generic decode."""
+    loads = get_loads()
+    depth = DepthDecoder()
+
+    def book_ticker(frame):
+        data = loads(frame)
+        return {
+            "symbol": data["s"],
+            "update_id": data["u"],
+            "best_bid_price": float(data["b"]),
+            "best_bid_qty": float(data["B"]),
+            "best_ask_price": float(data["a"]),
+            "best_ask_qty": float(data["A"]),
+        }
+
+    def trade(frame):
+        data = loads(frame)
+        return {
+            "symbol": data["s"],
+            "trade_id": data["t"],
+            "price": float(data["p"]),
+            "qty": float(data["q"]),
+            "trade_time": data["T"],
+            "is_buyer_maker": data["m"],
+            "event_time": data["E"],
+        }
+
+    def depth_update(frame):
+        # Same level buffers as DepthDecoder, wrapped in a new dict each time
+        event = depth.decode(frame)
+        return {
+            "e": "depthUpdate", "E": event.event_time, "s": event.symbol,
+            "U": event.first_update_id, "u": event.final_update_id, "b": event.bids, "a": event.asks,
+        }
+
+    return book_ticker, trade, depth_update
+
+
+def allocations(decode, frames):
+    """
+    Return (retained bytes, retained allocations) per event while every event is kept.
+
+    Reused events (DepthDecoder) only count what each call leaves behind.
+    """
+    kept = [None] * len(frames)
+    gc.collect()
+    gc.disable()
+    try:
+        tracemalloc.start()
+        blocks = sys.getallocatedblocks()
+        start = tracemalloc.get_traced_memory()[0]
+        for i, frame in enumerate(frames):
+            kept[i] = decode(frame)
+        retained = tracemalloc.get_traced_memory()[0] - start
+        blocks = sys.getallocatedblocks() - blocks
+        tracemalloc.stop()
+    finally:
+        gc.enable()
+    n = len(frames)
+    return retained / n, blocks / n
+
+
+def peak_bytes(decode, frames):
+    """Return the mean peak of transient allocation while one message is decoded and dropped."""
+    total = 0
+    tracemalloc.start()
+    for frame in frames:
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        decode(frame)
+        total += tracemalloc.get_traced_memory()[1] - start
+    tracemalloc.stop()
+    return total / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-message allocations of dict and typed market data events")
+    parser.add_argument("--frames", help="File of recorded raw frames, one per line (synthetic if omitted)")
+    parser.add_argument("--count", type=int, default=20000, help="Number of synthetic frames per stream")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing passes per decoder")
+    args = parser.parse_args()
+
+    if args.frames:
+        book_ticker, depth = load_frames(args.frames)
+        trades = []
+    else:
+        book_ticker, depth = synthetic_frames(args.count)
+        trades = synthetic_trades(args.count)
+
+    dict_book_ticker, dict_trade, dict_depth = dict_decoders()
+    streams = [
+        ("bookTicker", book_ticker, dict_book_ticker, BookTickerDecoder().decode),
+        ("trade", trades, dict_trade, TradeDecoder().decode),
+        ("depth", depth, dict_depth, DepthDecoder().decode),
+    ]
+    rows = []
+    for stream, frames, *decoders in streams:
+        if not frames:
+            continue
+        for layout, decode in zip(("dict", "typed"), decoders):
+            retained, blocks = allocations(decode, frames)
+            rows.append([
+                stream, layout,
+                f"{time_decoder(decode, frames, args.repeat):.2f}",
+                f"{retained:.0f}", f"{blocks:.1f}",
+                f"{peak_bytes(decode, frames[:2000]):.0f}",
+            ])
+
+    print(f"{len(book_ticker)} bookTicker, {len(trades)} trade and {len(depth)} depth frames, "
+          f"every event kept (us per frame best of {args.repeat})")
+    print(tabulate(
+        rows,
+        headers=["Stream", "Events", "Decode us", "Retained B", "Retained allocs", "Peak B"],
+        tablefmt="grid",
+    ))
+
+
+if __name__ == "__main__":
+    main()
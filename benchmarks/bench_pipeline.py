@@ -0,0 +1,562 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import re
+import sys
+import time
+import aiohttp
+import psutil
+import websockets
+from aiohttp import web
+from tabulate import tabulate
+
+# Add the root directory (and the web backend) to the Python module path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "web", "backend"))
+
+from bench_decoders import load_frames, synthetic_frames
+from data_manager import DataManager
+from latency import LatencyHistogram, tracker
+from stream_multiplexer import StreamMultiplexer
+from streamers import stream_book_ticker, stream_depth
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "bench_pipeline.json")
+
+# The bid quantity of every bookTicker frame is overwritten with its send time in
+# microseconds since the epoch (exact in a float64), so any stage that sees the
+# top of book can measure end-to-end latency across processes.
+STAMP_FIELD = re.compile(rb'"B":\s*"[^"]*"')
+
+# Metrics compared against the baseline, and whether higher is better
+METRICS = {
+    "msgs_per_sec": True,
+    "client_msgs_per_sec": True,
+    "cpu_us_per_msg": False,
+    "rss_mb": False,
+    "p50_us": False,
+    "p99_us": False,
+}
+# Stages whose timestamps come from the (synthetic) exchange clock, not ours
+SKIPPED_STAGES = {"exchange_to_receive"}
+
+
+def stamp_latency_ns(stamped_qty):
+    """Return the time since a stamped bookTicker frame was sent, in nanoseconds."""
+    return time.time_ns() - int(stamped_qty) * 1000
+
+
+class FrameServer:
+    """
+    Stands in for Binance: replays frames over raw and combined websocket streams.
+
+    Every connection gets the full sequence from the start once /start is
+    posted, so connections can be opened before the clock starts, and the
+    depth snapshot served over REST always lines up with the replay.
+    """
+
+    def __init__(self, book_ticker, depth, rate=0):
+        """
+        Args:
+            book_ticker (list): Raw bookTicker frames.
+            depth (list): Raw depthUpdate frames, with consecutive update IDs.
+            rate (float): Frames per second per connection, 0 for as fast as possible.
+        """
+        self.templates = []
+        for frame in book_ticker:
+            match = STAMP_FIELD.search(frame)
+            self.templates.append((frame[:match.start()], frame[match.end():]))
+        self.depth = depth
+        self.rate = rate
+        first_update = json.loads(depth[0])["U"] if depth else 1
+        self.snapshot = {"lastUpdateId": first_update - 1, "bids": [], "asks": []}
+        self.connections = 0
+        self.started = asyncio.Event()
+
+    def _book_ticker_frames(self):
+        for prefix, suffix in self.templates:
+            yield prefix + b'"B":"%d"' % (time.time_ns() // 1000) + suffix
+
+    async def _send(self, websocket, frames):
+        await self.started.wait()
+        interval = 1 / self.rate if self.rate else 0
+        next_time = time.perf_counter()
+        for i, frame in enumerate(frames):
+            if interval:
+                next_time += interval
+                await asyncio.sleep(max(next_time - time.perf_counter(), 0))
+            elif i % 100 == 0:
+                await asyncio.sleep(0)  # Let the other connections send too
+            await websocket.send_str(frame.decode())
+
+    async def _serve(self, request, frames):
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        self.connections += 1
+        sender = asyncio.create_task(self._send(websocket, frames))
+        try:
+            async for message in websocket:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    # Acknowledge SUBSCRIBE/UNSUBSCRIBE control messages
+                    control = json.loads(message.data)
+                    await websocket.send_str(json.dumps({"result": None, "id": control.get("id")}))
+        finally:
+            sender.cancel()
+            self.connections -= 1
+        return websocket
+
+    async def _raw_stream(self, request):
+        stream = request.match_info["stream"]
+        frames = self._book_ticker_frames() if "@bookTicker" in stream else iter(self.depth)
+        return await self._serve(request, frames)
+
+    async def _combined_stream(self, request):
+        streams = request.query.get("streams", "").split("/")
+        book_ticker = next((s for s in streams if "@bookTicker" in s), None)
+        depth = next((s for s in streams if "@depth" in s), None)
+
+        def frames():
+            for ticker, update in itertools.zip_longest(self._book_ticker_frames(), self.depth):
+                if ticker is not None and book_ticker:
+                    yield b'{"stream":"%s","data":%s}' % (book_ticker.encode(), ticker)
+                if update is not None and depth:
+                    yield b'{"stream":"%s","data":%s}' % (depth.encode(), update)
+
+        return await self._serve(request, frames())
+
+    async def _depth_snapshot(self, request):
+        return web.json_response(self.snapshot)
+
+    async def _start(self, request):
+        self.started.set()
+        return web.json_response({})
+
+    async def _status(self, request):
+        return web.json_response({"connections": self.connections})
+
+    async def serve(self, port):
+        app = web.Application()
+        app.add_routes([
+            web.get("/ws/{stream}", self._raw_stream),
+            web.get("/stream", self._combined_stream),
+            web.get("/api/v3/depth", self._depth_snapshot),
+            web.post("/start", self._start),
+            web.get("/status", self._status),
+        ])
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        await asyncio.Future()
+
+
+def run_frame_server(port, book_ticker, depth, rate):
+    """Process entry point for the FrameServer."""
+    asyncio.run(FrameServer(book_ticker, depth, rate).serve(port))
+
+
+class Probe:
+    """
+    Counts the updates a DataManager delivers and measures their end-to-end latency.
+
+    Registered as a recorder it sees every update synchronously; registered
+    as a listener it sees what survives conflation, as a strategy would.
+    """
+
+    def __init__(self, last_book_ticker_id, last_depth_id):
+        self.last_book_ticker_id = last_book_ticker_id
+        self.last_depth_id = last_depth_id
+        self.updates = 0
+        self.first_ns = self.last_ns = None
+        self.to_data_manager = LatencyHistogram()
+        self.to_listener = LatencyHistogram()
+        self.book_ticker_done = last_book_ticker_id is None
+        self.depth_done = last_depth_id is None
+        self.done = asyncio.Event()
+
+    def _count(self):
+        self.last_ns = time.perf_counter_ns()
+        if self.first_ns is None:
+            self.first_ns = self.last_ns
+        self.updates += 1
+
+    def _check_done(self):
+        if self.book_ticker_done and self.depth_done:
+            self.done.set()
+
+    # DataManager recorder interface
+    def on_top_of_book(self, top_of_book):
+        self._count()
+        self.to_data_manager.record(stamp_latency_ns(top_of_book["best_bid_qty"]))
+        if top_of_book["update_id"] >= self.last_book_ticker_id:
+            self.book_ticker_done = True
+            self._check_done()
+
+    def on_order_book_depth(self, order_book_depth):
+        self._count()
+        if order_book_depth.last_update_id >= self.last_depth_id:
+            self.depth_done = True
+            self._check_done()
+
+    async def listener(self, top_of_book, order_book_depth):
+        if "best_bid_qty" in top_of_book:
+            self.to_listener.record(stamp_latency_ns(top_of_book["best_bid_qty"]))
+
+    def seconds(self):
+        return (self.last_ns - self.first_ns) / 1e9 if self.updates > 1 else 0.0
+
+
+class ResourceMonitor:
+    """Samples this process's CPU time and peak resident memory over a run."""
+
+    def __init__(self, interval=0.05):
+        self.process = psutil.Process()
+        self.interval = interval
+        self.peak_rss = 0
+        self._task = None
+
+    async def _sample(self):
+        while True:
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._cpu = self.process.cpu_times()
+        self._wall = time.perf_counter()
+        self._task = asyncio.create_task(self._sample())
+
+    def stop(self):
+        """Return cpu_seconds, cpu_percent and rss_mb since start()."""
+        self._task.cancel()
+        self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+        cpu = self.process.cpu_times()
+        cpu_seconds = (cpu.user - self._cpu.user) + (cpu.system - self._cpu.system)
+        wall = time.perf_counter() - self._wall
+        return {
+            "cpu_seconds": cpu_seconds,
+            "cpu_percent": 100 * cpu_seconds / wall if wall else 0.0,
+            "rss_mb": self.peak_rss / 1e6,
+        }
+
+
+async def wait_for_connections(server_url, count, timeout=10):
+    """Wait until the frame server has `count` websocket connections open."""
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            async with session.get(f"{server_url}/status") as response:
+                if (await response.json())["connections"] >= count:
+                    return
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Frame server never reached {count} connections")
+            await asyncio.sleep(0.05)
+
+
+async def start_frames(server_url):
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{server_url}/start"):
+            pass
+
+
+def stage_latencies(probe):
+    """Collect end-to-end and per-stage latency summaries."""
+    latency = {
+        "e2e_data_manager": probe.to_data_manager.summary(),
+        "e2e_listener": probe.to_listener.summary(),
+    }
+    for stage, by_symbol in tracker.snapshot().items():
+        if stage not in SKIPPED_STAGES:
+            latency[stage] = by_symbol["*"] if "*" in by_symbol else next(iter(by_symbol.values()))
+    return latency
+
+
+async def bench_ingest(server_url, symbol, last_ids, frames, rate, timeout):
+    """Frames -> streamers (decode, depth sync) -> DataManager -> a listener."""
+    tracker.reset()
+    data_manager = DataManager()
+    probe = Probe(*last_ids)
+    data_manager.register_recorder(probe)
+    data_manager.register_listener(probe.listener)
+    ws_url = server_url.replace("http", "ws", 1) + "/ws"
+    tasks = [
+        asyncio.create_task(stream_book_ticker(ws_url, symbol.lower(), data_manager)),
+        asyncio.create_task(stream_depth(ws_url, f"{server_url}/api", symbol.lower(), data_manager)),
+    ]
+    try:
+        await wait_for_connections(server_url, 2)
+        monitor = ResourceMonitor()
+        monitor.start()
+        await start_frames(server_url)
+        await asyncio.wait_for(probe.done.wait(), timeout)
+        await asyncio.sleep(0.1)  # Let the conflated listener catch up
+        resources = monitor.stop()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for listener in list(data_manager.listeners):
+            data_manager.unregister_listener(listener)
+
+    seconds = probe.seconds()
+    return {
+        "frames": frames,
+        "rate": rate,
+        "updates": probe.updates,
+        "seconds": seconds,
+        "msgs_per_sec": frames / seconds if seconds else 0.0,
+        "cpu_us_per_msg": resources["cpu_seconds"] / frames * 1e6,
+        **resources,
+        "latency": stage_latencies(probe),
+    }
+
+
+def run_clients(url, count, ready, stop, results):
+    """Process entry point: hold `count` frontend connections and measure what they receive."""
+    asyncio.run(_clients(url, count, ready, stop, results))
+
+
+async def _clients(url, count, ready, stop, results):
+    connections = [await websockets.connect(url, max_size=None) for _ in range(count)]
+    latency = LatencyHistogram()
+    received = [0] * count
+    received_bytes = 0
+    first_ns = last_ns = None
+
+    async def read(i, websocket):
+        nonlocal received_bytes, first_ns, last_ns
+        async for message in websocket:
+            last_ns = time.perf_counter_ns()
+            if first_ns is None:
+                first_ns = last_ns
+            received[i] += 1
+            received_bytes += len(message)
+            if isinstance(message, str):
+                top_of_book = json.loads(message).get("top_of_book") or {}
+                if "best_bid_qty" in top_of_book:
+                    latency.record(stamp_latency_ns(top_of_book["best_bid_qty"]))
+
+    readers = [asyncio.create_task(read(i, websocket)) for i, websocket in enumerate(connections)]
+    ready.set()
+    while not stop.is_set():
+        await asyncio.sleep(0.05)
+    for reader in readers:
+        reader.cancel()
+    await asyncio.gather(*readers, return_exceptions=True)
+    for websocket in connections:
+        await websocket.close()
+    seconds = (last_ns - first_ns) / 1e9 if first_ns is not None and last_ns > first_ns else 0.0
+    results.put({
+        "messages": sum(received),
+        "min_per_client": min(received),
+        "bytes": received_bytes,
+        "seconds": seconds,
+        "latency": latency.summary(),
+    })
+
+
+async def bench_broadcast(server_url, symbol, last_ids, frames, rate, timeout, clients, protocol, encoding,
+                          interval, port):
+    """Frames -> combined stream multiplexer -> DataManager -> BookBroadcaster -> N frontend clients."""
+    import backend
+    logging.getLogger().setLevel(logging.WARNING)
+
+    tracker.reset()
+    ws_base = server_url.replace("http", "ws", 1)
+    backend.multiplexer = StreamMultiplexer(f"{ws_base}/stream", f"{server_url}/api")
+    backend.default_pair = symbol
+    backend.BROADCAST_INTERVAL = interval or None
+    await backend.add_pair(symbol)
+    probe = Probe(*last_ids)
+    data_manager = backend.data_managers[symbol]
+    data_manager.register_recorder(probe)
+    data_manager.register_listener(probe.listener)
+
+    context = multiprocessing.get_context("spawn")
+    ready, stop, results = context.Event(), context.Event(), context.Queue()
+    url = f"ws://127.0.0.1:{port}/?pair={symbol}&proto={protocol}&encoding={encoding}"
+    loop = asyncio.get_running_loop()
+    server = await websockets.serve(backend.websocket_handler, "127.0.0.1", port)
+    process = context.Process(target=run_clients, args=(url, clients, ready, stop, results))
+    process.start()
+    try:
+        if not await loop.run_in_executor(None, ready.wait, timeout):
+            raise TimeoutError("Clients did not connect")
+        await wait_for_connections(server_url, 1)
+        monitor = ResourceMonitor()
+        monitor.start()
+        await start_frames(server_url)
+        await asyncio.wait_for(probe.done.wait(), timeout)
+        await asyncio.sleep(0.5)  # Let the last broadcasts reach the clients
+        resources = monitor.stop()
+        stop.set()
+        received = await loop.run_in_executor(None, results.get, True, timeout)
+    finally:
+        stop.set()
+        await loop.run_in_executor(None, process.join, timeout)
+        server.close()
+        data_manager.unregister_listener(probe.listener)
+        await backend.remove_pair(symbol)
+        await backend.multiplexer.close()
+
+    seconds = probe.seconds()
+    latency = stage_latencies(probe)
+    latency["e2e_client"] = received["latency"]
+    return {
+        "frames": frames,
+        "rate": rate,
+        "clients": clients,
+        "seconds": seconds,
+        "msgs_per_sec": frames / seconds if seconds else 0.0,
+        "client_messages": received["messages"],
+        "client_msgs_per_sec": received["messages"] / received["seconds"] if received["seconds"] else 0.0,
+        "client_min_messages": received["min_per_client"],
+        "client_mb": received["bytes"] / 1e6,
+        "cpu_us_per_msg": resources["cpu_seconds"] / frames * 1e6,
+        **resources,
+        "latency": latency,
+    }
+
+
+def flatten(results):
+    """Yield (metric name, value, higher is better) for every compared metric."""
+    for scenario, result in results.items():
+        for name, higher_is_better in METRICS.items():
+            if name in result:
+                yield f"{scenario}.{name}", result[name], higher_is_better
+        for stage, summary in result.get("latency", {}).items():
+            # Flat out, end-to-end latency measures the backlog rather than the pipeline
+            if not summary.get("count") or stage.startswith("e2e_") and not result.get("rate"):
+                continue
+            for name in ("p50_us", "p99_us"):
+                yield f"{scenario}.{stage}.{name}", summary[name], METRICS[name]
+
+
+def compare(results, baseline, tolerance):
+    """
+    Diff results against a baseline.
+
+    Returns:
+        tuple: (table rows, names of metrics that got worse by more than tolerance).
+    """
+    previous = {name: value for name, value, _ in flatten(baseline)} if baseline else {}
+    rows, regressions = [], []
+    for name, value, higher_is_better in flatten(results):
+        old = previous.get(name)
+        if old is None or old == 0:
+            rows.append([name, f"{value:.1f}", "-", "-", ""])
+            continue
+        change = (value - old) / old
+        worse = -change if higher_is_better else change
+        flag = "REGRESSION" if worse > tolerance else ("improved" if worse < -tolerance else "")
+        if flag == "REGRESSION":
+            regressions.append(name)
+        rows.append([name, f"{value:.1f}", f"{old:.1f}", f"{change:+.1%}", flag])
+    return rows, regressions
+
+
+async def run(args, book_ticker, depth):
+    symbol = json.loads(book_ticker[0] if book_ticker else depth[0])["s"]
+    last_ids = (
+        json.loads(book_ticker[-1])["u"] if book_ticker else None,
+        json.loads(depth[-1])["u"] if depth else None,
+    )
+    frames = len(book_ticker) + len(depth)
+    context = multiprocessing.get_context("spawn")
+    server_url = f"http://127.0.0.1:{args.port}"
+    tracker.enabled = True
+
+    results = {}
+    for scenario in args.scenario:
+        # A fresh frame server per scenario, so every connection replays from the start
+        server = context.Process(target=run_frame_server, args=(args.port, book_ticker, depth, args.rate))
+        server.start()
+        try:
+            await asyncio.sleep(1.0)
+            print(f"Running {scenario} ({frames} frames)...")
+            if scenario == "ingest":
+                results[scenario] = await bench_ingest(server_url, symbol, last_ids, frames, args.rate, args.timeout)
+            else:
+                results[scenario] = await bench_broadcast(
+                    server_url, symbol, last_ids, frames, args.rate, args.timeout, args.clients, args.protocol,
+                    args.encoding, args.broadcast_interval, args.port + 1,
+                )
+        finally:
+            server.terminate()
+            server.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark market data ingestion, dispatch and broadcast")
+    parser.add_argument("--frames", help="File of recorded raw frames, one per line (synthetic if omitted)")
+    parser.add_argument("--count", type=int, default=20000, help="Number of synthetic frames per stream")
+    parser.add_argument("--levels", type=int, default=20, help="Levels per side in synthetic depth frames")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic frames")
+    parser.add_argument(
+        "--scenario", action="append", choices=["ingest", "broadcast"],
+        help="Scenario to run, repeatable (default: both)"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=0,
+        help="Frames per second per stream, 0 for flat out (latencies then include queueing behind the backlog)"
+    )
+    parser.add_argument("--clients", type=int, default=10, help="Frontend clients in the broadcast scenario")
+    parser.add_argument("--protocol", type=int, default=1, choices=[1, 2], help="Frontend wire protocol")
+    parser.add_argument("--encoding", default="json", choices=["json", "binary"], help="Frontend encoding")
+    parser.add_argument(
+        "--broadcast-interval", type=float, default=0,
+        help="Minimum seconds between broadcasts, 0 for unthrottled (backend.py uses 0.05)"
+    )
+    parser.add_argument("--port", type=int, default=8950, help="Frame server port (the backend uses port + 1)")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds before a scenario is abandoned")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative change flagged as a regression")
+    parser.add_argument("--output", help="Also write the full results to this JSON file")
+    args = parser.parse_args()
+    args.scenario = args.scenario or ["ingest", "broadcast"]
+
+    if args.frames:
+        book_ticker, depth = load_frames(args.frames)
+    else:
+        random.seed(args.seed)
+        book_ticker, depth = synthetic_frames(args.count, args.levels)
+
+    results = asyncio.run(run(args, book_ticker, depth))
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    rows, regressions = compare(results, baseline, args.tolerance)
+    print(tabulate(rows, headers=["Metric", "Current", "Baseline", "Change", ""], tablefmt="grid", disable_numparse=True))
+
+    document = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("baseline", "save_baseline", "output", "tolerance")},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
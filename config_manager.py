@@ -1,5 +1,8 @@
 import os
 
+# Where the 'sim' environment finds exchange_simulator.py (override with BINANCE_SIM_URL)
+SIM_URL = "http://127.0.0.1:8900"
+
 
 class ConfigManager:
     """Manages configuration and API keys."""
@@ -7,7 +10,14 @@ class ConfigManager:
     def __init__(self, file_path="binance_secrets.txt"):
         # Use absolute path relative to this file
         self.file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), file_path)
-        self.secrets = self._load_secrets()
+        self._secrets = None
+
+    @property
+    def secrets(self):
+        """API keys and secrets, loaded on first use so the simulator needs no secrets file."""
+        if self._secrets is None:
+            self._secrets = self._load_secrets()
+        return self._secrets
 
     def _load_secrets(self):
         """Load API keys and secrets from a file."""
@@ -28,6 +38,7 @@ class ConfigManager:
                 return {
                     "base_url": "https://testnet.binance.vision/api",
                     "ws_url": "wss://testnet.binance.vision/ws",
+                    "stream_url": "wss://testnet.binance.vision/stream",
                     "api_key": self.secrets["TESTNET_API_KEY"],
                     "api_secret": self.secrets["TESTNET_API_SECRET"],
                 }
@@ -35,10 +46,22 @@ class ConfigManager:
                 return {
                     "base_url": "https://api.binance.com/api",
                     "ws_url": "wss://stream.binance.com:9443/ws",
+                    "stream_url": "wss://stream.binance.com:9443/stream",
                     "api_key": self.secrets["REAL_API_KEY"],
                     "api_secret": self.secrets["REAL_API_SECRET"],
                 }
+            elif env == "sim":
+                # Local exchange_simulator.py; it accepts any key
+                url = os.environ.get("BINANCE_SIM_URL", SIM_URL).rstrip("/")
+                ws = "ws" + url[len("http"):]
+                return {
+                    "base_url": f"{url}/api",
+                    "ws_url": f"{ws}/ws",
+                    "stream_url": f"{ws}/stream",
+                    "api_key": "sim",
+                    "api_secret": "sim",
+                }
             else:
-                raise ValueError("Invalid environment. Use 'testnet' or 'real'.")
+                raise ValueError("Invalid environment. Use 'testnet', 'real' or 'sim'.")
         except KeyError as e:
             raise ValueError(f"Missing key in secrets file: {e}")
@@ -0,0 +1,181 @@
+import asyncio
+import websockets
+
+# Binance closes every websocket connection after 24 hours
+ROLLOVER_AFTER = 23 * 60 * 60
+# How long to wait before retrying a rollover whose new connection failed
+ROLLOVER_RETRY = 60
+
+
+class SupervisedConnection:
+    """
+    Keeps a websocket subscription alive for as long as it is needed.
+
+    Lost connections are re-established with exponential backoff, dead ones are
+    detected with ping/pong and an optional idle timeout, and shortly before
+    Binance's 24-hour cut-off a second connection is opened and takes over as
+    soon as it delivers data, so the rollover leaves no gap. Because a reconnect
+    after a failure does leave a gap, on_reconnect is called so stateful
+    consumers (e.g. DepthSynchronizer) can resync.
+    """
+
+    def __init__(self, url, on_message, on_connect=None, on_reconnect=None, name=None,
+                 ping_interval=20, ping_timeout=10, idle_timeout=None, rollover_after=ROLLOVER_AFTER,
+                 initial_backoff=0.1, max_backoff=30):
+        """
+        Args:
+            url (str or callable): The websocket URL, or a function returning it at connect time.
+            on_message (callable): Called with every raw frame received.
+            on_connect (coroutine function, optional): Awaited with each new websocket before it is read,
+                and again just before a rolled-over connection takes over, so subscriptions
+                changed during the rollover can be sent to it.
+            on_reconnect (callable, optional): Called after reconnecting from a lost connection.
+            name (str, optional): Label used in log messages.
+            ping_interval (float): Seconds between pings sent to the server.
+            ping_timeout (float): Seconds to wait for a pong before the connection is considered dead.
+            idle_timeout (float, optional): Seconds without any frame before the connection is considered dead.
+            rollover_after (float): Seconds after which the connection is replaced by a fresh one.
+            initial_backoff (float): First reconnect delay in seconds, doubled on each failure.
+            max_backoff (float): Upper bound on the reconnect delay in seconds.
+        """
+        self.url = url
+        self.on_message = on_message
+        self.on_connect = on_connect
+        self.on_reconnect = on_reconnect
+        self.name = name or (url if isinstance(url, str) else "websocket")
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.idle_timeout = idle_timeout
+        self.rollover_after = rollover_after
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.websocket = None
+        self.reconnects = 0
+        self._closed = False
+
+    async def run(self):
+        """Connect and keep delivering frames until close() is called."""
+        backoff = self.initial_backoff
+        connected_before = False
+        while not self._closed:
+            try:
+                websocket = await self._connect()
+            except Exception as e:
+                print(f"Connection to {self.name} failed ({e}), retrying in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            backoff = self.initial_backoff
+            print(f"Connected to {self.name}")
+            if connected_before:
+                self.reconnects += 1
+                if self.on_reconnect is not None:
+                    self.on_reconnect()
+            connected_before = True
+            await self._read(websocket)
+
+    async def close(self):
+        """Stop supervising and close the current connection."""
+        self._closed = True
+        if self.websocket is not None:
+            await self.websocket.close()
+
+    async def _connect(self):
+        url = self.url() if callable(self.url) else self.url
+        websocket = await websockets.connect(url, ping_interval=self.ping_interval, ping_timeout=self.ping_timeout)
+        if self.on_connect is not None:
+            await self.on_connect(websocket)
+        return websocket
+
+    async def _read(self, websocket):
+        """Read frames until the connection is lost, rolling over to fresh connections on schedule."""
+        loop = asyncio.get_running_loop()
+        self.websocket = websocket
+        deadline = loop.time() + self.rollover_after
+        try:
+            while not self._closed:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    replacement = await self._rollover(self.websocket)
+                    if replacement is None:
+                        deadline = loop.time() + ROLLOVER_RETRY
+                    else:
+                        self.websocket = replacement
+                        deadline = loop.time() + self.rollover_after
+                    continue
+                timeout = remaining if self.idle_timeout is None else min(remaining, self.idle_timeout)
+                try:
+                    message = await asyncio.wait_for(self.websocket.recv(), timeout)
+                except asyncio.TimeoutError:
+                    if loop.time() < deadline:
+                        raise ConnectionError(f"no data for {self.idle_timeout}s")
+                    continue
+                self._deliver(message)
+        except asyncio.CancelledError:
+            await self.websocket.close()
+            raise
+        except Exception as e:
+            if not self._closed:
+                print(f"Lost connection to {self.name}: {e}")
+            await self.websocket.close()
+        finally:
+            self.websocket = None
+
+    def _deliver(self, message):
+        try:
+            self.on_message(message)
+        except Exception as e:
+            # A bad frame is not a reason to drop the connection
+            print(f"Error handling message from {self.name}: {e}")
+
+    async def _rollover(self, old):
+        """
+        Replace the old connection with a new one without a data gap.
+
+        Frames from the old connection keep flowing until the new one delivers
+        its first frame; from then on only the new connection is read.
+
+        Returns:
+            The new websocket, or None if it could not be established.
+        """
+        try:
+            new = await self._connect()
+        except Exception as e:
+            print(f"Rollover of {self.name} failed ({e}), keeping the current connection")
+            return None
+
+        new_recv = asyncio.ensure_future(new.recv())
+        old_recv = None
+        taken_over = False
+        try:
+            while True:
+                if old_recv is None:
+                    old_recv = asyncio.ensure_future(old.recv())
+                done, _ = await asyncio.wait({old_recv, new_recv}, return_when=asyncio.FIRST_COMPLETED)
+                if old_recv in done:
+                    if old_recv.exception() is None:
+                        self._deliver(old_recv.result())
+                        old_recv = None
+                    elif new_recv not in done:
+                        # The old connection died first; fall through to the new one
+                        await asyncio.wait({new_recv})
+                if new_recv in done or new_recv.done():
+                    self._deliver(new_recv.result())
+                    break
+            if self.on_connect is not None:
+                # The subscriptions may have changed while the old connection was still the current one
+                await self.on_connect(new)
+            self.websocket = new
+            taken_over = True
+        except Exception as e:
+            print(f"Rollover of {self.name} failed ({e}), keeping the current connection")
+            return None
+        finally:
+            if old_recv is not None:
+                old_recv.cancel()
+            if not taken_over:
+                new_recv.cancel()
+                await new.close()
+        await old.close()
+        print(f"Rolled {self.name} over to a new connection")
+        return new
@@ -1,28 +1,125 @@
+import asyncio
+import inspect
+import time
+from latency import now, tracker
+from order_book import LocalOrderBook
+
+# Event types listeners can subscribe to
+TOP_OF_BOOK = "top_of_book"
+DEPTH = "depth"
+ALL_EVENTS = (TOP_OF_BOOK, DEPTH)
+
+
+class ListenerSlot:
+    """
+    Runs one listener on its own task with a latest-value-wins slot.
+
+    Notifications only mark the slot dirty, so however many updates arrive
+    while the listener is busy it is called once more with the newest data.
+    """
+
+    def __init__(self, data_manager, listener, events, min_interval=None):
+        self.data_manager = data_manager
+        self.listener = listener
+        self.events = frozenset(events)
+        self.min_interval = min_interval
+        self.name = f"listener:{getattr(listener, '__name__', listener)}"
+        self._wakeup = None
+        self._task = None
+
+    def notify(self):
+        """Mark the slot dirty, starting the listener task on first use."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    def cancel(self):
+        """Stop the listener task."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        last_call = None
+        while True:
+            await self._wakeup.wait()
+            if self.min_interval and last_call is not None:
+                delay = last_call + self.min_interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self._wakeup.clear()
+            last_call = time.monotonic()
+            # Read once: tracking can be switched on or off while the listener is awaited
+            tracking = tracker.enabled
+            if tracking:
+                started_ns = now()
+                symbol = self.data_manager.top_of_book.get("symbol")
+                # Time from the update landing to the listener picking it up
+                tracker.record("dispatch", symbol, started_ns - self.data_manager.updated_ns)
+            try:
+                result = self.listener(self.data_manager.top_of_book, self.data_manager.order_book_depth)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Error in {self.name}: {e}")
+            if tracking:
+                tracker.record_since(self.name, symbol, started_ns)
+
+
 class DataManager:
     def __init__(self):
         self.top_of_book = {}
-        self.order_book_depth = {}
-        self.listeners = []
+        self.order_book_depth = LocalOrderBook()
+        self.listeners = {}  # Listener -> ListenerSlot
+        self.recorders = []  # Called synchronously on every update, see recorder.MarketDataRecorder
+        self.updated_ns = 0  # latency.now() of the last update
+
+    def register_listener(self, listener, events=ALL_EVENTS, min_interval=None):
+        """
+        Register a new listener for updates.
 
-    def register_listener(self, listener):
-        """Register a new listener for updates."""
-        self.listeners.append(listener)
+        Args:
+            listener (callable): Called as listener(top_of_book, order_book_depth); may be async.
+            events (tuple): Which updates to receive, TOP_OF_BOOK and/or DEPTH.
+            min_interval (float, optional): Minimum seconds between calls, to throttle the listener.
+        """
+        self.listeners[listener] = ListenerSlot(self, listener, events, min_interval)
 
     def unregister_listener(self, listener):
         """Unregister a listener."""
-        self.listeners.remove(listener)
+        self.listeners.pop(listener).cancel()
+
+    def register_recorder(self, recorder):
+        """
+        Register a recorder that must see every update, unlike conflated listeners.
+
+        Args:
+            recorder: Object with on_top_of_book(top_of_book) and on_order_book_depth(order_book_depth).
+        """
+        self.recorders.append(recorder)
+
+    def unregister_recorder(self, recorder):
+        """Unregister a recorder."""
+        self.recorders.remove(recorder)
 
     def update_top_of_book(self, top_of_book):
         self.top_of_book = top_of_book
-        print(f"Top-of-book updated")  # Debug
-        self.broadcast_update()
+        for recorder in self.recorders:
+            recorder.on_top_of_book(top_of_book)
+        self.broadcast_update(TOP_OF_BOOK)
 
     def update_order_book_depth(self, order_book_depth):
+        """Store the latest LocalOrderBook and notify listeners."""
         self.order_book_depth = order_book_depth
-        print(f"Order book depth updated")  # Debug
-        self.broadcast_update()
+        for recorder in self.recorders:
+            recorder.on_order_book_depth(order_book_depth)
+        self.broadcast_update(DEPTH)
 
-    def broadcast_update(self):
-        """Broadcast updates to all registered listeners."""
-        for listener in self.listeners:
-            listener(self.top_of_book, self.order_book_depth)
+    def broadcast_update(self, event=None):
+        """Wake the listeners subscribed to an event type (all listeners if None)."""
+        # Always stamped, so dispatch latency is right even just after tracking is switched on
+        self.updated_ns = now()
+        for slot in self.listeners.values():
+            if event is None or event in slot.events:
+                slot.notify()
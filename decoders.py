@@ -0,0 +1,204 @@
+import json
+from itertools import chain
+from typing import List, Optional, Tuple
+import numpy as np
+from events import DepthUpdate, TopOfBook, Trade
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Decoder backends in order of preference
+BACKENDS = [name for name, module in (("msgspec", msgspec), ("orjson", orjson), ("json", json)) if module]
+DEFAULT_BACKEND = BACKENDS[0]
+
+
+def get_loads(backend=None):
+    """
+    Return a generic JSON decode function.
+
+    Args:
+        backend (str, optional): 'msgspec', 'orjson' or 'json'. The fastest installed one if None.
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"JSON backend '{backend}' is not installed. Available: {BACKENDS}")
+    if backend == "msgspec":
+        return msgspec.json.Decoder().decode
+    if backend == "orjson":
+        return orjson.loads
+    return json.loads
+
+
+loads = get_loads()
+
+
+if msgspec is not None:
+    # Only scalars and lists of them, so there are no reference cycles for the GC to look for
+    class DepthUpdateMessage(msgspec.Struct, gc=False):
+        E: int
+        s: str
+        U: int
+        u: int
+        b: List[Tuple[float, float]]
+        a: List[Tuple[float, float]]
+
+    class CombinedStreamMessage(msgspec.Struct, gc=False):
+        stream: Optional[str] = None
+        data: msgspec.Raw = msgspec.Raw(b"null")
+
+
+class CombinedStreamDecoder:
+    """
+    Splits /stream?streams= frames into (stream name, payload).
+
+    With msgspec the payload is left as raw JSON for a schema-specific decoder's
+    decode_payload; otherwise it is the already decoded dict. Control responses
+    such as {"result": null, "id": 1} come back with a stream name of None.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or DEFAULT_BACKEND
+        if self.backend == "msgspec":
+            self._decoder = msgspec.json.Decoder(CombinedStreamMessage)
+        else:
+            self._loads = get_loads(self.backend)
+
+    def decode(self, raw):
+        if self.backend == "msgspec":
+            msg = self._decoder.decode(raw)
+            return msg.stream, msg.data
+        data = self._loads(raw)
+        return data.get("stream"), data.get("data", data)
+
+
+class BookTickerDecoder:
+    """Decodes @bookTicker frames into TopOfBook events."""
+
+    def __init__(self, backend=None):
+        self.backend = backend or DEFAULT_BACKEND
+        if self.backend == "msgspec":
+            # Decoded straight into the event; strict=False parses Binance's quoted decimals as floats
+            self._decoder = msgspec.json.Decoder(TopOfBook, strict=False)
+            self.decode = self.decode_payload = self._decoder.decode
+        else:
+            self._loads = get_loads(self.backend)
+            self.decode = self._decode_generic
+            self.decode_payload = self.from_dict
+
+    def _decode_generic(self, raw):
+        return self.from_dict(self._loads(raw))
+
+    def from_dict(self, data):
+        """Convert an already decoded bookTicker message."""
+        return TopOfBook(
+            symbol=data["s"],
+            update_id=data["u"],
+            best_bid_price=float(data["b"]),
+            best_bid_qty=float(data["B"]),
+            best_ask_price=float(data["a"]),
+            best_ask_qty=float(data["A"]),
+            event_time=data.get("E"),
+        )
+
+
+class TradeDecoder:
+    """Decodes @trade frames into Trade events."""
+
+    def __init__(self, backend=None):
+        self.backend = backend or DEFAULT_BACKEND
+        if self.backend == "msgspec":
+            self._decoder = msgspec.json.Decoder(Trade, strict=False)
+            self.decode = self.decode_payload = self._decoder.decode
+        else:
+            self._loads = get_loads(self.backend)
+            self.decode = self._decode_generic
+            self.decode_payload = self.from_dict
+
+    def _decode_generic(self, raw):
+        return self.from_dict(self._loads(raw))
+
+    def from_dict(self, data):
+        """Convert an already decoded trade message."""
+        return Trade(
+            symbol=data["s"],
+            trade_id=data["t"],
+            price=float(data["p"]),
+            qty=float(data["q"]),
+            trade_time=data["T"],
+            is_buyer_maker=data["m"],
+            event_time=data.get("E"),
+        )
+
+
+class DepthDecoder:
+    """
+    Decodes @depth diff frames into a DepthUpdate with the levels in preallocated float64 arrays.
+
+    The same DepthUpdate is returned for every frame and its bids and asks are
+    (n, 2) views into reused buffers, so call copy() on an event that must
+    outlive the next frame.
+    """
+
+    def __init__(self, backend=None, capacity=1024):
+        self.backend = backend or DEFAULT_BACKEND
+        self.bids = np.empty((capacity, 2))
+        self.asks = np.empty((capacity, 2))
+        self.event = DepthUpdate()
+        if self.backend == "msgspec":
+            self._decoder = msgspec.json.Decoder(DepthUpdateMessage, strict=False)
+            self.decode = self.decode_payload = self._decode_typed
+        else:
+            self._loads = get_loads(self.backend)
+            self.decode = self._decode_generic
+            self.decode_payload = self.from_dict
+
+    def _buffer(self, side, n):
+        buffer = self.bids if side == "b" else self.asks
+        if n > len(buffer):
+            buffer = np.empty((max(n, 2 * len(buffer)), 2))
+            if side == "b":
+                self.bids = buffer
+            else:
+                self.asks = buffer
+        return buffer
+
+    def _fill(self, side, levels, parse=None):
+        n = len(levels)
+        buffer = self._buffer(side, n)
+        values = chain.from_iterable(levels)
+        if parse is not None:
+            values = map(parse, values)
+        buffer.reshape(-1)[:2 * n] = np.fromiter(values, np.float64, 2 * n)
+        return buffer[:n]
+
+    def _decode_typed(self, raw):
+        msg = self._decoder.decode(raw)
+        event = self.event
+        event.symbol = msg.s
+        event.event_time = msg.E
+        event.first_update_id = msg.U
+        event.final_update_id = msg.u
+        event.bids = self._fill("b", msg.b)
+        event.asks = self._fill("a", msg.a)
+        return event
+
+    def _decode_generic(self, raw):
+        return self.from_dict(self._loads(raw))
+
+    def from_dict(self, data):
+        """Convert an already decoded depthUpdate message."""
+        event = self.event
+        event.symbol = data["s"]
+        event.event_time = data["E"]
+        event.first_update_id = data["U"]
+        event.final_update_id = data["u"]
+        event.bids = self._fill("b", data["b"], float)
+        event.asks = self._fill("a", data["a"], float)
+        return event
@@ -0,0 +1,175 @@
+from typing import Optional
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class _EventMixin:
+    """
+    Dict-style access for the event types.
+
+    Events used to be plain dicts, so event["best_bid_price"], event.get(...),
+    "received_ns" in event and the Binance wire keys ("u", "U", "b", ...)
+    still work. Hot paths should use the attributes directly.
+    """
+
+    __slots__ = ()
+    _aliases = {}  # Alternative key -> attribute
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self._aliases.get(key, key))
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        setattr(self, self._aliases.get(key, key), value)
+
+    def __contains__(self, key):
+        return getattr(self, self._aliases.get(key, key), None) is not None
+
+    def get(self, key, default=None):
+        value = getattr(self, self._aliases.get(key, key), None)
+        return default if value is None else value
+
+    def to_dict(self):
+        """Return the event as a dict of its set fields."""
+        fields = getattr(type(self), "__struct_fields__", None) or self.__slots__
+        return {field: getattr(self, field) for field in fields if getattr(self, field) is not None}
+
+
+if msgspec is not None:
+    # Structs are decoded straight from the frame: one compact object per message,
+    # not tracked by the garbage collector since they only hold scalars
+
+    class TopOfBook(_EventMixin, msgspec.Struct, gc=False, rename={
+        "symbol": "s", "update_id": "u", "best_bid_price": "b", "best_bid_qty": "B",
+        "best_ask_price": "a", "best_ask_qty": "A", "event_time": "E",
+    }):
+        """Best bid and ask from a @bookTicker message."""
+        symbol: str
+        update_id: int
+        best_bid_price: float
+        best_bid_qty: float
+        best_ask_price: float
+        best_ask_qty: float
+        event_time: Optional[int] = None  # Only futures streams carry E
+        received_ns: Optional[int] = None  # latency.now() at receipt, set while latency tracking is on
+        _aliases = {"s": "symbol", "u": "update_id", "b": "best_bid_price", "B": "best_bid_qty",
+                    "a": "best_ask_price", "A": "best_ask_qty", "E": "event_time"}
+
+    class Trade(_EventMixin, msgspec.Struct, gc=False, rename={
+        "symbol": "s", "trade_id": "t", "price": "p", "qty": "q",
+        "trade_time": "T", "is_buyer_maker": "m", "event_time": "E",
+    }):
+        """One trade from a @trade message."""
+        symbol: str
+        trade_id: int
+        price: float
+        qty: float
+        trade_time: int
+        is_buyer_maker: bool
+        event_time: Optional[int] = None
+        received_ns: Optional[int] = None
+        _aliases = {"s": "symbol", "t": "trade_id", "p": "price", "q": "qty", "T": "trade_time", "m": "is_buyer_maker",
+                    "E": "event_time"}
+
+else:
+    class TopOfBook(_EventMixin):
+        """Best bid and ask from a @bookTicker message."""
+
+        __slots__ = ("symbol", "update_id", "best_bid_price", "best_bid_qty", "best_ask_price", "best_ask_qty",
+                     "event_time", "received_ns")
+        _aliases = {"s": "symbol", "u": "update_id", "b": "best_bid_price", "B": "best_bid_qty",
+                    "a": "best_ask_price", "A": "best_ask_qty", "E": "event_time"}
+
+        def __init__(self, symbol, update_id, best_bid_price, best_bid_qty, best_ask_price, best_ask_qty,
+                     event_time=None, received_ns=None):
+            self.symbol = symbol
+            self.update_id = update_id
+            self.best_bid_price = best_bid_price
+            self.best_bid_qty = best_bid_qty
+            self.best_ask_price = best_ask_price
+            self.best_ask_qty = best_ask_qty
+            self.event_time = event_time
+            self.received_ns = received_ns
+
+    class Trade(_EventMixin):
+        """One trade from a @trade message."""
+
+        __slots__ = ("symbol", "trade_id", "price", "qty", "trade_time", "is_buyer_maker", "event_time", "received_ns")
+        _aliases = {"s": "symbol", "t": "trade_id", "p": "price", "q": "qty", "T": "trade_time", "m": "is_buyer_maker",
+                    "E": "event_time"}
+
+        def __init__(self, symbol, trade_id, price, qty, trade_time, is_buyer_maker, event_time=None, received_ns=None):
+            self.symbol = symbol
+            self.trade_id = trade_id
+            self.price = price
+            self.qty = qty
+            self.trade_time = trade_time
+            self.is_buyer_maker = is_buyer_maker
+            self.event_time = event_time
+            self.received_ns = received_ns
+
+
+class DepthUpdate(_EventMixin):
+    """
+    A diff from the @depth stream, with the levels as (n, 2) float64 arrays.
+
+    DepthDecoder reuses one DepthUpdate and its level buffers for every frame,
+    so use copy() for an event that must outlive the next one. The Binance
+    keys ("s", "E", "U", "u", "b", "a") are accepted as aliases.
+    """
+
+    __slots__ = ("symbol", "event_time", "first_update_id", "final_update_id", "bids", "asks")
+    _aliases = {"s": "symbol", "E": "event_time", "U": "first_update_id", "u": "final_update_id",
+                "b": "bids", "a": "asks"}
+
+    def __init__(self, symbol=None, event_time=None, first_update_id=None, final_update_id=None, bids=None, asks=None):
+        self.symbol = symbol
+        self.event_time = event_time
+        self.first_update_id = first_update_id
+        self.final_update_id = final_update_id
+        self.bids = bids
+        self.asks = asks
+
+    def copy(self):
+        """Return a copy that owns its level arrays."""
+        return DepthUpdate(
+            self.symbol, self.event_time, self.first_update_id, self.final_update_id, self.bids.copy(), self.asks.copy()
+        )
+
+
+class DepthSnapshot(_EventMixin):
+    """
+    Read-only copy of the top of a book, usable where listeners expect a LocalOrderBook.
+
+    bids and asks are (n, 2) float64 arrays, best level first.
+    """
+
+    __slots__ = ("symbol", "bids", "asks", "last_update_id", "event_time", "last_event")
+
+    def __init__(self, symbol, bids, asks, last_update_id=None, event_time=None):
+        self.symbol = symbol
+        self.bids = bids
+        self.asks = asks
+        self.last_update_id = last_update_id
+        self.event_time = event_time
+        self.last_event = None
+
+    def __len__(self):
+        return len(self.bids) + len(self.asks)
+
+    def best_bid(self):
+        """Return the best bid as (price, qty), or None."""
+        return tuple(self.bids[0].tolist()) if len(self.bids) else None
+
+    def best_ask(self):
+        """Return the best ask as (price, qty), or None."""
+        return tuple(self.asks[0].tolist()) if len(self.asks) else None
+
+    def to_dict(self, depth=None):
+        """Return the book in the {"bids": [...], "asks": [...]} layout, best level first."""
+        return {"bids": self.bids[:depth].tolist(), "asks": self.asks[:depth].tolist()}
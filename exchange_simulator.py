@@ -0,0 +1,837 @@
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import random
+import secrets
+import time
+from aiohttp import web, WSMsgType
+from backtester import SimulatedExchange
+from order_book import OrderBookOutOfSync
+from recorder import DIFF, SNAPSHOT, TOP_OF_BOOK_EVENT, MarketDataReader
+
+DEFAULT_PORT = 8900
+DEFAULT_BALANCE = 1_000_000  # Starting balance of every asset
+SEND_QUEUE_SIZE = 1024  # Frames buffered per websocket client before it is dropped as too slow
+OPEN_ORDER_STATUSES = {"NEW", "PARTIALLY_FILLED"}
+
+
+class SimulatorError(Exception):
+    """A request the simulator rejects, answered like Binance with {"code": ..., "msg": ...}."""
+
+    def __init__(self, code, msg, status=400):
+        super().__init__(msg)
+        self.code = code
+        self.status = status
+
+
+def _fmt(value):
+    return f"{value:.8f}"
+
+
+def _ms():
+    return time.time_ns() // 1_000_000
+
+
+def _levels(levels):
+    """Format [price, qty] levels (lists or a decoded NumPy array) the way Binance sends them."""
+    levels = levels.tolist() if hasattr(levels, "tolist") else levels
+    return [[_fmt(float(price)), _fmt(float(qty))] for price, qty in levels]
+
+
+def _on_grid(value, step):
+    return abs(value / step - round(value / step)) < 1e-6
+
+
+class MatchingEngine(SimulatedExchange):
+    """
+    The backtester's matching model, run on the wall clock with no added latency.
+
+    Orders fill as taker when marketable on arrival, and as maker when the
+    market trades through them or their queue position is worked off, exactly
+    as in a backtest. Every fill is reported to the owning SimulatedMarket.
+    """
+
+    def __init__(self, market, maker_fee, taker_fee):
+        super().__init__(latency=0, maker_fee=maker_fee, taker_fee=taker_fee)
+        self.market = market
+        self.book.symbol = market.pair
+
+    def step(self):
+        """Bring the engine clock to now, applying requests sent since the last step."""
+        self.advance(time.time_ns())
+
+    def _arrive(self, order):
+        # Acknowledge the order before any fill it takes on arrival
+        order["status"] = "NEW"
+        self.market.simulator.on_order_update(self.market, order, "NEW")
+        super()._arrive(order)
+
+    def _fill(self, order, qty, price, maker):
+        if qty <= 0:
+            return
+        super()._fill(order, qty, price, maker)
+        self.market.on_fill(order, qty, price, maker, self.fills[-1][4])
+
+
+class SimulatedMarket:
+    """
+    One simulated symbol: the market order book fed by a feed, plus the account's orders on it.
+
+    The market book is the external liquidity only; the account's own orders
+    are matched against it but do not appear in the published depth.
+    """
+
+    def __init__(self, simulator, symbol, tick_size, step_size, min_qty=0.0, min_notional=0.0,
+                 maker_fee=0.001, taker_fee=0.001):
+        self.simulator = simulator
+        self.pair = symbol
+        self.base_asset, self.quote_asset = symbol[:-4], symbol[-4:]
+        self.tick_size = tick_size
+        self.step_size = step_size
+        self.min_qty = min_qty
+        self.min_notional = min_notional
+        self.active_orders = {}  # Order ID -> open order (the engine removes filled ones)
+        self.engine = MatchingEngine(self, maker_fee, taker_fee)
+        self.book = self.engine.book
+        self.top_of_book = None  # (bid, bid qty, ask, ask qty) last published
+        self._trade_ids = itertools.count(1)
+        name = symbol.lower()
+        self.book_ticker_streams = (f"{name}@bookTicker",)
+        self.depth_streams = (f"{name}@depth", f"{name}@depth@100ms")
+
+    def symbol_info(self):
+        """Return the exchangeInfo entry for the symbol."""
+        return {
+            "symbol": self.pair,
+            "status": "TRADING",
+            "baseAsset": self.base_asset,
+            "baseAssetPrecision": 8,
+            "quoteAsset": self.quote_asset,
+            "quotePrecision": 8,
+            "quoteAssetPrecision": 8,
+            "orderTypes": ["LIMIT", "LIMIT_MAKER", "MARKET"],
+            "isSpotTradingAllowed": True,
+            "permissions": ["SPOT"],
+            "filters": [
+                {"filterType": "PRICE_FILTER", "minPrice": _fmt(self.tick_size), "maxPrice": _fmt(1e9),
+                 "tickSize": _fmt(self.tick_size)},
+                {"filterType": "LOT_SIZE", "minQty": _fmt(self.min_qty), "maxQty": _fmt(1e10),
+                 "stepSize": _fmt(self.step_size)},
+                {"filterType": "NOTIONAL", "minNotional": _fmt(self.min_notional), "applyMinToMarket": True,
+                 "maxNotional": _fmt(1e12), "applyMaxToMarket": False, "avgPriceMins": 5},
+            ],
+        }
+
+    # Market data, driven by a feed
+
+    def load_snapshot(self, snapshot):
+        """Replace the market book with a depth snapshot (REST layout)."""
+        self.engine.step()
+        self.book.load_snapshot(snapshot)
+        self.engine.on_depth()
+
+    def apply_diff(self, event):
+        """Apply a depthUpdate event to the market book and publish it."""
+        if self.book.last_update_id is None:
+            return  # Waiting for a snapshot
+        self.engine.step()
+        try:
+            if not self.book.apply_update(event):
+                return
+        except OrderBookOutOfSync as e:
+            print(f"{self.pair} feed has a gap ({e}), waiting for the next snapshot")
+            self.book.clear()
+            return
+        if self.simulator.has_subscribers(self.depth_streams):
+            self.simulator.publish(self.depth_streams, {
+                "e": "depthUpdate", "E": _ms(), "s": self.pair, "U": event["U"], "u": event["u"],
+                "b": _levels(event["b"]), "a": _levels(event["a"]),
+            })
+        self.engine.on_depth()
+
+    def set_top_of_book(self, bid, bid_qty, ask, ask_qty, update_id):
+        """Publish a new best bid and offer, filling orders the market has traded through."""
+        self.engine.step()
+        self.top_of_book = (bid, bid_qty, ask, ask_qty)
+        if self.simulator.has_subscribers(self.book_ticker_streams):
+            self.simulator.publish(self.book_ticker_streams, {
+                "u": update_id, "s": self.pair,
+                "b": _fmt(bid), "B": _fmt(bid_qty), "a": _fmt(ask), "A": _fmt(ask_qty),
+            })
+        self.engine.on_top_of_book(bid, ask)
+
+    def publish_book_top(self):
+        """Publish the top of the market book if it changed (for feeds without their own bookTicker)."""
+        bid, ask = self.book.best_bid(), self.book.best_ask()
+        if bid is None or ask is None:
+            return
+        top = (bid[0], bid[1], ask[0], ask[1])
+        if top != self.top_of_book:
+            self.set_top_of_book(*top, self.book.last_update_id)
+
+    def depth(self, limit=100):
+        """Return the market book in the GET /api/v3/depth layout."""
+        if self.book.last_update_id is None:
+            raise SimulatorError(-1003, f"No market data for {self.pair} yet", status=503)
+        return {
+            "lastUpdateId": self.book.last_update_id,
+            "bids": _levels(self.book.bids.levels(limit)),
+            "asks": _levels(self.book.asks.levels(limit)),
+        }
+
+    # Orders
+
+    def new_order(self, side, order_type, quantity, price=None, client_order_id=None, time_in_force="GTC"):
+        """
+        Validate and place an order, matching it at once if it is marketable.
+
+        Raises:
+            SimulatorError: If Binance would reject the order.
+        """
+        if side not in ("BUY", "SELL"):
+            raise SimulatorError(-1117, "Invalid side.")
+        if order_type not in ("LIMIT", "LIMIT_MAKER", "MARKET"):
+            raise SimulatorError(-1116, "Invalid orderType.")
+        is_buy = side == "BUY"
+        if order_type == "MARKET":
+            opposite = self.engine.best_ask if is_buy else self.engine.best_bid
+            if opposite is None:
+                raise SimulatorError(-2010, "Market is closed.")
+            # Marketable at any price, so it fills in full as taker on arrival
+            limit_price, check_price = (math.inf, opposite) if is_buy else (0.0, opposite)
+        else:
+            if price is None:
+                raise SimulatorError(-1102, "Mandatory parameter 'price' was not sent, was empty/null, or malformed.")
+            if not _on_grid(price, self.tick_size):
+                raise SimulatorError(-1013, "Filter failure: PRICE_FILTER")
+            if order_type == "LIMIT_MAKER":
+                opposite = self.engine.best_ask if is_buy else self.engine.best_bid
+                if opposite is not None and (price >= opposite if is_buy else price <= opposite):
+                    raise SimulatorError(-2010, "Order would immediately match and take.")
+            limit_price = check_price = price
+        if quantity < self.min_qty or not _on_grid(quantity, self.step_size):
+            raise SimulatorError(-1013, "Filter failure: LOT_SIZE")
+        if quantity * check_price < self.min_notional:
+            raise SimulatorError(-1013, "Filter failure: NOTIONAL")
+        asset, needed = (self.quote_asset, quantity * check_price) if is_buy else (self.base_asset, quantity)
+        if self.simulator.free_balance(asset) < needed - 1e-9:
+            raise SimulatorError(-2010, "Account has insufficient balance for requested action.")
+
+        order = self.engine.submit(self, side, limit_price, quantity)
+        order.update({
+            "type": order_type,
+            "timeInForce": "GTC" if order_type == "MARKET" else time_in_force,
+            "clientOrderId": client_order_id or f"sim{order['orderId']}",
+            "time": _ms(),
+            "_quote_qty": 0.0,
+            "_fills": [],
+        })
+        self.active_orders[order["orderId"]] = order
+        self.engine.step()
+        return order
+
+    def find_order(self, order_id=None, client_order_id=None):
+        """Return an open order by ID or client order ID."""
+        if order_id is not None:
+            order = self.active_orders.get(int(order_id))
+        else:
+            order = next((o for o in self.active_orders.values() if o["clientOrderId"] == client_order_id), None)
+        if order is None:
+            raise SimulatorError(-2011, "Unknown order sent.")
+        return order
+
+    def cancel_order(self, order):
+        """Cancel an open order."""
+        self.engine.cancel(order)
+        self.engine.step()
+        self.active_orders.pop(order["orderId"], None)
+        self.simulator.on_order_update(self, order, "CANCELED")
+        return order
+
+    def on_fill(self, order, qty, price, maker, fee):
+        trade_id = next(self._trade_ids)
+        order["_quote_qty"] += qty * price
+        order["_fills"].append({
+            "price": _fmt(price), "qty": _fmt(qty), "commission": _fmt(fee),
+            "commissionAsset": self.quote_asset, "tradeId": trade_id,
+        })
+        self.simulator.on_fill(self, order, qty, price, fee)
+        self.simulator.on_order_update(self, order, "TRADE", qty, price, fee, trade_id, maker)
+
+    def order_response(self, order):
+        """Return an order in the REST layout."""
+        return {
+            "symbol": self.pair,
+            "orderId": order["orderId"],
+            "orderListId": -1,
+            "clientOrderId": order["clientOrderId"],
+            "transactTime": _ms(),
+            "price": _fmt(0.0 if order["type"] == "MARKET" else order["price"]),
+            "origQty": _fmt(order["origQty"]),
+            "executedQty": _fmt(order["executedQty"]),
+            "cummulativeQuoteQty": _fmt(order["_quote_qty"]),
+            "status": order["status"],
+            "timeInForce": order["timeInForce"],
+            "type": order["type"],
+            "side": order["side"],
+            "time": order["time"],
+            "updateTime": _ms(),
+            "isWorking": order["status"] in OPEN_ORDER_STATUSES,
+            "workingTime": order["time"],
+            "selfTradePreventionMode": "NONE",
+            "fills": order["_fills"],
+        }
+
+
+class StreamClient:
+    """
+    One websocket client of the simulator.
+
+    Frames are queued and written by a task of the client's own, so a slow
+    reader never holds up the feed; like Binance, a client that falls too far
+    behind is disconnected.
+    """
+
+    def __init__(self, websocket, combined):
+        self.websocket = websocket
+        self.combined = combined  # /stream clients get {"stream": ..., "data": ...} frames
+        self.streams = set()
+        self.queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.closed = False
+
+    def send(self, frame):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.closed = True
+            asyncio.ensure_future(self.websocket.close(code=1008, message=b"Client too slow"))
+
+    async def write(self):
+        while True:
+            frame = await self.queue.get()
+            await self.websocket.send_str(frame)
+
+
+class ExchangeSimulator:
+    """
+    Local stand-in for the Binance spot REST and websocket APIs.
+
+    Serves the order, open orders, account, exchangeInfo, depth and user data
+    stream endpoints plus the @bookTicker, @depth and user data websocket
+    streams (raw /ws and combined /stream), for one account, over a matching
+    engine fed by synthetic or recorded market data. Point ConfigManager's
+    'sim' environment at it to run the full stack offline.
+    """
+
+    def __init__(self, balances=None):
+        """
+        Args:
+            balances (dict, optional): Starting balance per asset. Assets not listed start at DEFAULT_BALANCE.
+        """
+        self.markets = {}  # Symbol -> SimulatedMarket
+        self.feeds = {}  # Symbol -> feed
+        self.balances = dict(balances or {})
+        self.subscribers = {}  # Stream name -> set of StreamClient
+        self.user_clients = set()
+        self.listen_keys = set()
+        self.app = web.Application(middlewares=[self._binance_errors])
+        self._add_routes()
+
+    def add_market(self, feed, symbol, tick_size, step_size, **kwargs):
+        """
+        Add a symbol.
+
+        Args:
+            feed: SyntheticFeed or RecordedFeed driving the market book.
+            symbol (str): e.g. 'DOGEUSDT'.
+            tick_size (float): Price tick.
+            step_size (float): Quantity step.
+            **kwargs: min_qty, min_notional, maker_fee and taker_fee for SimulatedMarket.
+        """
+        market = SimulatedMarket(self, symbol.upper(), tick_size, step_size, **kwargs)
+        self.markets[market.pair] = market
+        self.feeds[market.pair] = feed
+        for asset in (market.base_asset, market.quote_asset):
+            self.balances.setdefault(asset, DEFAULT_BALANCE)
+        return market
+
+    # Account
+
+    def locked_balance(self, asset):
+        locked = 0.0
+        for market in self.markets.values():
+            for order in market.active_orders.values():
+                remaining = order["origQty"] - order["executedQty"]
+                if order["side"] == "BUY" and market.quote_asset == asset and order["type"] != "MARKET":
+                    locked += remaining * order["price"]
+                elif order["side"] == "SELL" and market.base_asset == asset:
+                    locked += remaining
+        return locked
+
+    def free_balance(self, asset):
+        return self.balances.get(asset, 0.0) - self.locked_balance(asset)
+
+    def _balance(self, asset):
+        locked = self.locked_balance(asset)
+        return self.balances.get(asset, 0.0) - locked, locked
+
+    def on_fill(self, market, order, qty, price, fee):
+        sign = 1 if order["side"] == "BUY" else -1
+        self.balances[market.base_asset] += sign * qty
+        self.balances[market.quote_asset] -= sign * qty * price + fee
+
+    def on_order_update(self, market, order, execution_type, last_qty=0.0, last_price=0.0, fee=0.0,
+                        trade_id=-1, maker=False):
+        """Send an executionReport, and the balances it changed, on the user data stream."""
+        if not self.user_clients:
+            return
+        now_ms = _ms()
+        self._publish_user({
+            "e": "executionReport", "E": now_ms, "s": market.pair, "c": order["clientOrderId"],
+            "S": order["side"], "o": order["type"], "f": order["timeInForce"],
+            "q": _fmt(order["origQty"]), "p": _fmt(0.0 if order["type"] == "MARKET" else order["price"]),
+            "P": _fmt(0.0), "F": _fmt(0.0), "g": -1, "C": "", "x": execution_type, "X": order["status"],
+            "r": "NONE", "i": order["orderId"], "l": _fmt(last_qty), "z": _fmt(order["executedQty"]),
+            "L": _fmt(last_price), "n": _fmt(fee), "N": market.quote_asset if fee else None, "T": now_ms,
+            "t": trade_id, "w": order["status"] in OPEN_ORDER_STATUSES, "m": maker, "M": False,
+            "O": order["time"], "Z": _fmt(order["_quote_qty"]), "Y": _fmt(last_qty * last_price),
+            "Q": _fmt(0.0),
+        })
+        balances = []
+        for asset in (market.base_asset, market.quote_asset):
+            free, locked = self._balance(asset)
+            balances.append({"a": asset, "f": _fmt(free), "l": _fmt(locked)})
+        self._publish_user({"e": "outboundAccountPosition", "E": now_ms, "u": now_ms, "B": balances})
+
+    # Streams
+
+    def has_subscribers(self, streams):
+        return any(self.subscribers.get(name) for name in streams)
+
+    def publish(self, streams, payload):
+        """Send a market data payload to every client of the given streams, serialized once."""
+        raw = json.dumps(payload, separators=(",", ":"))
+        for name in streams:
+            clients = self.subscribers.get(name)
+            if not clients:
+                continue
+            combined = None
+            for client in clients:
+                if client.combined:
+                    if combined is None:
+                        combined = f'{{"stream":"{name}","data":{raw}}}'
+                    client.send(combined)
+                else:
+                    client.send(raw)
+
+    def _publish_user(self, payload):
+        raw = json.dumps(payload, separators=(",", ":"))
+        for client in self.user_clients:
+            client.send(raw)
+
+    def _subscribe(self, client, streams):
+        for name in streams:
+            if name in self.listen_keys:
+                self.user_clients.add(client)
+            else:
+                self.subscribers.setdefault(name, set()).add(client)
+            client.streams.add(name)
+
+    def _unsubscribe(self, client, streams):
+        for name in streams:
+            self.subscribers.get(name, set()).discard(client)
+            client.streams.discard(name)
+        if not client.streams & self.listen_keys:
+            self.user_clients.discard(client)
+
+    async def _handle_websocket(self, request, streams, combined):
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        client = StreamClient(websocket, combined)
+        self._subscribe(client, streams)
+        writer = asyncio.create_task(client.write())
+        try:
+            async for message in websocket:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    control = json.loads(message.data)
+                    method, params = control["method"], control.get("params", [])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if method == "SUBSCRIBE":
+                    self._subscribe(client, params)
+                    result = None
+                elif method == "UNSUBSCRIBE":
+                    self._unsubscribe(client, params)
+                    result = None
+                elif method == "LIST_SUBSCRIPTIONS":
+                    result = sorted(client.streams)
+                else:
+                    continue
+                client.send(json.dumps({"result": result, "id": control.get("id")}))
+        finally:
+            self._unsubscribe(client, list(client.streams))
+            writer.cancel()
+        return websocket
+
+    # REST
+
+    @web.middleware
+    async def _binance_errors(self, request, handler):
+        try:
+            return await handler(request)
+        except SimulatorError as e:
+            return web.json_response({"code": e.code, "msg": str(e)}, status=e.status)
+        except (KeyError, ValueError) as e:
+            return web.json_response({"code": -1102, "msg": f"Missing or malformed parameter: {e}"}, status=400)
+
+    @staticmethod
+    async def _params(request):
+        # Signed parameters arrive in the query string (OrderGateway) or a form body (python-binance)
+        params = dict(request.query)
+        if request.can_read_body:
+            params.update(await request.post())
+        return params
+
+    def _market(self, params):
+        market = self.markets.get(params.get("symbol", "").upper())
+        if market is None:
+            raise SimulatorError(-1121, "Invalid symbol.")
+        return market
+
+    def _add_routes(self):
+        api = "/api/v3"
+        self.app.add_routes([
+            web.get(f"{api}/ping", self._ping),
+            web.get(f"{api}/time", self._time),
+            web.get(f"{api}/exchangeInfo", self._exchange_info),
+            web.get(f"{api}/depth", self._depth),
+            web.post(f"{api}/order", self._new_order),
+            web.get(f"{api}/order", self._query_order),
+            web.delete(f"{api}/order", self._cancel_order),
+            web.post(f"{api}/order/cancelReplace", self._cancel_replace),
+            web.get(f"{api}/openOrders", self._open_orders),
+            web.delete(f"{api}/openOrders", self._cancel_open_orders),
+            web.get(f"{api}/account", self._account),
+            web.post(f"{api}/userDataStream", self._new_listen_key),
+            web.put(f"{api}/userDataStream", self._keepalive_listen_key),
+            web.delete(f"{api}/userDataStream", self._close_listen_key),
+            web.get("/ws", self._raw_stream),
+            web.get("/ws/{streams}", self._raw_stream),
+            web.get("/stream", self._combined_stream),
+        ])
+
+    async def _ping(self, request):
+        return web.json_response({})
+
+    async def _time(self, request):
+        return web.json_response({"serverTime": _ms()})
+
+    async def _exchange_info(self, request):
+        symbols = list(self.markets)
+        if "symbol" in request.query:
+            symbols = [self._market(request.query).pair]
+        elif "symbols" in request.query:
+            symbols = [self._market({"symbol": s}).pair for s in json.loads(request.query["symbols"])]
+        return web.json_response({
+            "timezone": "UTC",
+            "serverTime": _ms(),
+            "rateLimits": [],
+            "exchangeFilters": [],
+            "symbols": [self.markets[symbol].symbol_info() for symbol in symbols],
+        })
+
+    async def _depth(self, request):
+        market = self._market(request.query)
+        return web.json_response(market.depth(int(request.query.get("limit", 100))))
+
+    async def _new_order(self, request):
+        params = await self._params(request)
+        market = self._market(params)
+        order = market.new_order(
+            params["side"], params["type"], float(params["quantity"]),
+            float(params["price"]) if "price" in params else None,
+            params.get("newClientOrderId"), params.get("timeInForce", "GTC"),
+        )
+        return web.json_response(market.order_response(order))
+
+    async def _query_order(self, request):
+        params = await self._params(request)
+        market = self._market(params)
+        order = market.find_order(params.get("orderId"), params.get("origClientOrderId"))
+        return web.json_response(market.order_response(order))
+
+    async def _cancel_order(self, request):
+        params = await self._params(request)
+        market = self._market(params)
+        order = market.cancel_order(market.find_order(params.get("orderId"), params.get("origClientOrderId")))
+        return web.json_response(market.order_response(order))
+
+    async def _cancel_replace(self, request):
+        params = await self._params(request)
+        market = self._market(params)
+        try:
+            cancelled = market.cancel_order(
+                market.find_order(params.get("cancelOrderId"), params.get("cancelOrigClientOrderId"))
+            )
+        except SimulatorError as e:
+            # STOP_ON_FAILURE: the new order is not placed when the cancel fails
+            return web.json_response({"code": -2022, "msg": "Order cancel-replace failed.", "data": {
+                "cancelResult": "FAILURE", "newOrderResult": "NOT_ATTEMPTED",
+                "cancelResponse": {"code": e.code, "msg": str(e)}, "newOrderResponse": None,
+            }}, status=400)
+        try:
+            order = market.new_order(
+                params["side"], params["type"], float(params["quantity"]),
+                float(params["price"]) if "price" in params else None,
+                params.get("newClientOrderId"), params.get("timeInForce", "GTC"),
+            )
+        except SimulatorError as e:
+            return web.json_response({"code": -2021, "msg": "Order cancel-replace partially failed.", "data": {
+                "cancelResult": "SUCCESS", "newOrderResult": "FAILURE",
+                "cancelResponse": market.order_response(cancelled),
+                "newOrderResponse": {"code": e.code, "msg": str(e)},
+            }}, status=400)
+        return web.json_response({
+            "cancelResult": "SUCCESS", "newOrderResult": "SUCCESS",
+            "cancelResponse": market.order_response(cancelled),
+            "newOrderResponse": market.order_response(order),
+        })
+
+    async def _open_orders(self, request):
+        params = await self._params(request)
+        markets = [self._market(params)] if "symbol" in params else list(self.markets.values())
+        return web.json_response([
+            market.order_response(order) for market in markets for order in list(market.active_orders.values())
+        ])
+
+    async def _cancel_open_orders(self, request):
+        params = await self._params(request)
+        market = self._market(params)
+        cancelled = [market.cancel_order(order) for order in list(market.active_orders.values())]
+        return web.json_response([market.order_response(order) for order in cancelled])
+
+    async def _account(self, request):
+        balances = []
+        for asset in sorted(self.balances):
+            free, locked = self._balance(asset)
+            balances.append({"asset": asset, "free": _fmt(free), "locked": _fmt(locked)})
+        return web.json_response({
+            "makerCommission": 10, "takerCommission": 10, "buyerCommission": 0, "sellerCommission": 0,
+            "canTrade": True, "canWithdraw": True, "canDeposit": True, "brokered": False,
+            "updateTime": _ms(), "accountType": "SPOT", "balances": balances, "permissions": ["SPOT"],
+        })
+
+    async def _new_listen_key(self, request):
+        listen_key = secrets.token_hex(32)
+        self.listen_keys.add(listen_key)
+        return web.json_response({"listenKey": listen_key})
+
+    async def _keepalive_listen_key(self, request):
+        params = await self._params(request)
+        if params.get("listenKey") not in self.listen_keys:
+            raise SimulatorError(-1125, "This listenKey does not exist.")
+        return web.json_response({})
+
+    async def _close_listen_key(self, request):
+        params = await self._params(request)
+        self.listen_keys.discard(params.get("listenKey"))
+        return web.json_response({})
+
+    async def _raw_stream(self, request):
+        streams = request.match_info.get("streams")
+        return await self._handle_websocket(request, streams.split("/") if streams else [], combined=False)
+
+    async def _combined_stream(self, request):
+        streams = request.query.get("streams")
+        return await self._handle_websocket(request, streams.split("/") if streams else [], combined=True)
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """Run the feeds and serve the API until cancelled."""
+        runner = web.AppRunner(self.app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        print(f"Exchange simulator listening on http://{host}:{port} for {', '.join(self.markets)}")
+        try:
+            await asyncio.gather(*(feed.run(self.markets[symbol]) for symbol, feed in self.feeds.items()))
+            await asyncio.Future()  # Keep serving once recorded feeds have finished
+        finally:
+            await runner.cleanup()
+
+
+class SyntheticFeed:
+    """
+    Random-walk market data: the touch moves a tick at a time and level sizes churn.
+
+    Each step is published as one depthUpdate with consecutive update IDs,
+    and as a bookTicker whenever the best bid or offer changes.
+    """
+
+    def __init__(self, price, rate=50.0, depth=50, spread_ticks=1, move_probability=0.1, churn=3,
+                 max_lots=1000, seed=None):
+        """
+        Args:
+            price (float): Starting best bid.
+            rate (float): Depth updates per second.
+            depth (int): Levels per side.
+            spread_ticks (int): Distance in ticks between the best bid and best ask.
+            move_probability (float): Chance per update that the touch moves one tick.
+            churn (int): Levels per side whose size changes in each update.
+            max_lots (int): Largest level size, in quantity steps.
+            seed (int, optional): Seed for a repeatable feed.
+        """
+        self.price = price
+        self.rate = rate
+        self.depth = depth
+        self.spread_ticks = spread_ticks
+        self.move_probability = move_probability
+        self.churn = churn
+        self.max_lots = max_lots
+        self.rng = random.Random(seed)
+
+    async def run(self, market):
+        tick, step = market.tick_size, market.step_size
+        bid_tick = round(self.price / tick)
+        bids, asks = {}, {}  # Price in ticks -> qty
+        update_id = 1
+
+        def qty():
+            return round(self.rng.randint(1, self.max_lots) * step, 10)
+
+        def step_side(levels, wanted):
+            changes = {}
+            for level in list(levels):
+                if level not in wanted:
+                    del levels[level]
+                    changes[level] = 0.0
+            for level in wanted:
+                if level not in levels:
+                    levels[level] = changes[level] = qty()
+            for _ in range(self.churn):
+                level = self.rng.choice(wanted)
+                levels[level] = changes[level] = qty()
+            return [[round(level * tick, 10), q] for level, q in changes.items()]
+
+        def wanted_levels():
+            ask_tick = bid_tick + self.spread_ticks
+            return range(bid_tick - self.depth + 1, bid_tick + 1), range(ask_tick, ask_tick + self.depth)
+
+        wanted_bids, wanted_asks = wanted_levels()
+        step_side(bids, wanted_bids)
+        step_side(asks, wanted_asks)
+        market.load_snapshot({
+            "lastUpdateId": update_id,
+            "bids": [[round(level * tick, 10), q] for level, q in bids.items()],
+            "asks": [[round(level * tick, 10), q] for level, q in asks.items()],
+        })
+        market.publish_book_top()
+
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.rate
+        next_time = loop.time()
+        while True:
+            next_time += interval
+            await asyncio.sleep(max(next_time - loop.time(), 0))
+            if self.rng.random() < self.move_probability:
+                bid_tick += self.rng.choice((-1, 1))
+            wanted_bids, wanted_asks = wanted_levels()
+            update_id += 1
+            market.apply_diff({
+                "e": "depthUpdate", "E": _ms(), "s": market.pair, "U": update_id, "u": update_id,
+                "b": step_side(bids, wanted_bids), "a": step_side(asks, wanted_asks),
+            })
+            market.publish_book_top()
+
+
+class RecordedFeed:
+    """Market data replayed from a recording (see recorder.py), on the wall clock or faster."""
+
+    def __init__(self, reader, speed=1.0):
+        """
+        Args:
+            reader (MarketDataReader): The recording.
+            speed (float, optional): 1 for real time, N for N times faster, None for as fast as possible.
+        """
+        self.reader = reader
+        self.speed = speed
+
+    async def run(self, market):
+        events = heapq.merge(
+            ((ts, TOP_OF_BOOK_EVENT, update) for ts, update in self.reader.book_ticker_events()),
+            self.reader.depth_events(),
+            key=lambda item: item[0],
+        )
+        loop = asyncio.get_running_loop()
+        first_ts = clock_start = None
+        for ts, kind, payload in events:
+            if self.speed:
+                if first_ts is None:
+                    first_ts, clock_start = ts, loop.time()
+                delay = clock_start + (ts - first_ts) / 1e9 / self.speed - loop.time()
+                await asyncio.sleep(max(delay, 0))
+            else:
+                await asyncio.sleep(0)  # Let the server handle requests
+            if kind == TOP_OF_BOOK_EVENT:
+                market.set_top_of_book(
+                    payload.best_bid_price, payload.best_bid_qty,
+                    payload.best_ask_price, payload.best_ask_qty, payload.update_id,
+                )
+            elif kind == SNAPSHOT:
+                market.load_snapshot(payload)
+            elif kind == DIFF:
+                market.apply_diff(payload)
+        print(f"{market.pair} recording finished")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Binance exchange simulator")
+    parser.add_argument(
+        "--pair", action="append", required=True, help="Symbol to simulate, repeatable (e.g., DOGEUSDT)"
+    )
+    parser.add_argument("--tick-size", type=float, default=0.01, help="Price tick size (default: 0.01)")
+    parser.add_argument("--step-size", type=float, default=1.0, help="Quantity step size (default: 1)")
+    parser.add_argument("--min-notional", type=float, default=0.0, help="Minimum order value (default: 0)")
+    parser.add_argument("--price", type=float, default=100.0, help="Starting price of synthetic data")
+    parser.add_argument("--rate", type=float, default=50.0, help="Synthetic depth updates per second (default: 50)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for repeatable synthetic data")
+    parser.add_argument("--replay", metavar="DIR", help="Serve a recording from this directory instead")
+    parser.add_argument(
+        "--speed", type=float, default=1.0,
+        help="Replay speed: 1 for real time, N for N times faster, 0 for as fast as possible (default: 1)"
+    )
+    parser.add_argument("--maker-fee", type=float, default=0.001, help="Maker fee rate")
+    parser.add_argument("--taker-fee", type=float, default=0.001, help="Taker fee rate")
+    parser.add_argument(
+        "--balance", action="append", default=[], metavar="ASSET=AMOUNT",
+        help=f"Starting balance, repeatable (default: {DEFAULT_BALANCE} of every asset)"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    args = parser.parse_args()
+
+    balances = {}
+    for spec in args.balance:
+        asset, _, amount = spec.partition("=")
+        balances[asset.upper()] = float(amount)
+    simulator = ExchangeSimulator(balances)
+    for i, pair in enumerate(args.pair):
+        pair = pair.upper()
+        if args.replay:
+            feed = RecordedFeed(MarketDataReader(args.replay, pair), speed=args.speed or None)
+        else:
+            feed = SyntheticFeed(args.price, rate=args.rate, seed=None if args.seed is None else args.seed + i)
+        simulator.add_market(
+            feed, pair, args.tick_size, args.step_size, min_notional=args.min_notional,
+            maker_fee=args.maker_fee, taker_fee=args.taker_fee,
+        )
+    asyncio.run(simulator.serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import asyncio
+import os
+import time
+from tabulate import tabulate
+
+# Sub-buckets per power of two; 32 keeps every bucket within ~3% of its values
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+
+def now():
+    """Monotonic timestamp in nanoseconds used for every stage measurement."""
+    return time.perf_counter_ns()
+
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of nanosecond latencies.
+
+    Values are grouped by power of two and split linearly into SUB_BUCKETS
+    within each power, so recording is O(1), memory is fixed, and percentiles
+    keep a constant relative precision from nanoseconds to seconds.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (64 * SUB_BUCKETS)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def _index(value):
+        if value < SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS - 1
+        return (shift + 1) * SUB_BUCKETS + ((value >> shift) - SUB_BUCKETS)
+
+    @staticmethod
+    def _upper_bound(index):
+        if index < SUB_BUCKETS:
+            return index
+        shift = index // SUB_BUCKETS - 1
+        return ((index % SUB_BUCKETS + SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, value):
+        """Record one latency in nanoseconds (negative values are clamped to zero)."""
+        value = max(0, int(value))
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """Return the latency at percentile p (0-100) in nanoseconds."""
+        if not self.count:
+            return 0
+        target = max(1, int(round(self.count * p / 100)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def merge(self, other):
+        """Add another histogram's samples to this one."""
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def summary(self):
+        """Return count, mean and p50/p99/p999/max in microseconds."""
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count / 1e3 if self.count else 0,
+            "p50_us": self.percentile(50) / 1e3,
+            "p99_us": self.percentile(99) / 1e3,
+            "p999_us": self.percentile(99.9) / 1e3,
+            "max_us": self.max / 1e3,
+        }
+
+
+class LatencyTracker:
+    """
+    Per-stage, per-symbol latency histograms for the tick-to-trade pipeline.
+
+    Call sites check `enabled` before taking timestamps, so a disabled tracker
+    costs one attribute lookup per message.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}  # (stage, symbol) -> LatencyHistogram
+        self.clock_offset_ns = 0  # Local wall clock minus exchange clock
+
+    def record(self, stage, symbol, latency_ns):
+        """Record a stage latency in nanoseconds."""
+        key = (stage, symbol)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.record(latency_ns)
+
+    def record_since(self, stage, symbol, start_ns):
+        """Record the time elapsed since a now() timestamp."""
+        self.record(stage, symbol, now() - start_ns)
+
+    def record_exchange(self, stage, symbol, event_time_ms):
+        """Record the delay between an exchange event time (ms) and now, corrected for clock offset."""
+        self.record(stage, symbol, time.time_ns() - event_time_ms * 1_000_000 - self.clock_offset_ns)
+
+    def set_clock_offset(self, server_time_ms, request_sent_ns, response_received_ns):
+        """
+        Update the local-minus-exchange clock offset from a server time request.
+
+        Args:
+            server_time_ms (int): serverTime from GET /api/v3/time.
+            request_sent_ns (int): time.time_ns() when the request was sent.
+            response_received_ns (int): time.time_ns() when the response arrived.
+        """
+        midpoint_ns = (request_sent_ns + response_received_ns) // 2
+        self.clock_offset_ns = midpoint_ns - server_time_ms * 1_000_000
+
+    async def sync_clock_periodically(self, rest_api, interval=300):
+        """Keep the clock offset current from the exchange server time (BinanceRestAPI)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                sent_ns = time.time_ns()
+                server_time = await loop.run_in_executor(None, rest_api.get_server_time)
+                self.set_clock_offset(server_time["serverTime"], sent_ns, time.time_ns())
+            except Exception as e:
+                print(f"Error syncing clock offset: {e}")
+            await asyncio.sleep(interval)
+
+    def reset(self):
+        """Drop all recorded samples."""
+        self.histograms.clear()
+
+    def snapshot(self):
+        """Return {stage: {symbol: summary}} for every recorded stage, plus an all-symbols row."""
+        stages = {}
+        for (stage, symbol), histogram in sorted(self.histograms.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            stages.setdefault(stage, {})[symbol or "*"] = histogram.summary()
+        for stage, by_symbol in stages.items():
+            if len(by_symbol) > 1:
+                combined = LatencyHistogram()
+                for (name, _), histogram in self.histograms.items():
+                    if name == stage:
+                        combined.merge(histogram)
+                by_symbol["*"] = combined.summary()
+        return stages
+
+    def report(self):
+        """Return the latency table as text."""
+        rows = []
+        for stage, by_symbol in self.snapshot().items():
+            for symbol, s in by_symbol.items():
+                rows.append([
+                    stage, symbol, s["count"], f"{s['p50_us']:.1f}", f"{s['p99_us']:.1f}",
+                    f"{s['p999_us']:.1f}", f"{s['max_us']:.1f}",
+                ])
+        return tabulate(
+            rows, headers=["Stage", "Symbol", "Count", "p50 us", "p99 us", "p999 us", "max us"], tablefmt="grid"
+        )
+
+    def prometheus(self):
+        """Return the histograms in Prometheus text exposition format (as summaries)."""
+        lines = ["# TYPE trading_latency_seconds summary"]
+        for stage, by_symbol in self.snapshot().items():
+            for symbol, s in by_symbol.items():
+                labels = f'stage="{stage}",symbol="{symbol}"'
+                for quantile, key in (("0.5", "p50_us"), ("0.99", "p99_us"), ("0.999", "p999_us")):
+                    lines.append(f'trading_latency_seconds{{{labels},quantile="{quantile}"}} {s[key] / 1e6:.9f}')
+                lines.append(f"trading_latency_seconds_count{{{labels}}} {s['count']}")
+        return "\n".join(lines) + "\n"
+
+    async def report_periodically(self, interval=60):
+        """Print the latency report every interval seconds."""
+        while True:
+            await asyncio.sleep(interval)
+            if self.histograms:
+                print(self.report())
+
+    async def serve(self, host="127.0.0.1", port=9100):
+        """Serve /metrics (Prometheus text) on a local port until cancelled."""
+        async def handle(reader, writer):
+            try:
+                request_line = await reader.readline()
+                while (await reader.readline()).strip():
+                    pass  # Skip the request headers
+                path = request_line.split()[1].decode() if len(request_line.split()) > 1 else "/"
+                if path == "/metrics":
+                    status, body = "200 OK", self.prometheus()
+                else:
+                    status, body = "404 Not Found", "Not found\n"
+                payload = body.encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                    f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(handle, host, port)
+        print(f"Latency metrics served on http://{host}:{port}/metrics")
+        async with server:
+            await server.serve_forever()
+
+
+# Shared tracker; enable with TRADING_LATENCY=1 or tracker.enabled = True
+tracker = LatencyTracker(enabled=os.environ.get("TRADING_LATENCY") == "1")
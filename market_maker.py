@@ -1,121 +1,187 @@
 import asyncio
 import argparse
-from data_manager import DataManager
-from streamers import stream_book_ticker, stream_depth
-from binance.client import Client
-from utils import load_api_keys, get_tick_size
-from order_manager import OrderManager
-
-def submit_orders(top_of_book, order_book_depth):
-    """Perform order submission logic."""
-    # Initialize client
-    client = Client(API_KEY, API_SECRET, testnet=(env == "testnet"))
-
-    # Initialize OrderManager
-    order_manager = OrderManager(client, top_of_book["symbol"])
-
-    # Get current position using OrderManager
-    
-    
-    
-    
-    
-    # ISSUE IS HERE
-    position = order_manager.get_position()
-    print(f"Current Position: {position}")
-
-
-
-
-
-
-
-
-    # Get current orders using OrderManager
-    current_orders = order_manager.get_active_orders()
-    print(f"Current Orders: {current_orders}")
-    
-    # Get tick size for the trading pair
-    tick_size = get_tick_size(client, top_of_book["symbol"])
-    if tick_size is None:
-        print(f"Unable to retrieve tick size for {top_of_book['symbol']}.")
-        return
-
-    # Define order parameters
-    desired_order_size = 100  # Desired total order size
-    spread = 0.001            # Spread as a fraction of price
-
-    best_bid_price = float(top_of_book.get("best_bid_price", 0))
-    best_ask_price = float(top_of_book.get("best_ask_price", 0))
-
-    # Ensure we have valid top-of-book data
-    if best_bid_price <= 0 or best_ask_price <= 0:
-        print("Invalid top-of-book data.")
-        return
-
-    # Calculate bid and ask prices, rounded to the tick size
-    best_bid_price = float(top_of_book.get("best_bid_price", 0))
-    best_ask_price = float(top_of_book.get("best_ask_price", 0))
-    if best_bid_price == 0 or best_ask_price == 0:
-        return
-
-    # Check if current orders are at the top of the order book
-    existing_bid = next((o for o in current_orders if o['side'] == 'BUY' and float(o['price']) == best_bid_price), None)
-    existing_ask = next((o for o in current_orders if o['side'] == 'SELL' and float(o['price']) == best_ask_price), None)
-
-    # Calculate remaining sizes for each side
-    remaining_bid_size = desired_order_size
-    if existing_bid:
-        existing_bid_size = float(existing_bid['origQty']) - float(existing_bid['executedQty'])
-        remaining_bid_size = max(0, desired_order_size - existing_bid_size)
-
-    remaining_ask_size = desired_order_size
-    if existing_ask:
-        existing_ask_size = float(existing_ask['origQty']) - float(existing_ask['executedQty'])
-        remaining_ask_size = max(0, desired_order_size - existing_ask_size)
-
-    # Place an additional buy order for the remaining size, if necessary
-    if remaining_bid_size > 0:
-        order_manager.place_order('BUY', best_bid_price, remaining_bid_size)
-
-    # Place an additional sell order for the remaining size, if necessary
-    if remaining_ask_size > 0:
-        order_manager.place_order('SELL', best_ask_price, remaining_ask_size)
-
-
+import math
+from data_manager import DataManager, TOP_OF_BOOK
+from streamers import stream_book_ticker, stream_depth, stream_user_data
+from utils import create_client, load_api_keys
+from trading_session import TradingSession
+from order_gateway import OrderGateway
+from rest_api_manager import BinanceRestAPI
+from latency import tracker
+from recorder import MarketDataRecorder
+from shared_book import SharedBookReader, default_prefix
+from symbol_registry import SymbolRegistry, default_cache_path
+
+
+# Default quoting parameters
+DESIRED_ORDER_SIZE = 100  # Desired total order size
+SPREAD = 0                # Minimum quoted spread as a fraction of the mid price; 0 quotes the touch
+
+
+def quote_prices(best_bid_price, best_ask_price, tick_size, spread):
+    """
+    Return the (bid, ask) to quote: the touch, widened around the mid when the
+    market is tighter than the minimum spread, and rounded away from the mid to the tick size.
+    """
+    mid = (best_bid_price + best_ask_price) / 2
+    half_spread = mid * spread / 2
+    bid = min(best_bid_price, round(math.floor((mid - half_spread) / tick_size + 1e-9) * tick_size, 10))
+    ask = max(best_ask_price, round(math.ceil((mid + half_spread) / tick_size - 1e-9) * tick_size, 10))
+    return bid, ask
+
+
+def make_submit_orders(session, desired_order_size=DESIRED_ORDER_SIZE, spread=SPREAD, verbose=True, quote_filter=None):
+    """
+    Build the quoting listener for a session.
+
+    Args:
+        session: TradingSession, or any object with the same order_manager,
+            get_position, get_active_orders and get_filters methods (e.g., the backtester's).
+            A session without a gateway hands out blocking OrderManagers, whose
+            sync_quotes is run in the default executor.
+        desired_order_size (float): Size quoted on each side.
+        spread (float): Minimum quoted spread as a fraction of the mid price.
+        verbose (bool): Print the position and open orders on every tick.
+        quote_filter (callable, optional): quote_filter(symbol, desired_quotes) returns the
+            quotes to keep, e.g. to enforce risk limits; dropped quotes are cancelled.
+
+    Returns:
+        coroutine function: submit_orders(top_of_book, order_book_depth) for DataManager.register_listener.
+    """
+    async def submit_orders(top_of_book, order_book_depth):
+        """Perform order submission logic."""
+        symbol = top_of_book["symbol"]
+        order_manager = session.order_manager(symbol)
+
+        # Position and open orders are kept current from the user data stream
+        if verbose:
+            position = session.get_position(symbol)
+            print(f"Current Position: {position}")
+
+            current_orders = session.get_active_orders(symbol)
+            print(f"Current Orders: {current_orders}")
+
+        # Get tick size for the trading pair (cached by the session)
+        filters = session.get_filters(symbol)
+        if filters is None:
+            print(f"Unable to retrieve tick size for {symbol}.")
+            return
+        tick_size = filters["tick_size"]
+
+        best_bid_price = float(top_of_book.get("best_bid_price", 0))
+        best_ask_price = float(top_of_book.get("best_ask_price", 0))
+
+        # Ensure we have valid top-of-book data
+        if best_bid_price <= 0 or best_ask_price <= 0:
+            print("Invalid top-of-book data.")
+            return
+
+        # Calculate bid and ask prices, rounded to the tick size
+        bid_price, ask_price = quote_prices(best_bid_price, best_ask_price, tick_size, spread)
+
+        # Orders already at the quotes are left alone and stale ones are moved
+        # with a single cancel-replace each
+        desired_quotes = [
+            ('BUY', bid_price, desired_order_size),
+            ('SELL', ask_price, desired_order_size),
+        ]
+        if quote_filter is not None:
+            desired_quotes = quote_filter(symbol, desired_quotes)
+        if asyncio.iscoroutinefunction(order_manager.sync_quotes):
+            await order_manager.sync_quotes(desired_quotes)
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, order_manager.sync_quotes, desired_quotes)
+        if "received_ns" in top_of_book:
+            tracker.record_since("tick_to_ack", symbol, top_of_book["received_ns"])
+
+    return submit_orders
 
 
 async def main():
     parser = argparse.ArgumentParser(description="Binance Market Maker")
     parser.add_argument(
-        "--env", choices=["testnet", "real"], default="testnet",
-        help="Specify the environment: 'testnet' or 'real' (default: testnet)"
+        "--env", choices=["testnet", "real", "sim"], default="testnet",
+        help="Specify the environment: 'testnet', 'real' or 'sim' (default: testnet)"
     )
     parser.add_argument(
         "--pair", required=True, help="Trading pair to monitor (e.g., DOGEUSDT)"
     )
+    parser.add_argument(
+        "--order-size", type=float, default=DESIRED_ORDER_SIZE,
+        help=f"Size quoted on each side (default: {DESIRED_ORDER_SIZE})"
+    )
+    parser.add_argument(
+        "--spread", type=float, default=SPREAD,
+        help=f"Minimum quoted spread as a fraction of the mid price (default: {SPREAD})"
+    )
+    parser.add_argument(
+        "--latency", action="store_true",
+        help="Record tick-to-trade latency and print a report every minute (also TRADING_LATENCY=1)"
+    )
+    parser.add_argument(
+        "--latency-port", type=int, default=None,
+        help="Serve latency histograms for Prometheus on this port at /metrics"
+    )
+    parser.add_argument(
+        "--record", metavar="DIR", help="Record the market data streams to this directory"
+    )
+    parser.add_argument(
+        "--shared-book", action="store_true",
+        help="Read the book from a running shared_book.py daemon instead of connecting to Binance"
+    )
     args = parser.parse_args()
 
     # Load API keys
-    global API_KEY, API_SECRET, env
     env = args.env
-    API_KEY, API_SECRET = load_api_keys(env)
-
-    # Initialize Binance client
-    client = Client(API_KEY, API_SECRET, testnet=(env == "testnet"))
+    api_key, api_secret = load_api_keys(env)
 
     from config_manager import ConfigManager
     config_manager = ConfigManager()
     config = config_manager.get_config(env)
 
+    # Orders go through the async gateway; the client is only used for state loads
+    client = create_client(env, api_key, api_secret, config["base_url"])
+    gateway = OrderGateway(config["base_url"], api_key, api_secret)
+    await gateway.start()
+    session = TradingSession(client, gateway=gateway, registry=SymbolRegistry(default_cache_path(env)))
+    session.refresh_filters()
+    session.load_state([args.pair.upper()])
+
     data_manager = DataManager()
-    data_manager.register_listener(submit_orders)
+    # Runs on its own task; ticks arriving while orders are in flight are conflated
+    submit_orders = make_submit_orders(session, args.order_size, args.spread)
+    data_manager.register_listener(submit_orders, events=(TOP_OF_BOOK,))
+
+    if args.shared_book:
+        tasks = [SharedBookReader(args.pair, default_prefix(env)).feed(data_manager)]
+    else:
+        tasks = [
+            stream_book_ticker(config["ws_url"], args.pair.lower(), data_manager),
+            stream_depth(config["ws_url"], config["base_url"], args.pair.lower(), data_manager),
+        ]
+    tasks.append(stream_user_data(config["ws_url"], client, session))
+    recorder = None
+    if args.record:
+        recorder = MarketDataRecorder(args.record)
+        data_manager.register_recorder(recorder)
+        tasks.append(recorder.flush_periodically())
+    if args.latency or args.latency_port is not None:
+        tracker.enabled = True
+    if tracker.enabled:
+        # Exchange-to-receive latency needs the offset between our clock and Binance's
+        tasks += [tracker.sync_clock_periodically(BinanceRestAPI(config["base_url"])), tracker.report_periodically()]
+        if args.latency_port is not None:
+            tasks.append(tracker.serve(port=args.latency_port))
 
     print(args.pair)
-    await asyncio.gather(
-        stream_book_ticker(config["ws_url"], args.pair.lower(), data_manager),
-        stream_depth(config["ws_url"], args.pair.lower(), data_manager)
-    )
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        await gateway.close()
+        if recorder is not None:
+            recorder.close()
+        if tracker.enabled:
+            print(tracker.report())
 
 if __name__ == "__main__":
     asyncio.run(main())
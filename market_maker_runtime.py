@@ -0,0 +1,566 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from tabulate import tabulate
+from config_manager import ConfigManager
+from data_manager import DataManager, TOP_OF_BOOK
+from market_maker import DESIRED_ORDER_SIZE, SPREAD, make_submit_orders
+from order_gateway import OrderGateway
+from rate_limiter import governor
+from stream_multiplexer import StreamMultiplexer
+from streamers import stream_user_data
+from symbol_registry import SymbolRegistry, default_cache_path
+from trading_session import CLOSED_ORDER_STATUSES, TradingSession
+from utils import create_client, load_api_keys
+
+# Per-symbol parameters and their defaults; max_position caps the base asset held before bids stop
+DEFAULT_PARAMS = {"order_size": DESIRED_ORDER_SIZE, "spread": SPREAD, "max_position": None}
+MARK_INTERVAL = 1.0  # Seconds between mid-price reports from a worker, per symbol
+MONITOR_INTERVAL = 1.0  # Seconds between worker liveness checks and config file polls
+
+
+def parse_pair(spec, defaults=None):
+    """
+    Parse 'SYMBOL' or 'SYMBOL:name=value,...' into (symbol, params).
+
+    Example: 'BTCUSDT:order_size=0.001,spread=0.0005'.
+    """
+    symbol, _, raw = spec.partition(":")
+    params = dict(defaults or DEFAULT_PARAMS)
+    for item in filter(None, raw.split(",")):
+        name, _, value = item.partition("=")
+        if name not in DEFAULT_PARAMS:
+            raise ValueError(f"Unknown parameter '{name}'. Choose from {list(DEFAULT_PARAMS)}")
+        params[name] = float(value)
+    return symbol.upper(), params
+
+
+def load_symbols_file(path):
+    """
+    Load {symbol: params} and the account limits from a JSON config file.
+
+    Layout:
+        {"defaults": {"order_size": 100, "spread": 0.001},
+         "max_exposure": 50000,
+         "symbols": {"DOGEUSDT": {}, "BTCUSDT": {"order_size": 0.001}}}
+    """
+    with open(path) as f:
+        config = json.load(f)
+    defaults = {**DEFAULT_PARAMS, **config.get("defaults", {})}
+    symbols = {symbol.upper(): {**defaults, **params} for symbol, params in config.get("symbols", {}).items()}
+    return symbols, config.get("max_exposure")
+
+
+def _pump(queue, loop, inbox):
+    """Forward messages from a multiprocessing queue into an asyncio queue (runs on a thread)."""
+    while True:
+        message = queue.get()
+        loop.call_soon_threadsafe(inbox.put_nowait, message)
+        if message[0] == "stop":
+            return
+
+
+class SymbolWorker:
+    """
+    Quotes a shard of the symbols inside one worker process.
+
+    The worker has its own market data connection (one multiplexed stream
+    for all of its symbols), DataManagers, order gateway and order state. It
+    takes commands and user data events from the coordinator and reports mid
+    prices back for the account-wide risk view.
+    """
+
+    def __init__(self, worker_id, env, workers, commands, events):
+        """
+        Args:
+            worker_id (int): Index of this worker.
+            env (str): 'testnet', 'real' or 'sim'.
+            workers (int): Number of workers; they share the account's rate limits with the coordinator.
+            commands (multiprocessing.Queue): Coordinator to worker messages.
+            events (multiprocessing.Queue): Worker to coordinator messages.
+        """
+        self.worker_id = worker_id
+        self.env = env
+        self.workers = workers
+        self.commands = commands
+        self.events = events
+        self.params = {}  # Symbol -> quoting parameters
+        self.listeners = {}  # Symbol -> (DataManager, listener)
+        self.risk = {"halted": False, "reduce_only": False}
+        self._marked_at = {}  # Symbol -> time of the last mark report
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        api_key, api_secret = load_api_keys(self.env)
+        config = ConfigManager().get_config(self.env)
+
+        # The exchange counts weight per IP and orders per account, across all workers and the coordinator
+        governor.configure(share=1 / (self.workers + 1))
+        self.client = create_client(self.env, api_key, api_secret, config["base_url"])
+        self.gateway = OrderGateway(config["base_url"], api_key, api_secret)
+        await self.gateway.start()
+        self.session = TradingSession(
+            self.client, gateway=self.gateway, registry=SymbolRegistry(default_cache_path(self.env))
+        )
+        await loop.run_in_executor(None, self.session.refresh_filters)
+        self.multiplexer = StreamMultiplexer(config["stream_url"], config["base_url"])
+
+        inbox = asyncio.Queue()
+        threading.Thread(target=_pump, args=(self.commands, loop, inbox), daemon=True).start()
+        self.events.put(("ready", self.worker_id))
+        try:
+            while True:
+                message = await inbox.get()
+                if message[0] == "stop":
+                    break
+                try:
+                    await self.handle(message)
+                except Exception as e:
+                    print(f"Worker {self.worker_id}: error handling {message[0]}: {e}")
+        finally:
+            for symbol in list(self.params):
+                await self.remove_symbol(symbol)
+            await self.multiplexer.close()
+            await self.gateway.close()
+
+    async def handle(self, message):
+        kind = message[0]
+        if kind == "user_event":
+            self.session.handle_user_event(message[1])
+        elif kind == "add":
+            await self.add_symbol(message[1], message[2])
+        elif kind == "update":
+            self.update_symbol(message[1], message[2])
+        elif kind == "remove":
+            await self.remove_symbol(message[1])
+        elif kind == "risk":
+            self.risk = message[1]
+        elif kind == "reconcile":
+            # The coordinator's user data stream had a gap; reload what it may have missed
+            await asyncio.get_running_loop().run_in_executor(None, self.session.load_state, list(self.params))
+
+    async def add_symbol(self, symbol, params):
+        """Load the symbol's open orders, start quoting it and subscribe to its streams."""
+        if symbol in self.params:
+            return self.update_symbol(symbol, params)
+        if self.session.get_filters(symbol) is None:
+            self.events.put(("error", self.worker_id, symbol, "unknown symbol"))
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.session.load_state, [symbol])
+        data_manager = DataManager()
+        self.params[symbol] = params
+        self._register(symbol, data_manager)
+        await self.multiplexer.add_symbol(symbol, data_manager)
+        print(f"Worker {self.worker_id}: quoting {symbol} with {params}")
+
+    def update_symbol(self, symbol, params):
+        """Swap in new quoting parameters; the next tick quotes with them."""
+        if symbol not in self.params:
+            return
+        data_manager, listener = self.listeners.pop(symbol)
+        data_manager.unregister_listener(listener)
+        self.params[symbol] = params
+        self._register(symbol, data_manager)
+
+    async def remove_symbol(self, symbol):
+        """Stop quoting a symbol, cancel its orders and drop its streams."""
+        if symbol not in self.params:
+            return
+        data_manager, listener = self.listeners.pop(symbol)
+        data_manager.unregister_listener(listener)
+        del self.params[symbol]
+        await self.multiplexer.remove_symbol(symbol)
+        await self.session.order_manager(symbol).cancel_all_orders()
+        self.session.order_managers.pop(symbol, None)
+        self.events.put(("removed", self.worker_id, symbol))
+        print(f"Worker {self.worker_id}: stopped quoting {symbol}")
+
+    def _register(self, symbol, data_manager):
+        params = self.params[symbol]
+        submit_orders = make_submit_orders(
+            self.session, params["order_size"], params["spread"], verbose=False, quote_filter=self.filter_quotes
+        )
+
+        async def quote(top_of_book, order_book_depth):
+            self._report_mark(top_of_book)
+            await submit_orders(top_of_book, order_book_depth)
+
+        data_manager.register_listener(quote, events=(TOP_OF_BOOK,))
+        self.listeners[symbol] = (data_manager, quote)
+
+    def _report_mark(self, top_of_book):
+        symbol = top_of_book["symbol"]
+        now = time.monotonic()
+        if now - self._marked_at.get(symbol, 0) < MARK_INTERVAL:
+            return
+        bid, ask = float(top_of_book.get("best_bid_price", 0)), float(top_of_book.get("best_ask_price", 0))
+        if bid > 0 and ask > 0:
+            self._marked_at[symbol] = now
+            self.events.put(("mark", symbol, (bid + ask) / 2))
+
+    def filter_quotes(self, symbol, quotes):
+        """Apply the coordinator's risk state and the symbol's position cap to a quote ladder."""
+        if self.risk["halted"]:
+            return []
+        max_position = self.params[symbol]["max_position"]
+        base = self.session.get_position(symbol)["base"]
+        if self.risk["reduce_only"] or (max_position is not None and base["free"] + base["locked"] >= max_position):
+            return [quote for quote in quotes if quote[0] == "SELL"]
+        return quotes
+
+
+def run_worker(worker_id, env, workers, commands, events):
+    """Worker process entry point."""
+    asyncio.run(SymbolWorker(worker_id, env, workers, commands, events).run())
+
+
+class Coordinator:
+    """
+    Runs a multi-symbol market maker across worker processes.
+
+    Symbols are sharded across a fixed pool of SymbolWorker processes, new
+    ones going to the least loaded worker, and can be added, re-parametrised
+    and removed while running. The coordinator holds the single account view:
+    it owns the user data stream, routes order updates to the worker quoting
+    the symbol, broadcasts balances, and turns the account-wide exposure
+    (base holdings at the workers' mid prices) into a risk state every worker
+    applies to its quotes.
+    """
+
+    def __init__(self, env, workers, max_exposure=None, registry=None):
+        """
+        Args:
+            env (str): 'testnet', 'real' or 'sim'.
+            workers (int): Number of worker processes.
+            max_exposure (float, optional): Total base holdings, valued in the quote asset,
+                above which every symbol only quotes the side that reduces them.
+            registry (SymbolRegistry, optional): Loaded symbol filters, for each symbol's base asset.
+                Loaded from the environment's disk cache by run() if None.
+        """
+        self.env = env
+        self.registry = registry
+        self.worker_count = workers
+        self.max_exposure = max_exposure
+        self.context = multiprocessing.get_context("spawn")
+        self.events = self.context.Queue()
+        self.processes = {}  # Worker ID -> Process
+        self.commands = {}  # Worker ID -> command Queue
+        self.symbols = {}  # Symbol -> params
+        self.assignments = {}  # Symbol -> worker ID
+        self.balances = {}  # Asset -> {"free": float, "locked": float}
+        self.marks = {}  # Symbol -> last reported mid price
+        self.open_orders = {}  # Symbol -> set of open order IDs
+        self.risk = {"halted": False, "reduce_only": False}
+        self.client = None  # Set by run()
+
+    def start(self):
+        for worker_id in range(self.worker_count):
+            self._spawn(worker_id)
+
+    def _spawn(self, worker_id):
+        commands = self.context.Queue()
+        process = self.context.Process(
+            target=run_worker, args=(worker_id, self.env, self.worker_count, commands, self.events),
+            name=f"mm-worker-{worker_id}", daemon=True,
+        )
+        process.start()
+        self.processes[worker_id], self.commands[worker_id] = process, commands
+        commands.put(("risk", self.risk))
+
+    def _send(self, worker_id, message):
+        self.commands[worker_id].put(message)
+
+    def _broadcast(self, message):
+        for worker_id in self.commands:
+            self._send(worker_id, message)
+
+    def add_symbol(self, symbol, params):
+        """Start quoting a symbol on the least loaded worker, or update its parameters if quoted."""
+        if symbol in self.assignments:
+            return self.update_symbol(symbol, params)
+        load = {worker_id: 0 for worker_id in self.processes}
+        for worker_id in self.assignments.values():
+            load[worker_id] += 1
+        worker_id = min(load, key=lambda w: (load[w], w))
+        self.symbols[symbol], self.assignments[symbol] = params, worker_id
+        self.open_orders.setdefault(symbol, set())
+        self._send(worker_id, ("add", symbol, params))
+
+    def update_symbol(self, symbol, params):
+        if symbol in self.assignments:
+            self.symbols[symbol] = params
+            self._send(self.assignments[symbol], ("update", symbol, params))
+
+    def remove_symbol(self, symbol):
+        """Stop quoting a symbol; its worker cancels the symbol's open orders."""
+        worker_id = self.assignments.pop(symbol, None)
+        if worker_id is not None:
+            del self.symbols[symbol]
+            self.marks.pop(symbol, None)
+            self._send(worker_id, ("remove", symbol))
+
+    def set_halted(self, halted):
+        """Halt (cancel and stop all quoting) or resume every worker."""
+        self.risk = {**self.risk, "halted": halted}
+        self._broadcast(("risk", self.risk))
+
+    def handle_user_event(self, event):
+        """Apply a user data stream event to the account view and forward it to the workers."""
+        event_type = event.get("e")
+        if event_type == "executionReport":
+            symbol = event["s"]
+            orders = self.open_orders.setdefault(symbol, set())
+            if event["X"] in CLOSED_ORDER_STATUSES:
+                orders.discard(event["i"])
+            else:
+                orders.add(event["i"])
+            if symbol in self.assignments:
+                self._send(self.assignments[symbol], ("user_event", event))
+        elif event_type == "outboundAccountPosition":
+            for balance in event["B"]:
+                self.balances[balance["a"]] = {"free": float(balance["f"]), "locked": float(balance["l"])}
+            self._broadcast(("user_event", event))
+            self._update_risk()
+
+    def reconcile(self):
+        """
+        Reload balances and open orders from REST after a user data stream gap.
+
+        Runs in an executor thread (see streamers.stream_user_data); the workers
+        reload their own state before they see any of the events held back meanwhile.
+        """
+        account = self.client.get_account()
+        open_orders = {
+            symbol: {order["orderId"] for order in self.client.get_open_orders(symbol=symbol)}
+            for symbol in list(self.assignments)
+        }
+        self.balances = {
+            b["asset"]: {"free": float(b["free"]), "locked": float(b["locked"])} for b in account["balances"]
+        }
+        self.open_orders = open_orders
+        self._broadcast(("reconcile",))
+
+    def _base_asset(self, symbol):
+        filters = self.registry.get(symbol) if self.registry is not None else None
+        return filters.base_asset if filters is not None and filters.base_asset else symbol[:-4]
+
+    def exposure(self):
+        """Total base holdings of the quoted symbols, valued at their last mid prices."""
+        total = 0.0
+        for symbol, mark in self.marks.items():
+            base = self.balances.get(self._base_asset(symbol), {"free": 0, "locked": 0})
+            total += (base["free"] + base["locked"]) * mark
+        return total
+
+    def _update_risk(self):
+        reduce_only = self.max_exposure is not None and self.exposure() > self.max_exposure
+        if reduce_only != self.risk["reduce_only"]:
+            self.risk = {**self.risk, "reduce_only": reduce_only}
+            print(f"Exposure {self.exposure():.2f}: {'bids paused' if reduce_only else 'quoting both sides'}")
+            self._broadcast(("risk", self.risk))
+
+    def _on_event(self, message):
+        kind = message[0]
+        if kind == "mark":
+            # A worker may report one last mark after the symbol was removed; it must not count towards exposure
+            if message[1] in self.assignments:
+                self.marks[message[1]] = message[2]
+                self._update_risk()
+        elif kind == "removed":
+            _, worker_id, symbol = message
+            if symbol not in self.assignments:
+                self.marks.pop(symbol, None)
+                self._update_risk()
+        elif kind == "error":
+            _, worker_id, symbol, error = message
+            print(f"Worker {worker_id} could not quote {symbol}: {error}")
+            if self.assignments.get(symbol) == worker_id:
+                del self.assignments[symbol]
+                del self.symbols[symbol]
+                self.marks.pop(symbol, None)
+        elif kind == "ready":
+            print(f"Worker {message[1]} ready")
+
+    def status(self):
+        """Return a table of the quoted symbols."""
+        rows = []
+        for symbol in sorted(self.assignments):
+            base = self.balances.get(self._base_asset(symbol), {"free": 0, "locked": 0})
+            rows.append([
+                symbol, self.assignments[symbol], self.marks.get(symbol), base["free"] + base["locked"],
+                len(self.open_orders.get(symbol, ())), json.dumps(self.symbols[symbol]),
+            ])
+        table = tabulate(rows, headers=["Symbol", "Worker", "Mid", "Base held", "Open orders", "Params"])
+        return f"{table}\nExposure: {self.exposure():.2f}  Risk: {self.risk}"
+
+    def _restart_dead_workers(self):
+        for worker_id, process in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            print(f"Worker {worker_id} exited with code {process.exitcode}; restarting it")
+            self._spawn(worker_id)
+            for symbol, assigned in self.assignments.items():
+                if assigned == worker_id:
+                    self._send(worker_id, ("add", symbol, self.symbols[symbol]))
+
+    async def run(self, client, config, config_path=None, read_stdin=True):
+        """
+        Run until stopped: route events, watch the workers and take commands.
+
+        Args:
+            client: python-binance Client for the account (user data stream and balances).
+            config (dict): Environment config from ConfigManager.
+            config_path (str, optional): Symbols file to reload whenever it changes.
+            read_stdin (bool): Accept commands on standard input.
+        """
+        loop = asyncio.get_running_loop()
+        self.client = client
+        # The coordinator's own requests (account, open orders, listen key) take a share like each worker
+        governor.configure(share=1 / (self.worker_count + 1))
+        if self.registry is None:
+            self.registry = SymbolRegistry(default_cache_path(self.env))
+            await loop.run_in_executor(None, self.registry.load, client.get_exchange_info)
+        account = await loop.run_in_executor(None, client.get_account)
+        self.balances = {
+            b["asset"]: {"free": float(b["free"]), "locked": float(b["locked"])} for b in account["balances"]
+        }
+        inbox = asyncio.Queue()
+        threading.Thread(target=_pump, args=(self.events, loop, inbox), daemon=True).start()
+
+        async def route_events():
+            while True:
+                self._on_event(await inbox.get())
+
+        self._stopping = asyncio.Event()
+        coroutines = [route_events(), stream_user_data(config["ws_url"], client, self), self._monitor(config_path)]
+        if read_stdin:
+            coroutines.append(self._read_commands())
+        tasks = [asyncio.create_task(coroutine) for coroutine in coroutines]
+        try:
+            await self._stopping.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.stop()
+
+    async def _monitor(self, config_path):
+        mtime = os.path.getmtime(config_path) if config_path else None
+        while True:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            self._restart_dead_workers()
+            if config_path and os.path.getmtime(config_path) != mtime:
+                mtime = os.path.getmtime(config_path)
+                try:
+                    self.apply_config(*load_symbols_file(config_path))
+                except (OSError, ValueError) as e:
+                    print(f"Could not reload {config_path}: {e}")
+
+    def apply_config(self, symbols, max_exposure=None):
+        """Bring the quoted symbols in line with a {symbol: params} mapping."""
+        for symbol in set(self.assignments) - set(symbols):
+            self.remove_symbol(symbol)
+        for symbol, params in symbols.items():
+            if self.symbols.get(symbol) != params:
+                self.add_symbol(symbol, params)
+        self.max_exposure = max_exposure
+        self._update_risk()
+
+    async def _read_commands(self):
+        """
+        Commands on standard input:
+            add SYMBOL[:name=value,...]   start quoting (or update) a symbol
+            remove SYMBOL                 stop quoting a symbol and cancel its orders
+            halt / resume                 stop or restart quoting on every symbol
+            status                        print the symbol table
+            quit                          cancel everything and exit
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+            if not line:
+                return  # No terminal attached; keep running without commands
+            command, _, argument = line.strip().partition(" ")
+            try:
+                if command == "add":
+                    self.add_symbol(*parse_pair(argument.strip()))
+                elif command == "remove":
+                    self.remove_symbol(argument.strip().upper())
+                elif command in ("halt", "resume"):
+                    self.set_halted(command == "halt")
+                elif command == "status":
+                    print(self.status())
+                elif command == "quit":
+                    self._stopping.set()
+                    return
+                elif command:
+                    print(f"Unknown command '{command}'")
+            except ValueError as e:
+                print(e)
+
+    def stop(self, timeout=10):
+        """Stop the workers, which cancel their open orders first."""
+        self._broadcast(("stop",))
+        for process in self.processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Multi-symbol Binance market maker across worker processes")
+    parser.add_argument(
+        "--env", choices=["testnet", "real", "sim"], default="testnet",
+        help="Specify the environment: 'testnet', 'real' or 'sim' (default: testnet)"
+    )
+    parser.add_argument(
+        "--pair", action="append", default=[], metavar="SYMBOL[:name=value,...]",
+        help="Symbol to quote, optionally with parameters (repeatable), e.g. BTCUSDT:order_size=0.001,spread=0.0005"
+    )
+    parser.add_argument(
+        "--config", metavar="FILE",
+        help="JSON symbols file (see load_symbols_file); reloaded whenever it changes"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Worker processes (default: one per core, at most one per symbol)"
+    )
+    parser.add_argument(
+        "--max-exposure", type=float, default=None,
+        help="Total base holdings, in the quote asset, above which bids are paused on every symbol"
+    )
+    args = parser.parse_args()
+
+    symbols, max_exposure = load_symbols_file(args.config) if args.config else ({}, None)
+    symbols.update(parse_pair(spec) for spec in args.pair)
+    if not symbols:
+        parser.error("Give at least one --pair or a --config file")
+    workers = args.workers or max(1, min(os.cpu_count() or 1, len(symbols)))
+
+    config = ConfigManager().get_config(args.env)
+    api_key, api_secret = load_api_keys(args.env)
+    client = create_client(args.env, api_key, api_secret, config["base_url"])
+
+    # Fetch exchangeInfo once here so the workers start from the disk cache
+    registry = SymbolRegistry(default_cache_path(args.env))
+    registry.load(client.get_exchange_info)
+
+    coordinator = Coordinator(args.env, workers, args.max_exposure or max_exposure, registry)
+    coordinator.start()
+    for symbol, params in symbols.items():
+        coordinator.add_symbol(symbol, params)
+    print(f"Quoting {len(symbols)} symbols on {workers} workers")
+    await coordinator.run(client, config, args.config)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
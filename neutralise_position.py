@@ -1,10 +1,17 @@
 import argparse
 from config_manager import ConfigManager
 from rest_api_manager import BinanceRestAPI
+from symbol_registry import SymbolRegistry, default_cache_path
 
 
 def neutralise_position(env, trading_pair):
-    """Neutralise the position for the given trading pair."""
+    """
+    Neutralise the position for the given trading pair.
+
+    Args:
+        env (str): 'testnet', 'real' or 'sim'.
+        trading_pair (str): The trading pair, e.g., 'DOGEUSDT'.
+    """
     try:
         # Load configuration based on the environment
         config_manager = ConfigManager()
@@ -12,24 +19,34 @@ def neutralise_position(env, trading_pair):
 
         # Initialise the Binance REST API wrapper
         rest_api = BinanceRestAPI(config["base_url"], config["api_key"], config["api_secret"])
+        # Signed requests are timestamped on the exchange's clock
+        rest_api.sync_time()
+
+        # Symbol filters, so the order quantity is valid for the pair's step size
+        registry = SymbolRegistry(default_cache_path(env))
+        registry.load(rest_api.get_exchange_info)
+        filters = registry.get(trading_pair)
+        if filters is None:
+            raise ValueError(f"Trading pair {trading_pair} not found on Binance.")
 
         # Fetch the current balance for the base asset
+        base_asset = filters.base_asset or trading_pair[:-4]
         balances = rest_api.get_account_balance()
-        base_asset = trading_pair[:-4]  # Extract base asset (e.g., DOGE from DOGEUSDT)
         base_balance = float(next((b["free"] for b in balances["balances"] if b["asset"] == base_asset), 0.0))
         print(f"Current {base_asset} balance: {base_balance:.4f}")
 
-        # Neutralise position
-        if base_balance > 0:
-            print(f"Selling {base_balance:.4f} {base_asset} to neutralise position...")
-            response = rest_api.place_market_order(symbol=trading_pair, side="SELL", quantity=base_balance)
-            print(f"Order placed: {response}")
-        elif base_balance < 0:
-            print(f"Buying {abs(base_balance):.4f} {base_asset} to neutralise position...")
-            response = rest_api.place_market_order(symbol=trading_pair, side="BUY", quantity=abs(base_balance))
-            print(f"Order placed: {response}")
-        else:
+        # Neutralise position; the quantity is rounded down to the step size and
+        # checked locally, since dust below minQty cannot be traded anyway
+        side = "SELL" if base_balance > 0 else "BUY"
+        steps = filters.qty_steps(abs(base_balance))
+        if steps == 0:
             print(f"Position is already neutral for {base_asset}.")
+            return
+        filters.check(None, steps)
+        quantity = filters.format_qty(steps)
+        print(f"{'Selling' if side == 'SELL' else 'Buying'} {quantity} {base_asset} to neutralise position...")
+        response = rest_api.place_market_order(symbol=trading_pair, side=side, quantity=quantity)
+        print(f"Order placed: {response}")
     except Exception as e:
         print(f"Error: {e}")
 
@@ -38,8 +55,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Neutralise Binance Position")
     parser.add_argument("--pair", required=True, help="Trading pair (e.g., DOGEUSDT)")
     parser.add_argument(
-        "--env", choices=["testnet", "real"], default="testnet",
-        help="Environment: testnet or real (default: testnet)"
+        "--env", choices=["testnet", "real", "sim"], default="testnet",
+        help="Environment: testnet, real or sim (default: testnet)"
     )
     args = parser.parse_args()
 
@@ -0,0 +1,289 @@
+import asyncio
+from bisect import bisect_left
+from events import DepthUpdate
+
+
+class OrderBookOutOfSync(Exception):
+    """Raised when a diff-depth event does not follow on from the local book."""
+
+
+def _levels(levels):
+    """Return [price, qty] levels as a list, converting decoded NumPy arrays in one go."""
+    return levels.tolist() if hasattr(levels, "tolist") else levels
+
+
+class BookSide:
+    """
+    One side of the order book held as parallel sorted arrays.
+
+    Levels are kept in ascending key order with the best level at the end of
+    the arrays, so the best price is an O(1) lookup, a level is located with a
+    binary search, and the churn near the touch only shifts a few elements.
+    Bids use the price as key and asks use the negated price.
+    """
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self._keys = []
+        self._qtys = []
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _key(self, price: float):
+        return price if self.is_bid else -price
+
+    def clear(self):
+        """Remove every level."""
+        self._keys.clear()
+        self._qtys.clear()
+
+    def load(self, levels):
+        """
+        Replace the side with a full list of levels.
+
+        Args:
+            levels (list): [price, qty] pairs, as strings or numbers, in any order.
+        """
+        book = sorted((self._key(float(price)), float(qty)) for price, qty in levels if float(qty) != 0)
+        self._keys = [key for key, _ in book]
+        self._qtys = [qty for _, qty in book]
+
+    def update(self, price: float, qty: float):
+        """
+        Set the quantity resting at a price level, removing it when qty is zero.
+
+        Args:
+            price (float): The price of the level.
+            qty (float): The new absolute quantity at that level.
+        """
+        key = self._key(price)
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            if qty == 0:
+                del self._keys[i]
+                del self._qtys[i]
+            else:
+                self._qtys[i] = qty
+        elif qty != 0:
+            self._keys.insert(i, key)
+            self._qtys.insert(i, qty)
+
+    def best(self):
+        """Return the best (price, qty) level, or None if the side is empty."""
+        if not self._keys:
+            return None
+        key = self._keys[-1]
+        return (key if self.is_bid else -key), self._qtys[-1]
+
+    def qty_at(self, price: float):
+        """Return the quantity resting at a price, 0 if there is no such level."""
+        key = self._key(price)
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return self._qtys[i]
+        return 0.0
+
+    def levels(self, depth=None):
+        """
+        Return levels best-first as [price, qty] lists.
+
+        Args:
+            depth (int, optional): Maximum number of levels to return. All levels if None.
+        """
+        n = len(self._keys)
+        start = 0 if depth is None else max(0, n - depth)
+        sign = 1 if self.is_bid else -1
+        return [[sign * self._keys[i], self._qtys[i]] for i in range(n - 1, start - 1, -1)]
+
+    def copy_to(self, out):
+        """
+        Write levels best-first into a preallocated (N, 2) float array.
+
+        Args:
+            out (numpy.ndarray): Price and quantity columns; at most len(out) levels are written.
+
+        Returns:
+            int: Number of levels written.
+        """
+        n = min(len(self._keys), len(out))
+        if n:
+            out[:n, 0] = self._keys[:-n - 1:-1]
+            out[:n, 1] = self._qtys[:-n - 1:-1]
+            if not self.is_bid:
+                out[:n, 0] *= -1
+        return n
+
+
+class LocalOrderBook:
+    """Full-depth order book maintained from a REST snapshot plus diff-depth events."""
+
+    def __init__(self, symbol=None):
+        self.symbol = symbol
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.last_update_id = None
+        self.event_time = None
+        self.last_event = None  # Last diff applied, None after a snapshot or clear
+
+    def __len__(self):
+        return len(self.bids) + len(self.asks)
+
+    def clear(self):
+        """Drop all levels and forget the update sequence."""
+        self.bids.clear()
+        self.asks.clear()
+        self.last_update_id = None
+        self.event_time = None
+        self.last_event = None
+
+    def load_snapshot(self, snapshot):
+        """
+        Replace the book with a REST depth snapshot.
+
+        Args:
+            snapshot (dict): Payload from GET /api/v3/depth.
+        """
+        self.bids.load(snapshot["bids"])
+        self.asks.load(snapshot["asks"])
+        self.last_update_id = snapshot["lastUpdateId"]
+        self.last_event = None
+
+    def apply_update(self, event):
+        """
+        Apply a diff-depth event.
+
+        Args:
+            event (dict): A depthUpdate event from the @depth stream.
+
+        Returns:
+            bool: True if the event changed the book, False if it was stale.
+
+        Raises:
+            OrderBookOutOfSync: If there is a gap between the book and the event.
+        """
+        if self.last_update_id is None:
+            raise OrderBookOutOfSync("No snapshot loaded")
+        if event["u"] <= self.last_update_id:
+            return False
+        if event["U"] > self.last_update_id + 1:
+            raise OrderBookOutOfSync(
+                f"Gap in depth updates: expected {self.last_update_id + 1}, got {event['U']}"
+            )
+        for price, qty in _levels(event["b"]):
+            self.bids.update(float(price), float(qty))
+        for price, qty in _levels(event["a"]):
+            self.asks.update(float(price), float(qty))
+        self.last_update_id = event["u"]
+        self.event_time = event.get("E")
+        self.last_event = event
+        return True
+
+    def best_bid(self):
+        """Return the best bid as (price, qty), or None."""
+        return self.bids.best()
+
+    def best_ask(self):
+        """Return the best ask as (price, qty), or None."""
+        return self.asks.best()
+
+    def to_dict(self, depth=None):
+        """Return the book in the {"bids": [...], "asks": [...]} layout, best level first."""
+        return {"bids": self.bids.levels(depth), "asks": self.asks.levels(depth)}
+
+
+class DepthSynchronizer:
+    """
+    Keeps a LocalOrderBook in step with a diff-depth stream.
+
+    Events are buffered while a REST snapshot is fetched, replayed on top of it,
+    and any gap in the update IDs triggers a fresh snapshot. Snapshots that are
+    too old or fail to load are refetched with exponential backoff, since each
+    one is a heavy REST request.
+    """
+
+    def __init__(self, symbol, fetch_snapshot, on_update, initial_backoff=0.5, max_backoff=30):
+        """
+        Args:
+            symbol (str): The trading pair, e.g., 'BTCUSDT'.
+            fetch_snapshot (coroutine function): Returns a REST depth snapshot.
+            on_update (callable): Called with the book after every applied event.
+            initial_backoff (float): First delay in seconds before a snapshot is refetched, doubled on each retry.
+            max_backoff (float): Upper bound on the refetch delay in seconds.
+        """
+        self.book = LocalOrderBook(symbol)
+        self.fetch_snapshot = fetch_snapshot
+        self.on_update = on_update
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.synced = False
+        self._buffer = []
+        self._snapshot_task = None
+        self._backoff = initial_backoff
+
+    def on_event(self, event):
+        """Feed a diff-depth event from the stream."""
+        if not self.synced:
+            # Decoders reuse their events and level buffers, so keep a private copy
+            if isinstance(event, DepthUpdate):
+                self._buffer.append(event.copy())
+            else:
+                self._buffer.append({**event, "b": _levels(event["b"]), "a": _levels(event["a"])})
+            if self._snapshot_task is None:
+                self._snapshot_task = asyncio.create_task(self._load_snapshot())
+            return
+        try:
+            changed = self.book.apply_update(event)
+        except OrderBookOutOfSync as e:
+            print(f"{self.book.symbol} order book out of sync ({e}), resyncing")
+            self.resync()
+            self.on_event(event)
+            return
+        if changed:
+            self.on_update(self.book)
+
+    def resync(self):
+        """Discard the local book and rebuild it from a new snapshot."""
+        self.synced = False
+        self.book.clear()
+        self._buffer.clear()
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            self._snapshot_task = None
+
+    async def _load_snapshot(self):
+        try:
+            while True:
+                try:
+                    snapshot = await self.fetch_snapshot()
+                except Exception as e:
+                    print(f"Error fetching {self.book.symbol} depth snapshot ({e}), retrying in {self._backoff:.1f}s")
+                    await self._back_off()
+                    continue
+                # The snapshot must not predate the first buffered event
+                if snapshot["lastUpdateId"] + 1 < self._buffer[0]["U"]:
+                    await self._back_off()
+                    continue
+                self.book.load_snapshot(snapshot)
+                try:
+                    for event in self._buffer:
+                        self.book.apply_update(event)
+                except OrderBookOutOfSync as e:
+                    print(f"{self.book.symbol} snapshot did not line up with stream ({e}), retrying")
+                    self._buffer.clear()
+                    self.book.clear()
+                    # The next event starts a new attempt
+                    await self._back_off()
+                    return
+                break
+        finally:
+            if self._snapshot_task is asyncio.current_task():
+                self._snapshot_task = None
+        self._buffer.clear()
+        self._backoff = self.initial_backoff
+        self.synced = True
+        self.on_update(self.book)
+
+    async def _back_off(self):
+        await asyncio.sleep(self._backoff)
+        self._backoff = min(self._backoff * 2, self.max_backoff)
@@ -0,0 +1,256 @@
+import asyncio
+
+from order_manager import OpenOrders, align_quotes, diff_quotes, order_values
+from rest_api_manager import AsyncBinanceRestAPI
+
+
+class GatewayBusy(Exception):
+    """Raised when the outbound order queue is full."""
+
+
+class OrderGateway(AsyncBinanceRestAPI):
+    """
+    Asyncio-native transport for signed Binance REST requests.
+
+    Requests are put on a bounded queue and sent by a fixed pool of workers
+    over one keep-alive aiohttp session, so callers never block the event loop
+    and several requests can be in flight at once. Signing, rate limiting and
+    timestamping on the exchange's clock come from AsyncBinanceRestAPI; the
+    clock offset is measured at start and every time_sync_interval seconds.
+    """
+
+    def __init__(self, base_url, api_key, api_secret, max_in_flight=4, queue_size=64, time_sync_interval=300):
+        """
+        Initialize the OrderGateway.
+
+        Args:
+            base_url (str): REST base URL, e.g., 'https://api.binance.com/api'.
+            api_key (str): Binance API key.
+            api_secret (str): Binance API secret.
+            max_in_flight (int): Number of requests sent concurrently.
+            queue_size (int): Maximum number of requests waiting to be sent.
+            time_sync_interval (float): Seconds between exchange clock measurements.
+        """
+        super().__init__(base_url, api_key, api_secret, pool_size=max_in_flight)
+        self.max_in_flight = max_in_flight
+        self.time_sync_interval = time_sync_interval
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self._workers = []
+
+    async def start(self):
+        """Measure the exchange clock offset and start the worker tasks."""
+        try:
+            await self.sync_time()
+        except Exception as e:
+            print(f"Error syncing exchange clock: {e}")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_in_flight)]
+        self._workers.append(asyncio.create_task(self._sync_time_periodically()))
+
+    async def close(self):
+        """Stop the workers and close the HTTP session."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await super().close()
+
+    def submit(self, method, endpoint, params=None):
+        """
+        Queue a signed request without waiting for it to be sent.
+
+        Returns:
+            asyncio.Future: Resolves to the decoded JSON response.
+
+        Raises:
+            GatewayBusy: If the outbound queue is full.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((method, endpoint, dict(params or {}), future))
+        except asyncio.QueueFull:
+            raise GatewayBusy(f"Order queue full ({self.queue.maxsize} pending)")
+        return future
+
+    async def request(self, method, endpoint, params=None):
+        """Queue a signed request and wait for its response."""
+        return await self.submit(method, endpoint, params)
+
+    async def _worker(self):
+        while True:
+            method, endpoint, params, future = await self.queue.get()
+            try:
+                if not future.cancelled():
+                    result = await self._make_request(method, endpoint, params)
+                    if not future.cancelled():
+                        future.set_result(result)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    async def _sync_time_periodically(self):
+        while True:
+            await asyncio.sleep(self.time_sync_interval)
+            try:
+                await self.sync_time()
+            except Exception as e:
+                print(f"Error syncing exchange clock: {e}")
+
+
+class AsyncOrderManager(OpenOrders):
+    """Async counterpart of OrderManager that sends its requests through an OrderGateway."""
+
+    def __init__(self, gateway: OrderGateway, pair: str, filters=None):
+        """
+        Initialize the AsyncOrderManager.
+
+        Args:
+            gateway (OrderGateway): The shared order gateway.
+            pair (str): The trading pair, e.g., 'BTCUSDT'.
+            filters (SymbolFilters, optional): When given, orders are rounded onto the tick and
+                step grids and checked locally before they are queued.
+        """
+        self.gateway = gateway
+        self.pair = pair
+        self.filters = filters
+        self._init_open_orders()
+
+    async def place_order(self, side: str, price: float, order_size: float):
+        """
+        Place a limit order with a specified size.
+
+        Args:
+            side (str): 'BUY' or 'SELL'.
+            price (float): The price at which to place the order.
+            order_size (float): The size of the order.
+
+        Returns:
+            dict: The API response for the placed order.
+        """
+        try:
+            price, quantity = order_values(self.filters, side, price, order_size)
+            order = await self.gateway.request("POST", "/v3/order", {
+                "symbol": self.pair,
+                "side": side,
+                "type": "LIMIT",
+                "timeInForce": "GTC",
+                "quantity": quantity,
+                "price": price,
+            })
+            self.track_order(order)
+            print(f"Placed {side} order at {price} for {quantity} {self.pair}")
+            return order
+        except Exception as e:
+            print(f"Error placing {side} order at {price}: {e}")
+            return None
+
+    async def cancel_order(self, order_id: str):
+        """
+        Cancel an active order.
+
+        Args:
+            order_id (str): The ID of the order to cancel.
+
+        Returns:
+            dict: The API response for the canceled order.
+        """
+        try:
+            response = await self.gateway.request("DELETE", "/v3/order", {"symbol": self.pair, "orderId": order_id})
+            self.order_closed(order_id)
+            print(f"Canceled order ID: {order_id}")
+            return response
+        except Exception as e:
+            print(f"Error canceling order ID {order_id}: {e}")
+            return None
+
+    async def replace_order(self, order_id, side: str, price: float, order_size: float):
+        """
+        Atomically cancel an order and place a new one in a single request.
+
+        Args:
+            order_id: The ID of the order to replace.
+            side (str): 'BUY' or 'SELL'.
+            price (float): The price of the new order.
+            order_size (float): The size of the new order.
+
+        Returns:
+            dict: The new order, or None if the replace failed.
+        """
+        try:
+            price, quantity = order_values(self.filters, side, price, order_size)
+            response = await self.gateway.request("POST", "/v3/order/cancelReplace", {
+                "symbol": self.pair,
+                "side": side,
+                "type": "LIMIT",
+                "timeInForce": "GTC",
+                "cancelReplaceMode": "STOP_ON_FAILURE",
+                "cancelOrderId": order_id,
+                "quantity": quantity,
+                "price": price,
+            })
+            self.order_closed(order_id)
+            order = response["newOrderResponse"]
+            self.track_order(order)
+            print(f"Replaced order ID {order_id} with {side} at {price} for {quantity} {self.pair}")
+            return order
+        except Exception as e:
+            print(f"Error replacing order ID {order_id}: {e}")
+            return None
+
+    async def cancel_all_orders(self):
+        """
+        Cancel all active orders for the trading pair with a single request.
+
+        Returns:
+            list: A list of responses for all canceled orders.
+        """
+        try:
+            responses = await self.gateway.request("DELETE", "/v3/openOrders", {"symbol": self.pair})
+            for order_id in list(self.active_orders):
+                self.order_closed(order_id)
+            print(f"Canceled all orders for {self.pair}")
+            return responses
+        except Exception as e:
+            print(f"Error canceling all orders for {self.pair}: {e}")
+            return []
+
+    async def sync_quotes(self, desired_quotes):
+        """
+        Bring resting orders in line with a quote ladder, touching only levels that changed.
+
+        Args:
+            desired_quotes (list): (side, price, size) tuples.
+
+        Returns:
+            list: The API responses, None for requests that failed.
+        """
+        desired_quotes = align_quotes(self.filters, desired_quotes)
+        replace, place, cancel = diff_quotes(
+            list(self.active_orders.values()), desired_quotes,
+            *((self.filters.tick_size, self.filters.step_size) if self.filters else ()),
+        )
+        return await asyncio.gather(
+            *(self.replace_order(order["orderId"], *quote) for order, quote in replace),
+            *(self.place_order(*quote) for quote in place),
+            *(self.cancel_order(order["orderId"]) for order in cancel),
+        )
+
+    async def get_active_orders(self):
+        """
+        Retrieve the list of active orders from the API.
+
+        Returns:
+            list: A list of active orders.
+        """
+        try:
+            active_orders = await self.gateway.request("GET", "/v3/openOrders", {"symbol": self.pair})
+            self.active_orders = {order["orderId"]: order for order in active_orders}
+            return active_orders
+        except Exception as e:
+            print(f"Error fetching active orders: {e}")
+            return []
@@ -1,18 +1,150 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from binance.client import Client
 from binance.enums import ORDER_TYPE_LIMIT, TIME_IN_FORCE_GTC, SIDE_BUY, SIDE_SELL
+from symbol_registry import format_decimal, to_decimal
 
-class OrderManager:
-    def __init__(self, client: Client, pair: str):
+# Order statuses that mean the order is no longer resting on the book
+CLOSED_ORDER_STATUSES = {"FILLED", "CANCELED", "REJECTED", "EXPIRED", "EXPIRED_IN_MATCH"}
+# Closed order IDs remembered per symbol, so a REST response arriving after the
+# user data stream has closed the order does not bring it back
+CLOSED_ORDER_MEMORY = 1024
+
+
+def order_values(filters, side, price, order_size):
+    """
+    Return the (price, quantity) strings for a limit order.
+
+    Args:
+        filters (SymbolFilters, optional): The symbol's filters. Without them the
+            values are sent as given, formatted without float noise.
+        side (str): 'BUY' or 'SELL'.
+        price (float): The limit price.
+        order_size (float): The size of the order.
+
+    Raises:
+        FilterViolation: If the filters are known and the exchange would reject the order.
+    """
+    if filters is None:
+        return format_decimal(price), format_decimal(order_size)
+    return filters.prepare_order(side, price, order_size)
+
+
+def align_quotes(filters, desired_quotes):
+    """Round (side, price, size) quotes onto the symbol's grids, so they compare equal to the resting orders."""
+    if filters is None:
+        return desired_quotes
+    return [(side, filters.round_price(price, side), filters.round_qty(size)) for side, price, size in desired_quotes]
+
+
+def grid_key(value, unit=None):
+    """Return a price or quantity as a whole number of grid units (an exact Decimal without a unit), for comparisons."""
+    if unit:
+        return round(float(value) / unit)
+    return to_decimal(value)
+
+
+def diff_quotes(active_orders, desired_quotes, tick_size=None, step_size=None):
+    """
+    Work out the minimal set of requests that turns the resting orders into the desired quotes.
+
+    Orders already at a desired price with the desired remaining size are left
+    alone; an order whose size no longer matches, e.g. after a partial fill or
+    a new order size, is cancel-replaced like any other. Remaining orders are
+    paired with remaining quotes on the same side (nearest prices first) to be
+    cancel-replaced, and anything left over is placed or cancelled.
+
+    Args:
+        active_orders (list): Open orders in the REST layout.
+        desired_quotes (list): (side, price, size) tuples.
+        tick_size (float, optional): Prices are compared in whole ticks of this size;
+            as exact decimals if None.
+        step_size (float, optional): Sizes are compared in whole lot steps of this size;
+            as exact decimals if None.
+
+    Returns:
+        tuple: (replace, place, cancel) where replace is a list of (order, quote)
+            pairs, place a list of quotes and cancel a list of orders.
+    """
+    replace, place, cancel = [], [], []
+    for side in (SIDE_BUY, SIDE_SELL):
+        orders = {}  # (price, remaining size) key -> orders resting there
+        for order in active_orders:
+            if order["side"] == side:
+                remaining = grid_key(order["origQty"], step_size) - grid_key(order["executedQty"], step_size)
+                orders.setdefault((grid_key(order["price"], tick_size), remaining), []).append(order)
+        quotes = []
+        for quote in desired_quotes:
+            if quote[0] != side:
+                continue
+            resting = orders.get((grid_key(quote[1], tick_size), grid_key(quote[2], step_size)))
+            if resting:
+                resting.pop(0)
+            else:
+                quotes.append(quote)
+        orders = [order for resting in orders.values() for order in resting]
+        # Best prices first on both lists so replacements move each order the least
+        reverse = side == SIDE_BUY
+        orders.sort(key=lambda o: float(o["price"]), reverse=reverse)
+        quotes.sort(key=lambda q: q[1], reverse=reverse)
+        pairs = min(len(orders), len(quotes))
+        replace.extend(zip(orders[:pairs], quotes[:pairs]))
+        place.extend(quotes[pairs:])
+        cancel.extend(orders[pairs:])
+    return replace, place, cancel
+
+
+class OpenOrders:
+    """
+    Open-order bookkeeping shared by OrderManager and AsyncOrderManager.
+
+    active_orders is fed both by REST responses and, through TradingSession,
+    by the user data stream, which may get there first.
+    """
+
+    def _init_open_orders(self):
+        self.active_orders = {}  # Track active orders by their IDs
+        self._closed_ids = OrderedDict()
+
+    def track_order(self, order):
+        """Record an order from a REST response, unless the user data stream already has it or closed it."""
+        order_id = order["orderId"]
+        if order.get("status") in CLOSED_ORDER_STATUSES or order_id in self._closed_ids:
+            self.active_orders.pop(order_id, None)
+            return
+        # A stream event for the order is at least as recent as the response
+        self.active_orders.setdefault(order_id, order)
+
+    def update_order(self, order):
+        """Record an order from a user data stream event, unless it was already closed (e.g. by a cancel ack)."""
+        if order["orderId"] not in self._closed_ids:
+            self.active_orders[order["orderId"]] = order
+
+    def order_closed(self, order_id):
+        """Drop an order that was filled, cancelled or expired, and keep it from being brought back."""
+        self.active_orders.pop(order_id, None)
+        self._closed_ids[order_id] = None
+        if len(self._closed_ids) > CLOSED_ORDER_MEMORY:
+            self._closed_ids.popitem(last=False)
+
+
+class OrderManager(OpenOrders):
+    def __init__(self, client: Client, pair: str, max_workers: int = 8, filters=None):
         """
         Initialize the OrderManager.
         
         Args:
             client (Client): Binance API client.
             pair (str): The trading pair, e.g., 'BTCUSDT'.
+            max_workers (int): Maximum number of requests dispatched concurrently by sync_quotes.
+            filters (SymbolFilters, optional): When given, orders are rounded onto the tick and
+                step grids and checked locally before they are sent.
         """
         self.client = client
         self.pair = pair
-        self.active_orders = {}  # Track active orders by their IDs
+        self.filters = filters
+        self._init_open_orders()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
 
     def place_order(self, side: str, price: float, order_size: float):
         """
@@ -27,19 +159,20 @@ class OrderManager:
             dict: The API response for the placed order.
         """
         try:
+            price, quantity = order_values(self.filters, side, price, order_size)
             order = self.client.create_order(
                 symbol=self.pair,
                 side=side,
                 type=ORDER_TYPE_LIMIT,
                 timeInForce=TIME_IN_FORCE_GTC,
-                quantity=order_size,
-                price=f"{price:.2f}",
+                quantity=quantity,
+                price=price,
             )
-            self.active_orders[order["orderId"]] = order
-            print(f"Placed {side} order at {price:.2f} for {order_size} {self.pair}")
+            self.track_order(order)
+            print(f"Placed {side} order at {price} for {quantity} {self.pair}")
             return order
         except Exception as e:
-            print(f"Error placing {side} order at {price:.2f}: {e}")
+            print(f"Error placing {side} order at {price}: {e}")
             return None
 
     def cancel_order(self, order_id: str):
@@ -54,27 +187,85 @@ class OrderManager:
         """
         try:
             response = self.client.cancel_order(symbol=self.pair, orderId=order_id)
-            if order_id in self.active_orders:
-                del self.active_orders[order_id]
+            self.order_closed(order_id)
             print(f"Canceled order ID: {order_id}")
             return response
         except Exception as e:
             print(f"Error canceling order ID {order_id}: {e}")
             return None
 
+    def replace_order(self, order_id, side: str, price: float, order_size: float):
+        """
+        Atomically cancel an order and place a new one in a single request.
+        
+        Args:
+            order_id: The ID of the order to replace.
+            side (str): 'BUY' or 'SELL'.
+            price (float): The price of the new order.
+            order_size (float): The size of the new order.
+        
+        Returns:
+            dict: The new order, or None if the replace failed.
+        """
+        try:
+            price, quantity = order_values(self.filters, side, price, order_size)
+            response = self.client.cancel_replace_order(
+                symbol=self.pair,
+                side=side,
+                type=ORDER_TYPE_LIMIT,
+                timeInForce=TIME_IN_FORCE_GTC,
+                cancelReplaceMode="STOP_ON_FAILURE",
+                cancelOrderId=order_id,
+                quantity=quantity,
+                price=price,
+            )
+            self.order_closed(order_id)
+            order = response["newOrderResponse"]
+            self.track_order(order)
+            print(f"Replaced order ID {order_id} with {side} at {price} for {quantity} {self.pair}")
+            return order
+        except Exception as e:
+            print(f"Error replacing order ID {order_id}: {e}")
+            return None
+
     def cancel_all_orders(self):
         """
-        Cancel all active orders for the trading pair.
+        Cancel all active orders for the trading pair with a single request.
         
         Returns:
             list: A list of responses for all canceled orders.
         """
-        responses = []
-        for order_id in list(self.active_orders.keys()):
-            response = self.cancel_order(order_id)
-            if response:
-                responses.append(response)
-        return responses
+        try:
+            responses = self.client.cancel_all_open_orders(symbol=self.pair)
+            for order_id in list(self.active_orders):
+                self.order_closed(order_id)
+            print(f"Canceled all orders for {self.pair}")
+            return responses
+        except Exception as e:
+            print(f"Error canceling all orders for {self.pair}: {e}")
+            return []
+
+    def sync_quotes(self, desired_quotes):
+        """
+        Bring resting orders in line with a quote ladder, touching only levels that changed.
+        
+        Replacements, new orders and cancels are dispatched concurrently.
+        
+        Args:
+            desired_quotes (list): (side, price, size) tuples.
+        
+        Returns:
+            list: The API responses, None for requests that failed.
+        """
+        desired_quotes = align_quotes(self.filters, desired_quotes)
+        replace, place, cancel = diff_quotes(
+            list(self.active_orders.values()), desired_quotes,
+            *((self.filters.tick_size, self.filters.step_size) if self.filters else ()),
+        )
+        futures = [self.executor.submit(self.replace_order, order["orderId"], *quote) for order, quote in replace]
+        futures += [self.executor.submit(self.place_order, *quote) for quote in place]
+        futures += [self.executor.submit(self.cancel_order, order["orderId"]) for order in cancel]
+        return [future.result() for future in futures]
 
     def get_active_orders(self):
         """
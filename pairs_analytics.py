@@ -0,0 +1,275 @@
+import math
+import time
+import numpy as np
+from data_manager import TOP_OF_BOOK
+
+# Engle-Granger 5% critical value for the residual of a two-variable cointegrating regression
+EG_CRITICAL_5PCT = -3.34
+
+
+def halflife_weight(halflife):
+    """Return the per-update EWMA weight for a half-life measured in updates."""
+    return 1 - math.exp(-math.log(2) / halflife)
+
+
+class PairsAnalytics:
+    """
+    Incremental hedge ratio, spread z-score and stationarity statistics for many pairs.
+
+    Each pair models y = beta * x + alpha. State is held in arrays with one
+    row per pair, so an update costs O(1) per pair and a tick for any subset
+    of pairs is a handful of vectorized NumPy operations:
+
+    - The hedge ratio is tracked with a Kalman filter (beta and alpha as a
+      random walk) or recursive least squares with a forgetting factor.
+    - The spread y - alpha - beta * x uses the parameters from before the
+      update, so it is not fitted to the sample it measures, and is
+      standardized with an exponentially weighted mean and variance.
+    - Stationarity is judged with an exponentially weighted Dickey-Fuller
+      regression of the spread's change on its previous value, whose slope
+      also gives the mean-reversion half-life. The regression keeps the
+      weighted moments of the raw prices rather than of past spreads, so the
+      whole window is tested with one hedge ratio instead of a series that
+      mixes every past beta (whose tracking error would dominate it).
+    """
+
+    def __init__(self, n_pairs, method="kalman", delta=1e-6, observation_var=1e-3, forgetting=0.999,
+                 zscore_halflife=500, stationarity_halflife=5000, warmup=100):
+        """
+        Args:
+            n_pairs (int): Number of pairs tracked.
+            method (str): 'kalman' or 'rls'.
+            delta (float): Kalman process noise; larger lets the hedge ratio move faster.
+            observation_var (float): Kalman observation noise variance.
+            forgetting (float): RLS forgetting factor; closer to 1 remembers longer.
+            zscore_halflife (float): Half-life, in updates, of the spread's mean and variance.
+            stationarity_halflife (float): Half-life, in updates, of the Dickey-Fuller regression.
+            warmup (int): Updates per pair before z-scores and statistics are reported.
+        """
+        if method not in ("kalman", "rls"):
+            raise ValueError(f"Unknown method '{method}'. Choose 'kalman' or 'rls'")
+        self.n_pairs = n_pairs
+        self.method = method
+        if method == "kalman":
+            self._decay, self._process_var, self._observation_var = 1.0, delta / (1 - delta), observation_var
+        else:
+            self._decay, self._process_var, self._observation_var = forgetting, 0.0, 1.0
+        self._z_weight = halflife_weight(zscore_halflife)
+        self._df_decay = 1 - halflife_weight(stationarity_halflife)
+        self.warmup = warmup
+
+        self.theta = np.zeros((n_pairs, 2))  # beta, alpha
+        self.P = np.tile(np.eye(2) * 1e3, (n_pairs, 1, 1))  # Parameter covariance
+        self.count = np.zeros(n_pairs, dtype=np.int64)
+        self.spread_mean = np.zeros(n_pairs)
+        self.spread_var = np.zeros(n_pairs)
+        # Prices are taken relative to each pair's first observation to keep the moments well conditioned
+        self.origin = np.full((n_pairs, 2), np.nan)
+        self.last_prices = np.full((n_pairs, 2), np.nan)  # Previous x, y relative to origin
+        # Exponentially weighted moments of (1, x[t-1], y[t-1], dx, dy) for the Dickey-Fuller regression
+        self._df_moments = np.zeros((n_pairs, 5, 5))
+
+    def update(self, x, y, index=None):
+        """
+        Feed one observation per pair.
+
+        Args:
+            x (array-like): Price of the first leg, one per selected pair.
+            y (array-like): Price of the second leg, one per selected pair.
+            index (array-like, optional): Which pairs the values belong to. All pairs if None.
+
+        Returns:
+            dict: Arrays for the selected pairs: beta, alpha, spread, zscore,
+                df_stat, half_life and stationary (NaN/False during warmup).
+        """
+        i = np.arange(self.n_pairs) if index is None else np.asarray(index)
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        h = np.stack((x, np.ones_like(x)), axis=1)
+
+        # Kalman / RLS step on the 2x2 parameter covariance
+        P = self.P[i] / self._decay
+        P[:, 0, 0] += self._process_var
+        P[:, 1, 1] += self._process_var
+        theta = self.theta[i]
+        # The prediction error is the spread y - alpha - beta * x at the parameters before this sample
+        spread = y - (theta * h).sum(axis=1)
+        beta = theta[:, 0].copy()
+        Ph = np.einsum("kij,kj->ki", P, h)
+        gain = Ph / ((h * Ph).sum(axis=1) + self._observation_var)[:, None]
+        theta = theta + gain * spread[:, None]
+        P -= gain[:, :, None] * Ph[:, None, :]
+        self.theta[i] = theta
+        self.P[i] = P
+
+        count = self.count[i] + 1
+        self.count[i] = count
+
+        # Exponentially weighted mean and variance of the spread
+        mean, var = self.spread_mean[i], self.spread_var[i]
+        first = count == 1
+        diff = spread - mean
+        mean = np.where(first, spread, mean + self._z_weight * diff)
+        var = np.where(first, 0.0, (1 - self._z_weight) * (var + self._z_weight * diff * diff))
+        self.spread_mean[i], self.spread_var[i] = mean, var
+
+        # Dickey-Fuller regression d(spread) = a + b * spread[t-1] over the weighted window
+        origin = self.origin[i]
+        origin = np.where(np.isnan(origin), np.stack((x, y), axis=1), origin)
+        self.origin[i] = origin
+        prices = np.stack((x, y), axis=1) - origin
+        lag = self.last_prices[i]
+        has_lag = ~np.isnan(lag[:, 0])
+        lag = np.where(has_lag[:, None], lag, 0.0)
+        v = np.concatenate((np.ones((len(i), 1)), lag, prices - lag), axis=1)
+        moments = self._df_moments[i] * np.where(has_lag, self._df_decay, 1.0)[:, None, None]
+        moments += has_lag[:, None, None] * (v[:, :, None] * v[:, None, :])
+        self._df_moments[i] = moments
+        self.last_prices[i] = prices
+
+        # spread[t-1] and its change as linear combinations of v, with beta held fixed for the window;
+        # alpha only shifts the level, which the regression's intercept absorbs
+        zeros, ones = np.zeros_like(beta), np.ones_like(beta)
+        c_lag = np.stack((zeros, -beta, ones, zeros, zeros), axis=1)
+        c_change = np.stack((zeros, zeros, zeros, -beta, ones), axis=1)
+        first_moments = moments[:, :, 0]
+        n = np.maximum(moments[:, 0, 0], 1e-12)
+        mx = (c_lag * first_moments).sum(axis=1) / n
+        my = (c_change * first_moments).sum(axis=1) / n
+        vxx = np.einsum("ki,kij,kj->k", c_lag, moments, c_lag) / n - mx * mx
+        vxy = np.einsum("ki,kij,kj->k", c_lag, moments, c_change) / n - mx * my
+        vyy = np.einsum("ki,kij,kj->k", c_change, moments, c_change) / n - my * my
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = vxy / vxx
+            residual_var = np.maximum(vyy - slope * vxy, 0.0)
+            df_stat = slope / np.sqrt(residual_var / (n * vxx))
+            zscore = (spread - mean) / np.sqrt(var)
+            half_life = np.where((slope < 0) & (slope > -1), -math.log(2) / np.log1p(slope), np.inf)
+
+        ready = count > self.warmup
+        df_stat = np.where(ready, df_stat, np.nan)
+        return {
+            "beta": theta[:, 0],
+            "alpha": theta[:, 1],
+            "spread": spread,
+            "zscore": np.where(ready, zscore, np.nan),
+            "df_stat": df_stat,
+            "half_life": np.where(ready, half_life, np.nan),
+            "stationary": df_stat < EG_CRITICAL_5PCT,
+        }
+
+    def run(self, x, y):
+        """
+        Run over aligned historical prices.
+
+        Args:
+            x (array-like): First-leg prices, shape (T,) for one pair or (T, n_pairs).
+            y (array-like): Second-leg prices, same shape as x.
+
+        Returns:
+            dict: The fields of update() as arrays of shape (T,) or (T, n_pairs).
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        single = x.ndim == 1
+        if single:
+            x, y = x[:, None], y[:, None]
+        results = {}
+        for t in range(len(x)):
+            step = self.update(x[t], y[t])
+            for name, values in step.items():
+                if name not in results:
+                    results[name] = np.empty((len(x), self.n_pairs), dtype=values.dtype)
+                results[name][t] = values
+        return {name: values[:, 0] if single else values for name, values in results.items()}
+
+
+def align_asof(ts_x, x, ts_y, y, max_staleness=None):
+    """
+    Align two price series on the union of their timestamps, carrying each one's last value forward.
+
+    Args:
+        ts_x, x: Timestamps (sorted) and prices of the first series.
+        ts_y, y: Timestamps (sorted) and prices of the second series.
+        max_staleness (optional): Drop points where either price is older than this (same units as ts).
+
+    Returns:
+        tuple: (ts, x, y) arrays starting from the first time both series have a price.
+    """
+    ts_x, x, ts_y, y = map(np.asarray, (ts_x, x, ts_y, y))
+    ts = np.union1d(ts_x, ts_y)
+    ix = np.searchsorted(ts_x, ts, side="right") - 1
+    iy = np.searchsorted(ts_y, ts, side="right") - 1
+    keep = (ix >= 0) & (iy >= 0)
+    if max_staleness is not None:
+        keep &= (ts - ts_x[np.maximum(ix, 0)] <= max_staleness) & (ts - ts_y[np.maximum(iy, 0)] <= max_staleness)
+    return ts[keep], x[ix[keep]], y[iy[keep]]
+
+
+class PairsMonitor:
+    """
+    Live pairs analytics driven by DataManager top-of-book updates.
+
+    Mid prices are tracked per symbol; whenever a symbol ticks, every pair it
+    belongs to is updated in one vectorized step using the other leg's latest
+    price, provided that is no older than max_staleness.
+    """
+
+    def __init__(self, pairs, max_staleness=5.0, **analytics_kwargs):
+        """
+        Args:
+            pairs (list): (x_symbol, y_symbol) tuples.
+            max_staleness (float): Seconds after which a leg's last price is too old to use.
+            **analytics_kwargs: Passed to PairsAnalytics.
+        """
+        self.pairs = [(x.upper(), y.upper()) for x, y in pairs]
+        self.max_staleness = max_staleness
+        self.analytics = PairsAnalytics(len(self.pairs), **analytics_kwargs)
+        self.prices = {}  # Symbol -> (time, mid price)
+        self.latest = [None] * len(self.pairs)  # Last result per pair
+        self._pairs_by_symbol = {}
+        for index, (x, y) in enumerate(self.pairs):
+            self._pairs_by_symbol.setdefault(x, []).append(index)
+            self._pairs_by_symbol.setdefault(y, []).append(index)
+
+    def attach(self, data_managers):
+        """Listen to the top-of-book updates of a {symbol: DataManager} mapping."""
+        for symbol, data_manager in data_managers.items():
+            symbol = symbol.upper()
+            if symbol in self._pairs_by_symbol:
+                data_manager.register_listener(self._listener(symbol), events=(TOP_OF_BOOK,))
+
+    def _listener(self, symbol):
+        def on_top_of_book(top_of_book, order_book_depth):
+            bid, ask = top_of_book.get("best_bid_price"), top_of_book.get("best_ask_price")
+            if bid and ask:
+                self.on_price(symbol, (bid + ask) / 2)
+        return on_top_of_book
+
+    def on_price(self, symbol, price, now=None):
+        """Record a symbol's price and update the pairs it belongs to."""
+        now = time.time() if now is None else now
+        self.prices[symbol] = (now, price)
+        index, x, y = [], [], []
+        for i in self._pairs_by_symbol.get(symbol, ()):
+            x_symbol, y_symbol = self.pairs[i]
+            x_quote, y_quote = self.prices.get(x_symbol), self.prices.get(y_symbol)
+            if x_quote is None or y_quote is None:
+                continue
+            if now - min(x_quote[0], y_quote[0]) > self.max_staleness:
+                continue
+            index.append(i)
+            x.append(x_quote[1])
+            y.append(y_quote[1])
+        if not index:
+            return
+        results = self.analytics.update(x, y, index)
+        for row, i in enumerate(index):
+            self.latest[i] = {name: values[row].item() for name, values in results.items()}
+
+    def snapshot(self):
+        """Return the latest analytics for every pair that has been updated."""
+        return [
+            {"x": x, "y": y, **latest}
+            for (x, y), latest in zip(self.pairs, self.latest) if latest is not None
+        ]
@@ -0,0 +1,298 @@
+import asyncio
+import re
+import threading
+import time
+from urllib.parse import parse_qsl, urlparse
+from requests.adapters import HTTPAdapter
+
+# Request priorities, most urgent first
+CANCEL, ORDER, QUERY = 0, 1, 2
+PRIORITIES = (CANCEL, ORDER, QUERY)
+# Share of each bucket's burst a priority must leave untouched, so cancels always get through
+RESERVE = {CANCEL: 0.0, ORDER: 0.1, QUERY: 0.25}
+
+# Spot limits in the exchangeInfo "rateLimits" layout, used until configure() is given the live ones
+DEFAULT_RATE_LIMITS = [
+    {"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1, "limit": 6000},
+    {"rateLimitType": "ORDERS", "interval": "SECOND", "intervalNum": 10, "limit": 100},
+    {"rateLimitType": "ORDERS", "interval": "DAY", "intervalNum": 1, "limit": 200000},
+    {"rateLimitType": "RAW_REQUESTS", "interval": "MINUTE", "intervalNum": 5, "limit": 61000},
+]
+INTERVAL_SECONDS = {"SECOND": 1, "MINUTE": 60, "HOUR": 3600, "DAY": 86400, "S": 1, "M": 60, "H": 3600, "D": 86400}
+
+# Request weights of the endpoints the stack uses; anything else counts as 1
+ENDPOINT_WEIGHTS = {
+    ("GET", "/v3/ping"): 1,
+    ("GET", "/v3/time"): 1,
+    ("GET", "/v3/exchangeInfo"): 20,
+    ("GET", "/v3/account"): 20,
+    ("GET", "/v3/order"): 4,
+    ("POST", "/v3/order"): 1,
+    ("DELETE", "/v3/order"): 1,
+    ("POST", "/v3/order/cancelReplace"): 1,
+    ("DELETE", "/v3/openOrders"): 1,
+    ("POST", "/v3/userDataStream"): 2,
+    ("PUT", "/v3/userDataStream"): 2,
+    ("DELETE", "/v3/userDataStream"): 2,
+}
+# GET /v3/depth weight by requested limit
+DEPTH_WEIGHTS = ((100, 5), (500, 25), (1000, 50), (5000, 250))
+ORDER_ENDPOINTS = {("POST", "/v3/order"), ("POST", "/v3/order/cancelReplace")}
+CANCEL_ENDPOINTS = {("DELETE", "/v3/order"), ("DELETE", "/v3/openOrders")}
+
+USAGE_HEADER = re.compile(r"X-MBX-(USED-WEIGHT|ORDER-COUNT)-(\d+)([SMHD])$")
+HEADER_LIMIT_TYPES = {"USED-WEIGHT": "REQUEST_WEIGHT", "ORDER-COUNT": "ORDERS"}
+
+
+def request_cost(method, endpoint, params=None):
+    """
+    Return (weight, orders, priority) for a request.
+
+    Args:
+        method (str): HTTP method.
+        endpoint (str): Path below the API root, e.g. '/v3/order'.
+        params (dict, optional): Request parameters (some weights depend on them).
+    """
+    method = method.upper()
+    params = params or {}
+    key = (method, endpoint)
+    if key == ("GET", "/v3/depth"):
+        limit = int(params.get("limit", 100))
+        weight = next((w for bound, w in DEPTH_WEIGHTS if limit <= bound), DEPTH_WEIGHTS[-1][1])
+    elif key == ("GET", "/v3/openOrders"):
+        weight = 6 if params.get("symbol") else 80
+    else:
+        weight = ENDPOINT_WEIGHTS.get(key, 1)
+    orders = 1 if key in ORDER_ENDPOINTS else 0
+    priority = CANCEL if key in CANCEL_ENDPOINTS else ORDER if orders else QUERY
+    return weight, orders, priority
+
+
+def endpoint_of(url):
+    """Return the path of a REST URL below the API root ('/api/v3/order' -> '/v3/order')."""
+    path = urlparse(url).path
+    return path.split("/api", 1)[1] if "/api" in path else path
+
+
+class TokenBucket:
+    """
+    One exchange limit, enforced as a smoothly refilling token bucket.
+
+    The bucket refills at safety * limit per interval and holds at most the
+    remaining (1 - safety) * limit as burst, so no fixed window of the
+    exchange's can ever see more than the limit, while requests are spread
+    out instead of exhausting the window in the first second.
+    """
+
+    def __init__(self, limit_type, interval, limit, safety=0.9, share=1.0):
+        """
+        Args:
+            limit_type (str): REQUEST_WEIGHT, ORDERS or RAW_REQUESTS.
+            interval (float): Window length in seconds.
+            limit (int): Allowance per window.
+            safety (float): Share of the limit refilled steadily; the rest is burst capacity.
+            share (float): Fraction of the limit this process may use (several processes on one account).
+        """
+        self.limit_type = limit_type
+        self.interval = interval
+        self.limit = limit
+        self.rate = safety * limit * share / interval
+        self.capacity = max(1.0, (1 - safety) * limit * share)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.used = 0  # Last usage reported by the exchange for the current window
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost, reserve):
+        """Seconds until cost tokens can be taken while leaving reserve * capacity behind."""
+        missing = cost + reserve * self.capacity - self.tokens
+        return max(missing, 0.0) / self.rate
+
+    def sync(self, used):
+        """Never hold more tokens than the exchange says are left in its window."""
+        self.used = used
+        self.tokens = min(self.tokens, self.limit - used)
+
+
+class RateLimitGovernor:
+    """
+    Process-wide throttle for Binance REST requests.
+
+    Every request first takes its weight (and order count) from token buckets
+    modelling the exchange limits; usage headers on the responses keep the
+    buckets in line with what the exchange has counted, including requests
+    made by other processes on the same IP or account, and a 429 or 418
+    stops all requests until its Retry-After has passed.
+
+    Cancels are served first: waiting requests are released in priority
+    order, and orders and queries must leave part of each bucket unused.
+    Both blocking (threads, requests) and asyncio callers are supported.
+    """
+
+    def __init__(self, rate_limits=None, safety=0.9, share=1.0):
+        """
+        Args:
+            rate_limits (list, optional): exchangeInfo "rateLimits" entries (DEFAULT_RATE_LIMITS if None).
+            safety (float): See TokenBucket.
+            share (float): See TokenBucket.
+        """
+        self.safety = safety
+        self.share = share
+        self.rate_limits = None
+        self.buckets = []
+        self.blocked_until = 0.0
+        self.waiting = {priority: 0 for priority in PRIORITIES}
+        self.stats = {"requests": 0, "throttled": 0, "wait_seconds": 0.0, "rejections": 0}
+        self._lock = threading.Lock()
+        self.configure(rate_limits or DEFAULT_RATE_LIMITS)
+
+    def configure(self, rate_limits=None, share=None):
+        """
+        Rebuild the buckets.
+
+        Args:
+            rate_limits (list, optional): exchangeInfo "rateLimits" entries (the current ones if None).
+            share (float, optional): New fraction of the limits this process may use.
+        """
+        self.rate_limits = rate_limits or self.rate_limits
+        if share is not None:
+            self.share = share
+        buckets = [
+            TokenBucket(
+                limit["rateLimitType"], INTERVAL_SECONDS[limit["interval"]] * limit["intervalNum"],
+                limit["limit"], self.safety, self.share,
+            )
+            for limit in self.rate_limits
+        ]
+        with self._lock:
+            self.buckets = buckets
+
+    def _reserve(self, weight, orders, priority):
+        """Take the tokens if allowed now; otherwise return the seconds to wait before retrying."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            delay = 0.0
+            costs = []
+            for bucket in self.buckets:
+                bucket.refill(now)
+                cost = weight if bucket.limit_type == "REQUEST_WEIGHT" else \
+                    orders if bucket.limit_type == "ORDERS" else 1
+                if cost:
+                    delay = max(delay, bucket.wait_time(cost, RESERVE[priority]))
+                    costs.append((bucket, cost))
+            if any(self.waiting[p] for p in PRIORITIES if p < priority):
+                # Let the more urgent requests go first
+                delay = max(delay, 0.001)
+            if delay > 0:
+                return delay
+            for bucket, cost in costs:
+                bucket.tokens -= cost
+            self.stats["requests"] += 1
+            return 0.0
+
+    def _wait_start(self, priority):
+        with self._lock:
+            self.waiting[priority] += 1
+
+    def _wait_end(self, priority, waited):
+        with self._lock:
+            self.waiting[priority] -= 1
+            if waited:
+                self.stats["throttled"] += 1
+                self.stats["wait_seconds"] += waited
+
+    def acquire_sync(self, method, endpoint, params=None):
+        """Block the calling thread until the request may be sent."""
+        weight, orders, priority = request_cost(method, endpoint, params)
+        delay = self._reserve(weight, orders, priority)
+        if not delay:
+            return
+        started = time.monotonic()
+        self._wait_start(priority)
+        try:
+            while delay:
+                time.sleep(delay)
+                delay = self._reserve(weight, orders, priority)
+        finally:
+            self._wait_end(priority, time.monotonic() - started)
+
+    async def acquire(self, method, endpoint, params=None):
+        """Wait, without blocking the event loop, until the request may be sent."""
+        weight, orders, priority = request_cost(method, endpoint, params)
+        delay = self._reserve(weight, orders, priority)
+        if not delay:
+            return
+        started = time.monotonic()
+        self._wait_start(priority)
+        try:
+            while delay:
+                await asyncio.sleep(delay)
+                delay = self._reserve(weight, orders, priority)
+        finally:
+            self._wait_end(priority, time.monotonic() - started)
+
+    def on_response(self, status, headers):
+        """
+        Update the buckets from a response's usage headers and back off on 429/418.
+
+        Args:
+            status (int): HTTP status code.
+            headers (Mapping): Response headers (any case).
+        """
+        usage = []
+        for name, value in headers.items():
+            match = USAGE_HEADER.match(name.upper())
+            if match:
+                kind, number, unit = match.groups()
+                usage.append((HEADER_LIMIT_TYPES[kind], int(number) * INTERVAL_SECONDS[unit], int(value)))
+        with self._lock:
+            for limit_type, interval, used in usage:
+                for bucket in self.buckets:
+                    if bucket.limit_type == limit_type and bucket.interval == interval:
+                        bucket.sync(used)
+            if status in (418, 429):
+                retry_after = next((v for k, v in headers.items() if k.lower() == "retry-after"), None)
+                retry_after = float(retry_after) if retry_after else 60.0
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+                self.stats["rejections"] += 1
+        if status in (418, 429):
+            print(f"Binance rate limit hit (HTTP {status}); pausing requests for {retry_after:g}s")
+
+    def usage(self):
+        """Return the exchange-reported usage of each limit, e.g. {'REQUEST_WEIGHT 60s': 1200}."""
+        with self._lock:
+            return {f"{b.limit_type} {b.interval:g}s": b.used for b in self.buckets}
+
+    def mount(self, session):
+        """Throttle every request made through a requests.Session (e.g. a python-binance Client's)."""
+        adapter = GovernedAdapter(self)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+
+class GovernedAdapter(HTTPAdapter):
+    """requests transport adapter that passes every request through a RateLimitGovernor."""
+
+    def __init__(self, governor, **kwargs):
+        self.governor = governor
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        params = dict(parse_qsl(urlparse(request.url).query))
+        if isinstance(request.body, (str, bytes)) and request.body:
+            body = request.body.decode() if isinstance(request.body, bytes) else request.body
+            params.update(parse_qsl(body))
+        self.governor.acquire_sync(request.method, endpoint_of(request.url), params)
+        response = super().send(request, **kwargs)
+        self.governor.on_response(response.status_code, response.headers)
+        return response
+
+
+# Shared by every REST client in the process: the exchange counts weight per IP and orders per account
+governor = RateLimitGovernor()
@@ -0,0 +1,387 @@
+import asyncio
+import heapq
+import json
+import os
+import time
+import numpy as np
+from events import DepthUpdate, TopOfBook
+from order_book import LocalOrderBook, OrderBookOutOfSync
+
+# Stream names, also the directory names under <root>/<SYMBOL>/
+BOOK_TICKER = "book_ticker"
+DEPTH = "depth"
+
+# One row per bookTicker update
+BOOK_TICKER_DTYPE = np.dtype([
+    ("ts", "<i8"),  # Local receive time, ns since the epoch
+    ("update_id", "<i8"),
+    ("bid_price", "<f8"),
+    ("bid_qty", "<f8"),
+    ("ask_price", "<f8"),
+    ("ask_qty", "<f8"),
+])
+
+# One row per price level; the rows of one depth update share ts, update_id and kind
+DEPTH_DTYPE = np.dtype([
+    ("ts", "<i8"),  # Local receive time, ns since the epoch
+    ("update_id", "<i8"),  # Final update ID (u), or lastUpdateId for a snapshot
+    ("first_update_id", "<i8"),  # First update ID (U)
+    ("event_time", "<i8"),  # Exchange event time (E), ms
+    ("kind", "u1"),  # DIFF or SNAPSHOT
+    ("side", "u1"),  # BID or ASK
+    ("price", "<f8"),
+    ("qty", "<f8"),  # 0 removes the level
+])
+
+DTYPES = {BOOK_TICKER: BOOK_TICKER_DTYPE, DEPTH: DEPTH_DTYPE}
+FORMAT_VERSION = 1
+DIFF, SNAPSHOT = 0, 1
+BID, ASK = 0, 1
+# Event kind used for top-of-book updates in the replay merge
+TOP_OF_BOOK_EVENT = 2
+
+# Rows per chunk file before a new one is started
+CHUNK_ROWS = 1_000_000
+# Rows buffered in memory between writes
+BUFFER_ROWS = 4096
+# Rows converted to Python objects at a time during replay
+REPLAY_BLOCK = 65536
+
+
+class ChunkWriter:
+    """
+    Appends fixed-width rows of one stream to a directory of chunk files.
+
+    Rows are buffered in a NumPy array and written as raw bytes, so a chunk is
+    simply an array of the stream's dtype. Chunk files are named after the
+    timestamp of their first row, which makes the file names a coarse index
+    and lets readers binary-search the ts column within each chunk.
+    """
+
+    def __init__(self, directory, dtype, chunk_rows=CHUNK_ROWS, buffer_rows=BUFFER_ROWS):
+        self.directory = directory
+        self.dtype = dtype
+        self.chunk_rows = chunk_rows
+        self.buffer = np.zeros(buffer_rows, dtype)
+        self.rows = 0
+        self._file = None
+        self._chunk_rows = 0
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            with open(meta_path, "w") as f:
+                json.dump({"version": FORMAT_VERSION, "dtype": dtype.descr}, f)
+
+    def append(self, row):
+        """Buffer one row given as a tuple in dtype field order."""
+        if self.rows == len(self.buffer):
+            self.flush()
+        self.buffer[self.rows] = row
+        self.rows += 1
+
+    def extend(self, rows):
+        """Buffer a structured array of rows, keeping them in one chunk."""
+        if self.rows + len(rows) > len(self.buffer):
+            self.flush()
+        if len(rows) > len(self.buffer):
+            self._write(rows)
+        else:
+            self.buffer[self.rows:self.rows + len(rows)] = rows
+            self.rows += len(rows)
+
+    def flush(self):
+        """Write the buffered rows to the current chunk file."""
+        if self.rows:
+            self._write(self.buffer[:self.rows])
+            self.rows = 0
+
+    def close(self):
+        """Flush and close the current chunk file."""
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, rows):
+        # Chunks are only rolled between writes so an update's rows never straddle two files
+        if self._file is None or self._chunk_rows >= self.chunk_rows:
+            if self._file is not None:
+                self._file.close()
+            path = os.path.join(self.directory, f"{int(rows[0]['ts']):020d}.bin")
+            self._file = open(path, "ab")
+            self._chunk_rows = 0
+        self._file.write(rows.tobytes())
+        self._file.flush()
+        self._chunk_rows += len(rows)
+
+
+class MarketDataRecorder:
+    """
+    Records bookTicker and depth updates seen by DataManagers to chunked binary files.
+
+    Register it with DataManager.register_recorder(); it is called for every
+    update, not a conflated subset. Depth is stored as the levels each diff
+    changed, with a full snapshot of the book whenever it was rebuilt and at
+    least every snapshot_interval seconds so replay can start anywhere.
+    Files are laid out as <root>/<SYMBOL>/<stream>/<first ts>.bin.
+    """
+
+    def __init__(self, root, chunk_rows=CHUNK_ROWS, buffer_rows=BUFFER_ROWS, snapshot_interval=60):
+        """
+        Args:
+            root (str): Directory the recordings are written under.
+            chunk_rows (int): Rows per chunk file.
+            buffer_rows (int): Rows buffered in memory between writes.
+            snapshot_interval (float): Seconds between full depth snapshots.
+        """
+        self.root = root
+        self.chunk_rows = chunk_rows
+        self.buffer_rows = buffer_rows
+        self.snapshot_interval = snapshot_interval
+        self._writers = {}  # (symbol, stream) -> ChunkWriter
+        self._depth_update_ids = {}  # Symbol -> last update ID recorded
+        self._snapshot_times = {}  # Symbol -> time.monotonic() of the last snapshot
+
+    def _writer(self, symbol, stream):
+        writer = self._writers.get((symbol, stream))
+        if writer is None:
+            writer = self._writers[(symbol, stream)] = ChunkWriter(
+                os.path.join(self.root, symbol, stream), DTYPES[stream], self.chunk_rows, self.buffer_rows
+            )
+        return writer
+
+    def on_top_of_book(self, top_of_book):
+        """Record a TopOfBook update."""
+        self._writer(top_of_book.symbol, BOOK_TICKER).append((
+            time.time_ns(), top_of_book.update_id,
+            top_of_book.best_bid_price, top_of_book.best_bid_qty,
+            top_of_book.best_ask_price, top_of_book.best_ask_qty,
+        ))
+
+    def on_order_book_depth(self, book):
+        """Record the change a LocalOrderBook just went through."""
+        ts = time.time_ns()
+        event = book.last_event
+        last_update_id = self._depth_update_ids.get(book.symbol)
+        self._depth_update_ids[book.symbol] = book.last_update_id
+        contiguous = (
+            event is not None and last_update_id is not None
+            and event["U"] <= last_update_id + 1 and event["u"] == book.last_update_id
+        )
+        due = time.monotonic() - self._snapshot_times.get(book.symbol, float("-inf")) >= self.snapshot_interval
+        if contiguous and not due:
+            # Diffs that changed nothing have no rows, so each diff is stored as covering
+            # everything since the previous one recorded
+            rows = self._depth_rows(
+                ts, event["u"], last_update_id + 1, event.get("E") or 0, DIFF, event["b"], event["a"]
+            )
+        else:
+            self._snapshot_times[book.symbol] = time.monotonic()
+            depth = book.to_dict()
+            rows = self._depth_rows(
+                ts, book.last_update_id, book.last_update_id, book.event_time or 0, SNAPSHOT,
+                depth["bids"], depth["asks"],
+            )
+        self._writer(book.symbol, DEPTH).extend(rows)
+
+    @staticmethod
+    def _depth_rows(ts, update_id, first_update_id, event_time, kind, bids, asks):
+        bids = np.asarray(bids, dtype=np.float64).reshape(-1, 2)
+        asks = np.asarray(asks, dtype=np.float64).reshape(-1, 2)
+        rows = np.empty(len(bids) + len(asks), DEPTH_DTYPE)
+        rows["ts"] = ts
+        rows["update_id"] = update_id
+        rows["first_update_id"] = first_update_id
+        rows["event_time"] = event_time
+        rows["kind"] = kind
+        rows["side"][:len(bids)] = BID
+        rows["side"][len(bids):] = ASK
+        rows["price"] = np.concatenate((bids[:, 0], asks[:, 0]))
+        rows["qty"] = np.concatenate((bids[:, 1], asks[:, 1]))
+        return rows
+
+    def flush(self):
+        """Write every buffered row to disk."""
+        for writer in self._writers.values():
+            writer.flush()
+
+    async def flush_periodically(self, interval=1.0):
+        """Flush every interval seconds so a crash loses at most that much data."""
+        while True:
+            await asyncio.sleep(interval)
+            self.flush()
+
+    def close(self):
+        """Flush and close every file."""
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+class MarketDataReader:
+    """
+    Reads recordings written by MarketDataRecorder as memory-mapped NumPy arrays.
+
+    Chunks are mapped read-only, so slicing by time returns views into the
+    files without copying or loading them into memory.
+    """
+
+    def __init__(self, root, symbol):
+        """
+        Args:
+            root (str): Directory passed to MarketDataRecorder.
+            symbol (str): The trading pair, e.g., 'BTCUSDT'.
+        """
+        self.root = root
+        self.symbol = symbol.upper()
+
+    def chunk_paths(self, stream):
+        """Return the stream's chunk files in time order."""
+        directory = os.path.join(self.root, self.symbol, stream)
+        if not os.path.isdir(directory):
+            return []
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["version"] != FORMAT_VERSION:
+                raise ValueError(f"Unsupported recording format version {meta['version']} in {directory}")
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(".bin")]
+
+    @staticmethod
+    def _map(path, dtype):
+        # A partially written last row (e.g., after a crash) is ignored
+        rows = os.path.getsize(path) // dtype.itemsize
+        if rows == 0:
+            return np.empty(0, dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+
+    def iter_chunks(self, stream, start=None, end=None):
+        """
+        Yield memory-mapped views of the stream's rows with start <= ts < end.
+
+        Args:
+            stream (str): BOOK_TICKER or DEPTH.
+            start (int, optional): First timestamp, ns since the epoch.
+            end (int, optional): Timestamp to stop before, ns since the epoch.
+        """
+        paths = self.chunk_paths(stream)
+        chunk_starts = [int(os.path.basename(path)[:-4]) for path in paths]
+        for i, path in enumerate(paths):
+            # Chunks are named after their first row, so whole chunks can be skipped by name
+            if start is not None and i + 1 < len(paths) and chunk_starts[i + 1] <= start:
+                continue
+            if end is not None and chunk_starts[i] >= end:
+                break
+            rows = self._map(path, DTYPES[stream])
+            lo = 0 if start is None else np.searchsorted(rows["ts"], start, side="left")
+            hi = len(rows) if end is None else np.searchsorted(rows["ts"], end, side="left")
+            if hi > lo:
+                yield rows[lo:hi]
+
+    def read(self, stream, start=None, end=None):
+        """Return the stream's rows with start <= ts < end as one array (a view when it spans one chunk)."""
+        chunks = list(self.iter_chunks(stream, start, end))
+        if not chunks:
+            return np.empty(0, DTYPES[stream])
+        return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+    def last_snapshot_time(self, before):
+        """Return the ts of the last depth snapshot at or before a timestamp, or None."""
+        for chunk in reversed(list(self.iter_chunks(DEPTH, end=before + 1))):
+            snapshots = np.flatnonzero(chunk["kind"] == SNAPSHOT)
+            if len(snapshots):
+                return int(chunk["ts"][snapshots[-1]])
+        return None
+
+    def book_ticker_events(self, start=None, end=None):
+        """Yield (ts, top_of_book) as TopOfBook events, as produced by BookTickerDecoder."""
+        for chunk in self.iter_chunks(BOOK_TICKER, start, end):
+            for i in range(0, len(chunk), REPLAY_BLOCK):
+                for ts, update_id, bid_price, bid_qty, ask_price, ask_qty in chunk[i:i + REPLAY_BLOCK].tolist():
+                    yield ts, TopOfBook(self.symbol, update_id, bid_price, bid_qty, ask_price, ask_qty)
+
+    def depth_events(self, start=None, end=None):
+        """Yield (ts, kind, event): DepthUpdate diffs and snapshots in REST depth layout."""
+        for chunk in self.iter_chunks(DEPTH, start, end):
+            ts, update_id, kind = chunk["ts"], chunk["update_id"], chunk["kind"]
+            # Rows of one update are contiguous and share ts, update ID and kind
+            breaks = np.flatnonzero((ts[1:] != ts[:-1]) | (update_id[1:] != update_id[:-1]) | (kind[1:] != kind[:-1]))
+            bounds = np.concatenate(([0], breaks + 1, [len(chunk)]))
+            for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+                rows = chunk[lo:hi]
+                is_bid = rows["side"] == BID
+                levels = np.column_stack((rows["price"], rows["qty"]))
+                bids, asks = levels[is_bid], levels[~is_bid]
+                first = rows[0]
+                if first["kind"] == SNAPSHOT:
+                    yield int(first["ts"]), SNAPSHOT, {
+                        "lastUpdateId": int(first["update_id"]), "bids": bids, "asks": asks,
+                    }
+                else:
+                    yield int(first["ts"]), DIFF, DepthUpdate(
+                        self.symbol, int(first["event_time"]), int(first["first_update_id"]), int(first["update_id"]),
+                        bids, asks,
+                    )
+
+
+async def replay(reader, data_manager, speed=1.0, start=None, end=None):
+    """
+    Replay a recording through a DataManager, as if it were arriving live.
+
+    Top-of-book updates go to update_top_of_book and depth to
+    update_order_book_depth with a LocalOrderBook rebuilt from the recording,
+    so the usual listeners run unchanged.
+
+    Args:
+        reader (MarketDataReader): The recording to replay.
+        data_manager (DataManager): Receives the updates.
+        speed (float, optional): 1 for real time, N for N times faster, None for as fast as possible.
+        start (int, optional): First timestamp to replay, ns since the epoch.
+        end (int, optional): Timestamp to stop before, ns since the epoch.
+
+    Returns:
+        int: The number of updates delivered.
+    """
+    book = LocalOrderBook(reader.symbol)
+    # Depth diffs need a book to apply to, so rebuild it from the last snapshot before start
+    depth_start = start if start is None else (reader.last_snapshot_time(start) or start)
+    events = heapq.merge(
+        ((ts, TOP_OF_BOOK_EVENT, update) for ts, update in reader.book_ticker_events(start, end)),
+        ((ts, kind, event) for ts, kind, event in reader.depth_events(depth_start, end)),
+        key=lambda item: item[0],
+    )
+
+    loop = asyncio.get_running_loop()
+    first_ts = clock_start = None
+    delivered = 0
+    for ts, kind, payload in events:
+        if kind == SNAPSHOT:
+            book.load_snapshot(payload)
+        elif kind == DIFF:
+            if book.last_update_id is None:
+                continue  # Waiting for a snapshot
+            try:
+                if not book.apply_update(payload):
+                    continue
+            except OrderBookOutOfSync as e:
+                print(f"{reader.symbol} recording has a gap ({e}), waiting for the next snapshot")
+                book.clear()
+                continue
+        if start is not None and ts < start:
+            continue  # Catching the book up to start; nothing is delivered yet
+
+        if speed:
+            if first_ts is None:
+                first_ts, clock_start = ts, loop.time()
+            delay = clock_start + (ts - first_ts) / 1e9 / speed - loop.time()
+            await asyncio.sleep(max(delay, 0))
+        else:
+            await asyncio.sleep(0)  # Let the listener tasks run
+        if kind == TOP_OF_BOOK_EVENT:
+            data_manager.update_top_of_book(payload)
+        else:
+            data_manager.update_order_book_depth(book)
+        delivered += 1
+    return delivered
+
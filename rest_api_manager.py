@@ -1,71 +1,165 @@
+import json
 import requests
 import time
 import hmac
 import hashlib
+from urllib.parse import urlencode
+import aiohttp
+from requests.adapters import HTTPAdapter
+from latency import now, tracker
+from rate_limiter import governor
 
+# Binance error code for a timestamp outside recvWindow (local clock drifted from the exchange's)
+TIMESTAMP_ERROR = -1021
 
-class BinanceRestAPI:
-    """Simplified wrapper for Binance REST API requests."""
 
-    def __init__(self, base_url, api_key, api_secret):
+def _is_timestamp_error(data):
+    return isinstance(data, dict) and data.get("code") == TIMESTAMP_ERROR
+
+
+class _SignedRequests:
+    """Request signing and timestamping shared by the sync and async REST clients."""
+
+    def __init__(self, base_url, api_key=None, api_secret=None, rate_limiter=None, recv_window=None):
         self.base_url = base_url
         self.api_key = api_key
         self.api_secret = api_secret
+        self.rate_limiter = rate_limiter or governor
+        self.recv_window = recv_window
+        self.time_offset_ms = 0  # Exchange clock minus local clock
+        # Keyed once; each signature copies this state instead of re-keying from the secret
+        self._hmac = hmac.new(api_secret.encode("utf-8"), digestmod=hashlib.sha256) if api_secret else None
 
     def _create_signature(self, query_string):
         """Create HMAC SHA256 signature."""
-        return hmac.new(
-            self.api_secret.encode("utf-8"),
-            query_string.encode("utf-8"),
-            hashlib.sha256,
-        ).hexdigest()
+        mac = self._hmac.copy()
+        mac.update(query_string.encode("utf-8"))
+        return mac.hexdigest()
 
     def _get_headers(self):
         """Generate headers for the request."""
-        return {"X-MBX-APIKEY": self.api_key}
+        return {"X-MBX-APIKEY": self.api_key} if self.api_key else {}
 
-    def _make_request(self, method, endpoint, params=None):
-        """Make a signed request to the Binance API."""
-        params = params or {}
-        params["timestamp"] = int(time.time() * 1000)  # Add timestamp
-        query_string = "&".join([f"{key}={value}" for key, value in params.items()])
-        query_string += f"&signature={self._create_signature(query_string)}"
+    def _url(self, endpoint, params, signed):
+        """Build the request URL, timestamping and signing the query string if needed."""
+        if signed:
+            params = dict(params)
+            if self.recv_window:
+                params["recvWindow"] = self.recv_window
+            params["timestamp"] = int(time.time() * 1000) + self.time_offset_ms
+            query_string = urlencode(params)
+            query_string += f"&signature={self._create_signature(query_string)}"
+        else:
+            query_string = urlencode(params)
+        return f"{self.base_url}{endpoint}?{query_string}" if query_string else f"{self.base_url}{endpoint}"
 
-        url = f"{self.base_url}{endpoint}"
-        headers = self._get_headers()
+    def _set_time_offset(self, server_time_ms, sent_ms, received_ms):
+        self.time_offset_ms = int(server_time_ms - (sent_ms + received_ms) / 2)
 
-        if method == "GET":
-            response = requests.get(url, headers=headers, params=params)
-        elif method == "POST":
-            response = requests.post(url, headers=headers, params=params)
-        else:
-            raise ValueError("Unsupported HTTP method.")
+
+class BinanceRestAPI(_SignedRequests):
+    """
+    Wrapper for Binance REST API requests.
+
+    All requests share one pooled keep-alive session, so only the first
+    request to a host pays for the TCP and TLS handshakes. Signed requests
+    are timestamped on the exchange's clock (see sync_time) and every request
+    passes through the shared rate limiter and is timed under
+    'rtt <method> <endpoint>' in the latency tracker.
+    """
+
+    def __init__(self, base_url, api_key=None, api_secret=None, rate_limiter=None,
+                 recv_window=None, pool_size=10, timeout=10):
+        """
+        Initialize the BinanceRestAPI.
+
+        Args:
+            base_url (str): REST base URL, e.g., 'https://api.binance.com/api'.
+            api_key (str, optional): Binance API key (public endpoints only if None).
+            api_secret (str, optional): Binance API secret.
+            rate_limiter (RateLimitGovernor, optional): Defaults to the shared rate_limiter.governor.
+            recv_window (int, optional): recvWindow in milliseconds for signed requests.
+            pool_size (int): Keep-alive connections kept open per host.
+            timeout (float): Request timeout in seconds.
+        """
+        super().__init__(base_url, api_key, api_secret, rate_limiter, recv_window)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(self._get_headers())
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _request(self, method, endpoint, params=None, signed=False, retried=False):
+        """Send a request and return the decoded JSON response."""
+        params = params or {}
+        # Wait for the rate limiter before stamping, so a throttled request is not signed stale
+        self.rate_limiter.acquire_sync(method, endpoint, params)
+        url = self._url(endpoint, params, signed)
+        sent_ns = now() if tracker.enabled else None
+        response = self.session.request(method, url, timeout=self.timeout)
+        if sent_ns is not None:
+            tracker.record_since(f"rtt {method} {endpoint}", params.get("symbol"), sent_ns)
+        self.rate_limiter.on_response(response.status_code, response.headers)
+
+        if signed and not retried and response.status_code == 400:
+            try:
+                data = response.json()
+            except ValueError:
+                data = None
+            if _is_timestamp_error(data):
+                self.sync_time()
+                return self._request(method, endpoint, params, signed, retried=True)
 
         response.raise_for_status()  # Raise an error for bad responses
         return response.json()
 
-    def get_account_balance(self):
-        """Fetch account balances with detailed debugging."""
-        try:
-            params = {"timestamp": int(time.time() * 1000)}
-            query_string = "&".join([f"{key}={value}" for key, value in params.items()])
-            signature = self._create_signature(query_string)
-            query_string += f"&signature={signature}"
+    def _make_request(self, method, endpoint, params=None):
+        """Make a signed request to the Binance API."""
+        return self._request(method, endpoint, params, signed=True)
+
+    def close(self):
+        """Close the pooled connections."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
 
-            url = f"{self.base_url}/v3/account?{query_string}"
-            headers = self._get_headers()
-            response = requests.get(url, headers=headers)
+    def __exit__(self, *exc_info):
+        self.close()
 
-            response.raise_for_status()
-            return response.json()
+    def sync_time(self):
+        """
+        Measure the exchange clock offset used to timestamp signed requests.
+
+        Returns:
+            int: Exchange clock minus local clock in milliseconds.
+        """
+        sent_ms = time.time() * 1000
+        server_time = self.get_server_time()["serverTime"]
+        self._set_time_offset(server_time, sent_ms, time.time() * 1000)
+        return self.time_offset_ms
+
+    def get_server_time(self):
+        """Fetch the exchange server time (public endpoint, no signature)."""
+        return self._request("GET", "/v3/time")
+
+    def get_order_book(self, symbol, limit=1000):
+        """Fetch a depth snapshot (public endpoint, no signature)."""
+        return self._request("GET", "/v3/depth", {"symbol": symbol.upper(), "limit": limit})
+
+    def get_exchange_info(self):
+        """Fetch trading rules and filters for every symbol (public endpoint, no signature)."""
+        return self._request("GET", "/v3/exchangeInfo")
+
+    def get_account_balance(self):
+        """Fetch account balances."""
+        try:
+            return self._make_request("GET", "/v3/account")
         except requests.exceptions.HTTPError as e:
             print(f"HTTPError: {e}")
-            print(f"Response Content: {response.text}")
+            print(f"Response Content: {e.response.text}")
             raise
-        except Exception as e:
-            print(f"Error: {e}")
-            raise
-
 
     def place_market_order(self, symbol, side, quantity):
         """Place a market order."""
@@ -76,3 +170,105 @@ class BinanceRestAPI:
             "quantity": quantity,
         }
         return self._make_request("POST", "/v3/order", params)
+
+
+class AsyncBinanceRestAPI(_SignedRequests):
+    """asyncio counterpart of BinanceRestAPI over one pooled keep-alive aiohttp session."""
+
+    def __init__(self, base_url, api_key=None, api_secret=None, rate_limiter=None,
+                 recv_window=None, pool_size=10, timeout=10):
+        """
+        Initialize the AsyncBinanceRestAPI.
+
+        Args:
+            See BinanceRestAPI.
+        """
+        super().__init__(base_url, api_key, api_secret, rate_limiter, recv_window)
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session = None  # Opened on first use, inside the running loop
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self.session = aiohttp.ClientSession(
+                connector=connector, headers=self._get_headers(), timeout=self.timeout
+            )
+        return self.session
+
+    async def _request(self, method, endpoint, params=None, signed=False, retried=False):
+        """Send a request and return the decoded JSON response."""
+        params = params or {}
+        await self.rate_limiter.acquire(method, endpoint, params)
+        url = self._url(endpoint, params, signed)
+        sent_ns = now() if tracker.enabled else None
+        async with self._get_session().request(method, url) as response:
+            self.rate_limiter.on_response(response.status, response.headers)
+            if response.status >= 400:
+                # Proxies and CDNs answer errors such as 502/503 with HTML, so the body may not be JSON
+                body = await response.text()
+                try:
+                    data = json.loads(body)
+                except ValueError:
+                    data = body
+            else:
+                data = await response.json(content_type=None)
+            if sent_ns is not None:
+                tracker.record_since(f"rtt {method} {endpoint}", params.get("symbol"), sent_ns)
+            if response.status >= 400:
+                if signed and not retried and _is_timestamp_error(data):
+                    await self.sync_time()
+                    return await self._request(method, endpoint, params, signed, retried=True)
+                raise aiohttp.ClientResponseError(
+                    response.request_info, response.history, status=response.status, message=str(data)
+                )
+            return data
+
+    async def _make_request(self, method, endpoint, params=None):
+        """Make a signed request to the Binance API."""
+        return await self._request(method, endpoint, params, signed=True)
+
+    async def close(self):
+        """Close the pooled connections."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def sync_time(self):
+        """Measure the exchange clock offset used to timestamp signed requests."""
+        sent_ms = time.time() * 1000
+        server_time = (await self.get_server_time())["serverTime"]
+        self._set_time_offset(server_time, sent_ms, time.time() * 1000)
+        return self.time_offset_ms
+
+    async def get_server_time(self):
+        """Fetch the exchange server time (public endpoint, no signature)."""
+        return await self._request("GET", "/v3/time")
+
+    async def get_order_book(self, symbol, limit=1000):
+        """Fetch a depth snapshot (public endpoint, no signature)."""
+        return await self._request("GET", "/v3/depth", {"symbol": symbol.upper(), "limit": limit})
+
+    async def get_exchange_info(self):
+        """Fetch trading rules and filters for every symbol (public endpoint, no signature)."""
+        return await self._request("GET", "/v3/exchangeInfo")
+
+    async def get_account_balance(self):
+        """Fetch account balances."""
+        return await self._make_request("GET", "/v3/account")
+
+    async def place_market_order(self, symbol, side, quantity):
+        """Place a market order."""
+        params = {
+            "symbol": symbol,
+            "side": side,
+            "type": "MARKET",
+            "quantity": quantity,
+        }
+        return await self._make_request("POST", "/v3/order", params)
@@ -0,0 +1,386 @@
+import argparse
+import asyncio
+import os
+import signal
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+from data_manager import DataManager
+from events import DepthSnapshot, TopOfBook
+from stream_multiplexer import StreamMultiplexer
+
+DEFAULT_DEPTH = 1000  # Levels per side kept in shared memory
+MAX_SYMBOLS = 256  # Symbols listed in the index segment
+POLL_INTERVAL = 0.001  # Seconds between reader checks for new data
+READ_ATTEMPTS = 100  # Seqlock read attempts before a reader gives up until its next poll
+MAGIC = 0x4B4F4F42  # 'BOOK'
+VERSION = 2
+
+# Per-symbol segment layout (native byte order, all fields 8 bytes):
+#   header  int64[4]   magic, version, depth capacity, publisher pid
+#   top     int64[4]   seq, update_id, publish time_ns, reserved
+#           float64[4] best bid price, best bid qty, best ask price, best ask qty
+#   depth   int64[6]   seq, last_update_id, event time (ms), publish time_ns, bid count, ask count
+#           float64[capacity, 2] bids, best first
+#           float64[capacity, 2] asks, best first
+# Each of the top and depth sections is guarded by its own seqlock: the writer
+# makes seq odd, writes the section and makes seq even again; a reader copies
+# the section and retries if seq was odd or changed while it was copying.
+HEADER_WORDS, TOP_WORDS, TOP_VALUES, DEPTH_WORDS = 4, 4, 4, 6
+TOP_OFFSET = HEADER_WORDS * 8
+DEPTH_OFFSET = TOP_OFFSET + (TOP_WORDS + TOP_VALUES) * 8
+LEVELS_OFFSET = DEPTH_OFFSET + DEPTH_WORDS * 8
+
+# Index segment: int64 seq, int64 count, int64 publisher pid, then MAX_SYMBOLS 16-byte symbol names
+INDEX_HEADER = struct.Struct("qqq")
+NAME_SIZE = 16
+# Byte offsets of the publisher pid, used to tell a leftover segment from a live one
+SEGMENT_PID_OFFSET = 3 * 8
+INDEX_PID_OFFSET = 2 * 8
+
+
+def segment_size(depth):
+    return LEVELS_OFFSET + 2 * depth * 2 * 8
+
+
+def segment_name(prefix, symbol):
+    # Kept short: macOS limits shared memory names to 31 characters
+    return f"{prefix}_{symbol.upper()}"
+
+
+def default_prefix(env):
+    return f"bbook_{env}"
+
+
+def _attach(name):
+    """Attach to an existing segment without letting this process's exit unlink it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=name)
+        try:
+            resource_tracker.unregister(segment._name, "shared_memory")
+        except Exception:
+            pass  # No tracker on this platform
+        return segment
+
+
+def _owner_exited(pid):
+    """True only if the process that created a segment has certainly exited."""
+    if pid <= 0 or os.name == "nt":
+        # Unknown owner; on Windows a segment cannot outlive its last handle anyway
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False  # Alive, owned by another user
+    return False
+
+
+def _create(name, size, pid_offset):
+    """
+    Create a segment and record this process as its publisher.
+
+    A segment of the same name is replaced only if the pid recorded in it
+    belongs to a process that has exited (a publisher that did not shut down
+    cleanly); otherwise another publisher may still be serving readers from
+    it, so this fails.
+
+    Raises:
+        FileExistsError: If the existing segment is not provably stale.
+    """
+    try:
+        segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        existing = _attach(name)
+        try:
+            owner = struct.unpack_from("q", existing.buf, pid_offset)[0] if existing.size >= pid_offset + 8 else 0
+        finally:
+            existing.close()
+        if not _owner_exited(owner):
+            raise FileExistsError(
+                f"Shared memory segment {name} is in use by process {owner}" if owner > 0 else
+                f"Shared memory segment {name} already exists and has no owner recorded; remove it if no publisher is running"
+            ) from None
+        print(f"Replacing shared memory segment {name} left behind by process {owner}")
+        stale = shared_memory.SharedMemory(name=name)
+        stale.close()
+        stale.unlink()
+        segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+    struct.pack_into("q", segment.buf, pid_offset, os.getpid())
+    return segment
+
+
+class _Views:
+    """NumPy views of one symbol's segment."""
+
+    def __init__(self, buf, depth):
+        self.header = np.ndarray(HEADER_WORDS, np.int64, buf, 0)
+        self.top_words = np.ndarray(TOP_WORDS, np.int64, buf, TOP_OFFSET)
+        self.top_values = np.ndarray(TOP_VALUES, np.float64, buf, TOP_OFFSET + TOP_WORDS * 8)
+        self.depth_words = np.ndarray(DEPTH_WORDS, np.int64, buf, DEPTH_OFFSET)
+        self.bids = np.ndarray((depth, 2), np.float64, buf, LEVELS_OFFSET)
+        self.asks = np.ndarray((depth, 2), np.float64, buf, LEVELS_OFFSET + depth * 2 * 8)
+
+
+class SharedBookPublisher:
+    """
+    Publishes one symbol's top of book and depth into shared memory.
+
+    Register it on a DataManager with register_recorder, so it sees every
+    update. Publishing copies at most `depth` levels per side into
+    preallocated arrays; no message is serialized.
+    """
+
+    def __init__(self, symbol, prefix, depth=DEFAULT_DEPTH):
+        """
+        Args:
+            symbol (str): The trading pair, e.g., 'BTCUSDT'.
+            prefix (str): Segment name prefix shared with the readers (see default_prefix).
+            depth (int): Levels per side published.
+        """
+        self.symbol = symbol.upper()
+        self.depth = depth
+        self.segment = _create(segment_name(prefix, self.symbol), segment_size(depth), SEGMENT_PID_OFFSET)
+        self.views = _Views(self.segment.buf, depth)
+        self.views.header[:3] = (MAGIC, VERSION, depth)
+
+    def on_top_of_book(self, top_of_book):
+        words, values = self.views.top_words, self.views.top_values
+        words[0] += 1  # Odd: write in progress
+        words[1] = top_of_book.update_id
+        words[2] = time.time_ns()
+        values[0] = top_of_book.best_bid_price
+        values[1] = top_of_book.best_bid_qty
+        values[2] = top_of_book.best_ask_price
+        values[3] = top_of_book.best_ask_qty
+        words[0] += 1
+
+    def on_order_book_depth(self, book):
+        words = self.views.depth_words
+        words[0] += 1
+        words[1] = book.last_update_id or 0
+        words[2] = book.event_time or 0
+        words[3] = time.time_ns()
+        words[4] = book.bids.copy_to(self.views.bids)
+        words[5] = book.asks.copy_to(self.views.asks)
+        words[0] += 1
+
+    def close(self):
+        """Release and remove the segment."""
+        self.views = None
+        self.segment.close()
+        self.segment.unlink()
+
+
+class SharedBookReader:
+    """
+    Attaches to a symbol published by a SharedBookPublisher.
+
+    Reads are lock-free copies validated by the sections' seqlocks, so any
+    number of readers can poll without slowing the publisher down.
+    """
+
+    def __init__(self, symbol, prefix):
+        """
+        Args:
+            symbol (str): The trading pair, e.g., 'BTCUSDT'.
+            prefix (str): Segment name prefix used by the publisher.
+
+        Raises:
+            FileNotFoundError: If nothing publishes the symbol.
+        """
+        self.symbol = symbol.upper()
+        self.segment = _attach(segment_name(prefix, self.symbol))
+        header = np.ndarray(HEADER_WORDS, np.int64, self.segment.buf, 0)
+        if header[0] != MAGIC or header[1] != VERSION:
+            self.segment.close()
+            raise ValueError(f"{self.segment.name} is not a version {VERSION} shared book")
+        self.depth = int(header[2])
+        self.publisher_pid = int(header[3])
+        self.views = _Views(self.segment.buf, self.depth)
+        self._top_seq = self._depth_seq = 0
+
+    def top_seq(self):
+        """Sequence number of the top of book; it changes with every update."""
+        return int(self.views.top_words[0])
+
+    def depth_seq(self):
+        """Sequence number of the depth; it changes with every update."""
+        return int(self.views.depth_words[0])
+
+    def _gave_up(self):
+        """Called when a section stayed mid-write for READ_ATTEMPTS reads; fails if the publisher is gone."""
+        if _owner_exited(self.publisher_pid):
+            raise ConnectionError(f"Publisher of {self.symbol} (process {self.publisher_pid}) exited mid-write")
+        return None
+
+    def top_of_book(self):
+        """
+        Return the latest TopOfBook, or None before the first update or while a write is in progress.
+
+        Raises:
+            ConnectionError: If the publisher died in the middle of a write.
+        """
+        words, values = self.views.top_words, self.views.top_values
+        for _ in range(READ_ATTEMPTS):
+            seq = int(words[0])
+            if seq & 1:
+                continue
+            update_id, bid, bid_qty, ask, ask_qty = int(words[1]), *values.tolist()
+            if int(words[0]) == seq:
+                break
+        else:
+            return self._gave_up()
+        self._top_seq = seq
+        if seq == 0:
+            return None
+        return TopOfBook(self.symbol, update_id, bid, bid_qty, ask, ask_qty)
+
+    def order_book(self, depth=None):
+        """
+        Return a DepthSnapshot copy of the latest depth, or None before the first update
+        or while a write is in progress.
+
+        Args:
+            depth (int, optional): Maximum levels per side to copy. All published levels if None.
+
+        Raises:
+            ConnectionError: If the publisher died in the middle of a write.
+        """
+        words = self.views.depth_words
+        for _ in range(READ_ATTEMPTS):
+            seq = int(words[0])
+            if seq & 1:
+                continue
+            last_update_id, event_time, _, n_bids, n_asks = words[1:].tolist()
+            if depth is not None:
+                n_bids, n_asks = min(n_bids, depth), min(n_asks, depth)
+            bids = self.views.bids[:n_bids].copy()
+            asks = self.views.asks[:n_asks].copy()
+            if int(words[0]) == seq:
+                break
+        else:
+            return self._gave_up()
+        self._depth_seq = seq
+        if seq == 0:
+            return None
+        return DepthSnapshot(self.symbol, bids, asks, last_update_id, event_time)
+
+    async def feed(self, data_manager, depth=None, poll_interval=POLL_INTERVAL):
+        """
+        Push every change into a DataManager, in place of the Binance streams.
+
+        A section caught mid-write is read again on the next poll, so the
+        event loop is never held up by a slow or dead publisher.
+
+        Args:
+            data_manager (DataManager): Receives update_top_of_book and update_order_book_depth calls.
+            depth (int, optional): Levels per side to copy for each depth update.
+            poll_interval (float): Seconds between checks for new data.
+        """
+        while True:
+            if self.top_seq() != self._top_seq:
+                top_of_book = self.top_of_book()
+                if top_of_book is not None:
+                    data_manager.update_top_of_book(top_of_book)
+            if self.depth_seq() != self._depth_seq:
+                book = self.order_book(depth)
+                if book is not None:
+                    data_manager.update_order_book_depth(book)
+            await asyncio.sleep(poll_interval)
+
+    def close(self):
+        """Detach from the segment (the publisher keeps it alive)."""
+        self.views = None
+        self.segment.close()
+
+
+class SharedBookIndex:
+    """Lists the symbols a publishing daemon currently serves."""
+
+    def __init__(self, prefix, create=False):
+        name = f"{prefix}_index"
+        size = INDEX_HEADER.size + MAX_SYMBOLS * NAME_SIZE
+        self.segment = _create(name, size, INDEX_PID_OFFSET) if create else _attach(name)
+        self.owner = create
+
+    def write(self, symbols):
+        buf = self.segment.buf
+        seq, _, pid = INDEX_HEADER.unpack_from(buf, 0)
+        INDEX_HEADER.pack_into(buf, 0, seq + 1, 0, pid)
+        for i, symbol in enumerate(symbols[:MAX_SYMBOLS]):
+            struct.pack_into(f"{NAME_SIZE}s", buf, INDEX_HEADER.size + i * NAME_SIZE, symbol.encode())
+        INDEX_HEADER.pack_into(buf, 0, seq + 2, min(len(symbols), MAX_SYMBOLS), pid)
+
+    def symbols(self):
+        buf = self.segment.buf
+        while True:
+            seq, count, _ = INDEX_HEADER.unpack_from(buf, 0)
+            names = [
+                struct.unpack_from(f"{NAME_SIZE}s", buf, INDEX_HEADER.size + i * NAME_SIZE)[0].rstrip(b"\0").decode()
+                for i in range(count)
+            ]
+            if not seq & 1 and INDEX_HEADER.unpack_from(buf, 0)[0] == seq:
+                return names
+
+    def close(self):
+        self.segment.close()
+        if self.owner:
+            self.segment.unlink()
+
+
+async def main():
+    """Ingest daemon: stream books from Binance once and publish them for local readers."""
+    parser = argparse.ArgumentParser(description="Publish Binance order books into shared memory")
+    parser.add_argument(
+        "--env", choices=["testnet", "real", "sim"], default="testnet",
+        help="Specify the environment: 'testnet', 'real' or 'sim' (default: testnet)"
+    )
+    parser.add_argument(
+        "--pair", action="append", required=True, help="Trading pair to publish, repeatable (e.g., DOGEUSDT)"
+    )
+    parser.add_argument(
+        "--depth", type=int, default=DEFAULT_DEPTH,
+        help=f"Levels per side published (default: {DEFAULT_DEPTH})"
+    )
+    args = parser.parse_args()
+
+    from config_manager import ConfigManager
+    config = ConfigManager().get_config(args.env)
+    prefix = default_prefix(args.env)
+    symbols = [pair.upper() for pair in args.pair]
+
+    multiplexer = StreamMultiplexer(config["stream_url"], config["base_url"])
+    index = SharedBookIndex(prefix, create=True)
+    publishers = []
+    try:
+        for symbol in symbols:
+            publisher = SharedBookPublisher(symbol, prefix, args.depth)
+            publishers.append(publisher)
+            data_manager = DataManager()
+            data_manager.register_recorder(publisher)
+            await multiplexer.add_symbol(symbol, data_manager)
+        index.write(symbols)
+        print(f"Publishing {', '.join(symbols)} under {prefix}")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+        await stop.wait()
+    finally:
+        await multiplexer.close()
+        for publisher in publishers:
+            publisher.close()
+        index.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
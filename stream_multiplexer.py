@@ -0,0 +1,234 @@
+import asyncio
+import itertools
+import json
+from connection_supervisor import SupervisedConnection
+from decoders import BookTickerDecoder, CombinedStreamDecoder, DepthDecoder, loads
+from latency import now, tracker
+from order_book import DepthSynchronizer
+from rest_api_manager import AsyncBinanceRestAPI
+
+# Binance allows at most 1024 streams per connection
+MAX_STREAMS_PER_CONNECTION = 1024
+# Binance allows at most 5 incoming control messages per second per connection
+CONTROL_MESSAGE_INTERVAL = 0.25
+# Streams named in the connection URL; the rest are sent as SUBSCRIBE batches
+URL_STREAMS = 64
+SUBSCRIBE_BATCH = 200
+
+
+class CombinedStreamConnection:
+    """One supervised /stream?streams= websocket carrying a changing set of streams."""
+
+    def __init__(self, stream_url, on_message, on_reconnect=None, max_streams=MAX_STREAMS_PER_CONNECTION):
+        """
+        Args:
+            stream_url (str): Combined stream endpoint, e.g., 'wss://stream.binance.com:9443/stream'.
+            on_message (callable): Called with every raw frame received.
+            on_reconnect (callable, optional): Called with this connection after a reconnect.
+            max_streams (int): Maximum number of streams carried by this connection.
+        """
+        self.stream_url = stream_url
+        self.max_streams = max_streams
+        self.streams = set()
+        self.supervisor = SupervisedConnection(
+            self._url,
+            on_message,
+            on_connect=self._on_connect,
+            on_reconnect=(lambda: on_reconnect(self)) if on_reconnect else None,
+            name="combined stream",
+        )
+        self._url_streams = []
+        # The websocket _on_connect last set up and the streams it has been subscribed to
+        self._setup_websocket = None
+        self._setup_streams = set()
+        self._ids = itertools.count(1)
+        self._control_lock = asyncio.Lock()
+        self._task = None
+
+    @property
+    def free_slots(self):
+        return self.max_streams - len(self.streams)
+
+    @property
+    def websocket(self):
+        return self.supervisor.websocket
+
+    async def subscribe(self, streams):
+        """Add streams, opening the connection on first use."""
+        self.streams.update(streams)
+        if self._task is None:
+            self._task = asyncio.create_task(self.supervisor.run())
+        elif self.websocket is not None:
+            await self._send_control(self.websocket, "SUBSCRIBE", streams)
+
+    async def unsubscribe(self, streams):
+        """Remove streams, closing the connection once it carries none."""
+        self.streams.difference_update(streams)
+        if not self.streams:
+            await self.close()
+        elif self.websocket is not None:
+            await self._send_control(self.websocket, "UNSUBSCRIBE", streams)
+
+    async def close(self):
+        """Close the connection."""
+        await self.supervisor.close()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _url(self):
+        self._url_streams = sorted(self.streams)[:URL_STREAMS]
+        return f"{self.stream_url}?streams={'/'.join(self._url_streams)}"
+
+    async def _on_connect(self, websocket):
+        # Subscribe whatever did not fit in the URL. This runs again just before a rollover
+        # takes over, so streams added or removed meanwhile are caught up as well.
+        if websocket is not self._setup_websocket:
+            self._setup_websocket, self._setup_streams = websocket, set(self._url_streams)
+        subscribed = self._setup_streams
+        while subscribed != self.streams:
+            missing = sorted(self.streams - subscribed)
+            removed = sorted(subscribed - self.streams)
+            if missing:
+                await self._send_control(websocket, "SUBSCRIBE", missing)
+                subscribed.update(missing)
+            if removed:
+                await self._send_control(websocket, "UNSUBSCRIBE", removed)
+                subscribed.difference_update(removed)
+
+    async def _send_control(self, websocket, method, streams):
+        streams = list(streams)
+        async with self._control_lock:
+            for i in range(0, len(streams), SUBSCRIBE_BATCH):
+                message = {"method": method, "params": streams[i:i + SUBSCRIBE_BATCH], "id": next(self._ids)}
+                await websocket.send(json.dumps(message))
+                await asyncio.sleep(CONTROL_MESSAGE_INTERVAL)
+
+
+class StreamMultiplexer:
+    """
+    Carries bookTicker and diff-depth streams for many symbols over a few connections.
+
+    Streams are packed onto combined-stream connections up to the per-connection
+    limit, new connections are opened as they fill up, and every frame is routed
+    to the DataManager of its symbol. Connections are supervised, and the order
+    books they carry are resynced after a reconnect.
+    """
+
+    def __init__(self, stream_url, rest_url, max_streams_per_connection=MAX_STREAMS_PER_CONNECTION):
+        """
+        Args:
+            stream_url (str): Combined stream endpoint from ConfigManager ('stream_url').
+            rest_url (str): REST base URL, used for depth snapshots.
+            max_streams_per_connection (int): Streams to carry per connection before sharding.
+        """
+        self.stream_url = stream_url
+        self.max_streams_per_connection = max_streams_per_connection
+        self.rest_api = AsyncBinanceRestAPI(rest_url)
+        self.connections = []
+        self.data_managers = {}  # Symbol -> DataManager
+        self.synchronizers = {}  # Symbol -> DepthSynchronizer
+        self._routes = {}  # Stream name -> handler
+        self._stream_connections = {}  # Stream name -> CombinedStreamConnection
+        self._book_ticker_ids = {}  # Symbol -> last bookTicker update ID delivered
+        self._decoder = CombinedStreamDecoder()
+        self._book_ticker_decoder = BookTickerDecoder()
+        self._depth_decoder = DepthDecoder()
+
+    async def add_symbol(self, symbol, data_manager):
+        """Subscribe to a symbol's streams and route them to its DataManager."""
+        symbol = symbol.upper()
+        if symbol in self.data_managers:
+            return
+
+        async def fetch_snapshot():
+            return await self.rest_api.get_order_book(symbol)
+
+        synchronizer = DepthSynchronizer(symbol, fetch_snapshot, data_manager.update_order_book_depth)
+        self.data_managers[symbol] = data_manager
+        self.synchronizers[symbol] = synchronizer
+
+        book_ticker_decoder, depth_decoder = self._book_ticker_decoder, self._depth_decoder
+
+        def on_book_ticker(payload, received_ns=None):
+            top_of_book = book_ticker_decoder.decode_payload(payload)
+            if received_ns is not None:
+                top_of_book.received_ns = received_ns
+                tracker.record_since("decode", symbol, received_ns)
+            # Frames can repeat while a rollover overlaps two connections
+            if top_of_book.update_id > self._book_ticker_ids.get(symbol, 0):
+                self._book_ticker_ids[symbol] = top_of_book.update_id
+                data_manager.update_top_of_book(top_of_book)
+
+        def on_depth(payload, received_ns=None):
+            event = depth_decoder.decode_payload(payload)
+            if received_ns is not None:
+                tracker.record_exchange("exchange_to_receive", symbol, event.event_time)
+                tracker.record_since("decode", symbol, received_ns)
+            synchronizer.on_event(event)
+
+        routes = {
+            f"{symbol.lower()}@bookTicker": on_book_ticker,
+            f"{symbol.lower()}@depth@100ms": on_depth,
+        }
+        self._routes.update(routes)
+        await self._subscribe(list(routes))
+
+    async def remove_symbol(self, symbol):
+        """Unsubscribe from a symbol's streams."""
+        symbol = symbol.upper()
+        if symbol not in self.data_managers:
+            return
+        del self.data_managers[symbol]
+        self.synchronizers.pop(symbol).resync()
+        self._book_ticker_ids.pop(symbol, None)
+        streams = [s for s in self._routes if s.split("@", 1)[0] == symbol.lower()]
+        by_connection = {}
+        for stream in streams:
+            del self._routes[stream]
+            by_connection.setdefault(self._stream_connections.pop(stream), []).append(stream)
+        for connection, connection_streams in by_connection.items():
+            await connection.unsubscribe(connection_streams)
+            if not connection.streams:
+                self.connections.remove(connection)
+
+    async def close(self):
+        """Close every connection."""
+        for connection in self.connections:
+            await connection.close()
+        self.connections = []
+        await self.rest_api.close()
+
+    async def _subscribe(self, streams):
+        pending = list(streams)
+        while pending:
+            # Fill existing connections first and shard onto a new one when they are full
+            connection = next((c for c in self.connections if c.free_slots > 0), None)
+            if connection is None:
+                connection = CombinedStreamConnection(
+                    self.stream_url, self._on_message, self._resync_connection, self.max_streams_per_connection
+                )
+                self.connections.append(connection)
+            batch, pending = pending[:connection.free_slots], pending[connection.free_slots:]
+            for stream in batch:
+                self._stream_connections[stream] = connection
+            await connection.subscribe(batch)
+
+    def _resync_connection(self, connection):
+        """Rebuild the order books carried by a connection that dropped and came back."""
+        for symbol in {stream.split("@", 1)[0].upper() for stream in connection.streams}:
+            self._book_ticker_ids.pop(symbol, None)
+            if symbol in self.synchronizers:
+                self.synchronizers[symbol].resync()
+
+    def _on_message(self, raw):
+        received_ns = now() if tracker.enabled else None
+        stream, payload = self._decoder.decode(raw)
+        if stream is None:
+            response = loads(raw)
+            if "error" in response:
+                print(f"Stream control request {response.get('id')} failed: {response['error']}")
+            return
+        handler = self._routes.get(stream)
+        if handler is not None:
+            handler(payload, received_ns)
@@ -1,46 +1,175 @@
+import asyncio
 from web_socket_wrapper import BinanceWebSocket
+from rest_api_manager import AsyncBinanceRestAPI
+from order_book import DepthSynchronizer
+from decoders import BookTickerDecoder, DepthDecoder, loads
+from connection_supervisor import SupervisedConnection
+from latency import now, tracker
 
 async def stream_book_ticker(ws_url, symbol, data_manager):
-    """Stream top-of-book data from Binance."""
+    """Stream top-of-book data from Binance, reconnecting whenever the connection drops."""
     ws = BinanceWebSocket(ws_url, symbol)
-    book_ticker_socket = await ws.connect_book_ticker()
+    decoder = BookTickerDecoder()
+    last_update_id = 0
 
-    print(f"Connected to {symbol} @bookTicker WebSocket")
-    try:
-        while True:
-            data = await ws.receive_message(book_ticker_socket)
-            print(f"@bookTicker data received")
-            top_of_book = {
-                "best_bid_price": float(data["b"]),
-                "best_bid_qty": float(data["B"]),
-                "best_ask_price": float(data["a"]),
-                "best_ask_qty": float(data["A"]),
-            }
+    def on_message(message):
+        nonlocal last_update_id
+        received_ns = now() if tracker.enabled else None
+        top_of_book = decoder.decode(message)
+        if received_ns is not None:
+            top_of_book.received_ns = received_ns
+            tracker.record_since("decode", top_of_book.symbol, received_ns)
+        # Frames can repeat while a rollover overlaps two connections
+        if top_of_book.update_id > last_update_id:
+            last_update_id = top_of_book.update_id
             data_manager.update_top_of_book(top_of_book)
-    except Exception as e:
-        print(f"Error in stream_book_ticker: {e}")
-    finally:
-        await book_ticker_socket.close()
-        print("@bookTicker WebSocket closed")
 
+    def on_reconnect():
+        nonlocal last_update_id
+        last_update_id = 0
 
-async def stream_depth(ws_url, symbol, data_manager):
-    """Stream order book depth data from Binance."""
+    connection = SupervisedConnection(
+        ws.book_ticker_url, on_message, on_reconnect=on_reconnect, name=f"{symbol}@bookTicker"
+    )
+    await connection.run()
+
+
+async def stream_depth(ws_url, rest_url, symbol, data_manager):
+    """Maintain a full-depth local order book from the @depth diff stream, resyncing after reconnects."""
     ws = BinanceWebSocket(ws_url, symbol)
-    depth_socket = await ws.connect_depth()
+    rest_api = AsyncBinanceRestAPI(rest_url)
+
+    async def fetch_snapshot():
+        return await rest_api.get_order_book(symbol)
 
-    print("Connected to @depth WebSocket")
+    synchronizer = DepthSynchronizer(symbol.upper(), fetch_snapshot, data_manager.update_order_book_depth)
+    decoder = DepthDecoder()
+
+    def on_message(message):
+        received_ns = now() if tracker.enabled else None
+        event = decoder.decode(message)
+        if received_ns is not None:
+            tracker.record_exchange("exchange_to_receive", event.symbol, event.event_time)
+            tracker.record_since("decode", event.symbol, received_ns)
+        synchronizer.on_event(event)
+
+    connection = SupervisedConnection(
+        ws.depth_url,
+        on_message,
+        on_reconnect=synchronizer.resync,
+        name=f"{symbol}@depth",
+    )
     try:
+        await connection.run()
+    finally:
+        await rest_api.close()
+
+
+async def stream_user_data(ws_url, client, session, keepalive_interval=30 * 60, retry_interval=60):
+    """
+    Stream order and balance updates from the user data stream into a TradingSession.
+
+    The listen key is kept alive and replaced when Binance expires it. After a
+    lost connection the session's reconcile() (if it has one) reloads state from
+    REST; events arriving meanwhile are held back and applied on top of it, so
+    nothing that happened during the gap or the reload is lost.
+
+    Args:
+        ws_url (str): Raw stream base URL, e.g., 'wss://stream.binance.com:9443/ws'.
+        client (Client): python-binance client used for the listen key.
+        session: Object with handle_user_event(event) and optionally reconcile(), e.g., a TradingSession.
+        keepalive_interval (float): Seconds between keepalives; Binance expires a key after 60 minutes without one.
+        retry_interval (float): Seconds before retrying a failed keepalive or listen key request,
+            and the longest wait between retries of a failed reconcile.
+    """
+    loop = asyncio.get_running_loop()
+    ws = BinanceWebSocket(ws_url)
+    listen_key = await loop.run_in_executor(None, client.stream_get_listen_key)
+    reconcile = getattr(session, "reconcile", None)
+    pending = None  # Events held back while reconciling, None otherwise
+    reconcile_again = False
+    tasks = set()
+
+    def spawn(coroutine):
+        task = asyncio.create_task(coroutine)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    def apply(event):
+        try:
+            session.handle_user_event(event)
+        except Exception as e:
+            print(f"Error applying user data event {event.get('e')}: {e}")
+
+    def on_message(message):
+        event = loads(message)
+        if event.get("e") == "listenKeyExpired":
+            spawn(renew_listen_key())
+        elif pending is not None:
+            pending.append(event)
+        else:
+            apply(event)
+
+    async def renew_listen_key():
+        nonlocal listen_key
+        try:
+            listen_key = await loop.run_in_executor(None, client.stream_get_listen_key)
+        except Exception as e:
+            print(f"Error requesting a new user data listen key: {e}")
+            return False
+        print("Renewed the user data listen key, reconnecting")
+        # The old key's connection delivers nothing more; the reconnect reconciles the gap
+        if connection.websocket is not None:
+            await connection.websocket.close()
+        return True
+
+    async def keepalive():
         while True:
-            data = await ws.receive_message(depth_socket)
-            print(f"@depth data received")
-            order_book_depth = {
-                "bids": [[float(bid[0]), float(bid[1])] for bid in data["bids"]],
-                "asks": [[float(ask[0]), float(ask[1])] for ask in data["asks"]],
-            }
-            data_manager.update_order_book_depth(order_book_depth)
-    except Exception as e:
-        print(f"Error in stream_depth: {e}")
+            await asyncio.sleep(keepalive_interval)
+            try:
+                await loop.run_in_executor(None, client.stream_keepalive, listen_key)
+            except Exception as e:
+                print(f"User data keepalive failed ({e}), requesting a new listen key")
+                while not await renew_listen_key():
+                    await asyncio.sleep(retry_interval)
+
+    async def reconcile_state():
+        nonlocal pending, reconcile_again
+        backoff = 1
+        while True:
+            reconcile_again = False
+            try:
+                await loop.run_in_executor(None, reconcile)
+            except Exception as e:
+                # The held-back events only make sense on top of a fresh state, so keep them until one loads
+                print(f"Error reconciling user data state from REST ({e}), retrying in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, retry_interval)
+                continue
+            if not reconcile_again:
+                break
+        events, pending = pending, None
+        for event in events:
+            apply(event)
+        print(f"Reconciled user data state, replayed {len(events)} events")
+
+    def on_reconnect():
+        nonlocal pending, reconcile_again
+        if reconcile is None:
+            return
+        if pending is not None:
+            # Another gap while reloading; the reload in progress may predate it
+            reconcile_again = True
+            return
+        pending = []
+        spawn(reconcile_state())
+
+    spawn(keepalive())
+    connection = SupervisedConnection(
+        lambda: f"{ws.ws_url}/{listen_key}", on_message, on_reconnect=on_reconnect, name="user data"
+    )
+    try:
+        await connection.run()
     finally:
-        await depth_socket.close()
-        print("@depth WebSocket closed")
+        for task in list(tasks):
+            task.cancel()
@@ -0,0 +1,174 @@
+import argparse
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tabulate import tabulate
+from backtester import Backtester
+from recorder import MarketDataReader
+
+# Strategy parameters that can be swept, with the make_submit_orders argument they set
+PARAMETERS = {"order_size": "desired_order_size", "spread": "spread"}
+
+
+def parse_grid(specs):
+    """
+    Parse 'name=v1,v2,...' specs into a list of parameter dicts (the full grid).
+
+    Example: ['order_size=1,10', 'spread=0.0005,0.001'] gives four combinations.
+    """
+    names, values = [], []
+    for spec in specs:
+        name, _, raw = spec.partition("=")
+        if name not in PARAMETERS:
+            raise ValueError(f"Unknown parameter '{name}'. Choose from {list(PARAMETERS)}")
+        names.append(name)
+        values.append([float(v) for v in raw.split(",")])
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def parse_random(specs, samples, seed=0):
+    """
+    Parse 'name=low:high' specs into `samples` uniformly drawn parameter dicts.
+
+    A fixed seed makes the draw repeatable, so an interrupted search resumes the same runs.
+    """
+    ranges = {}
+    for spec in specs:
+        name, _, raw = spec.partition("=")
+        if name not in PARAMETERS:
+            raise ValueError(f"Unknown parameter '{name}'. Choose from {list(PARAMETERS)}")
+        low, high = (float(v) for v in raw.split(":"))
+        ranges[name] = (low, high)
+    rng = random.Random(seed)
+    return [{name: rng.uniform(low, high) for name, (low, high) in ranges.items()} for _ in range(samples)]
+
+
+def run_key(params):
+    """Stable identifier of a parameter set, used to match checkpointed results."""
+    return json.dumps(params, sort_keys=True)
+
+
+def run_backtest(data, pair, filters, params, latency, maker_fee, taker_fee):
+    """
+    Run one backtest in a worker process and return its summary with the parameters.
+
+    Each worker maps the recording itself; the pages are shared through the OS
+    page cache, so the market data is not copied per process.
+    """
+    from market_maker import make_submit_orders
+
+    kwargs = {PARAMETERS[name]: value for name, value in params.items()}
+    backtester = Backtester(
+        MarketDataReader(data, pair),
+        lambda session: make_submit_orders(session, verbose=False, **kwargs),
+        filters, latency=latency, maker_fee=maker_fee, taker_fee=taker_fee,
+    )
+    return {**params, **backtester.run().summary()}
+
+
+def load_checkpoint(path):
+    """Return {run key: result} for the runs already recorded in a checkpoint file."""
+    results = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:  # A run interrupted mid-write leaves at most one bad line
+                    try:
+                        result = json.loads(line)
+                    except ValueError:
+                        continue
+                    results[result["key"]] = result
+    return results
+
+
+def sweep(data, pair, filters, runs, workers=None, checkpoint=None,
+          latency=0.005, maker_fee=0.001, taker_fee=0.001):
+    """
+    Run a backtest for every parameter set across a process pool.
+
+    Args:
+        data (str): Recording directory.
+        pair (str): Trading pair to backtest.
+        filters (dict): Symbol filters for the simulated session (at least tick_size).
+        runs (list): Parameter dicts, e.g. from parse_grid or parse_random.
+        workers (int, optional): Worker processes (default: one per CPU).
+        checkpoint (str, optional): JSON-lines file results are appended to as they finish;
+            runs already in it are skipped, so an interrupted sweep can be resumed.
+        latency, maker_fee, taker_fee: Passed to every Backtester.
+
+    Returns:
+        list: One result dict per run (parameters plus BacktestResult.summary()).
+    """
+    done = load_checkpoint(checkpoint)
+    pending = [params for params in runs if run_key(params) not in done]
+    print(f"{len(runs)} runs, {len(runs) - len(pending)} already done, {len(pending)} to go")
+
+    if pending:
+        log = open(checkpoint, "a") if checkpoint else None
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(run_backtest, data, pair, filters, params, latency, maker_fee, taker_fee): params
+                    for params in pending
+                }
+                for i, future in enumerate(as_completed(futures), 1):
+                    params = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Run {params} failed: {e}")
+                        continue
+                    result["key"] = run_key(params)
+                    done[result["key"]] = result
+                    if log is not None:
+                        log.write(json.dumps(result) + "\n")
+                        log.flush()
+                    print(f"[{i}/{len(pending)}] {params}: pnl {result['pnl']:.4f}")
+        finally:
+            if log is not None:
+                log.close()
+
+    return [done[run_key(params)] for params in runs if run_key(params) in done]
+
+
+def results_table(results, sort_by="pnl"):
+    """Return the results as a text table, best first."""
+    if not results:
+        return "No results"
+    columns = [c for c in results[0] if c != "key"]
+    rows = sorted(results, key=lambda r: r[sort_by], reverse=True)
+    return tabulate([[r[c] for c in columns] for r in rows], headers=columns, tablefmt="grid")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep market maker parameters over recorded data")
+    parser.add_argument("--data", required=True, help="Recording directory (see terminal_view.py --record)")
+    parser.add_argument("--pair", required=True, help="Trading pair to backtest (e.g., DOGEUSDT)")
+    parser.add_argument("--tick-size", type=float, required=True, help="Price tick size of the pair")
+    parser.add_argument(
+        "--param", action="append", required=True,
+        help="Grid values 'spread=0.0005,0.001' or, with --random, a range 'spread=0.0001:0.002'"
+    )
+    parser.add_argument("--random", type=int, metavar="N", help="Draw N random parameter sets instead of a grid")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for --random (default: 0)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--checkpoint", help="JSON-lines file to store results in and resume from")
+    parser.add_argument("--latency", type=float, default=0.005, help="Order entry latency in seconds")
+    parser.add_argument("--maker-fee", type=float, default=0.001, help="Maker fee rate")
+    parser.add_argument("--taker-fee", type=float, default=0.001, help="Taker fee rate")
+    parser.add_argument("--sort-by", default="pnl", help="Result column to rank by (default: pnl)")
+    args = parser.parse_args()
+
+    runs = parse_random(args.param, args.random, args.seed) if args.random else parse_grid(args.param)
+    results = sweep(
+        args.data, args.pair, {"tick_size": args.tick_size}, runs, args.workers, args.checkpoint,
+        args.latency, args.maker_fee, args.taker_fee,
+    )
+    print(results_table(results, args.sort_by))
+
+
+if __name__ == "__main__":
+    main()
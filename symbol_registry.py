@@ -0,0 +1,304 @@
+import json
+import os
+import time
+from decimal import Decimal, ROUND_CEILING, ROUND_DOWN, ROUND_FLOOR, ROUND_HALF_EVEN
+
+# Where exchangeInfo is cached between runs, next to the code like binance_secrets.txt
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+# Only these filters are kept in the cache; the full exchangeInfo is several MB
+CACHED_FILTERS = {"PRICE_FILTER", "LOT_SIZE", "NOTIONAL", "MIN_NOTIONAL"}
+CACHED_FIELDS = ("symbol", "status", "baseAsset", "quoteAsset", "baseAssetPrecision", "quoteAssetPrecision")
+
+# How prices are rounded onto the tick grid: passive for each side, nearest otherwise
+PRICE_ROUNDING = {"BUY": ROUND_FLOOR, "SELL": ROUND_CEILING, None: ROUND_HALF_EVEN}
+
+
+class FilterViolation(ValueError):
+    """Raised when an order would be rejected by the symbol's exchange filters."""
+
+
+def to_decimal(value):
+    """Convert a float, int or numeric string to a Decimal without picking up binary noise."""
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(repr(value)) if isinstance(value, float) else Decimal(value)
+
+
+def format_decimal(value):
+    """Format a number as a plain decimal string (no exponent, no float noise)."""
+    return f"{to_decimal(value):f}"
+
+
+def default_cache_path(env):
+    """
+    Return the exchangeInfo cache file for an environment.
+
+    Args:
+        env (str): 'testnet', 'real' or 'sim'.
+
+    Returns:
+        str: The path, or None for 'sim', whose symbols change with the simulator's arguments.
+    """
+    if env == "sim":
+        return None
+    return os.path.join(CACHE_DIR, f"exchange_info_{env}.json")
+
+
+class SymbolFilters:
+    """
+    Exchange filters for one symbol.
+
+    Prices and quantities are handled as integer numbers of ticks (tickSize)
+    and steps (stepSize), so rounding and the minQty/minNotional checks are
+    exact and orders are formatted with exactly the decimals the symbol
+    allows. tick_size, step_size, min_qty and min_notional are also exposed
+    as floats, and as filters["tick_size"] for code written against the old
+    filter dicts.
+    """
+
+    __slots__ = (
+        "symbol", "status", "base_asset", "quote_asset", "tick", "step",
+        "min_price_ticks", "max_price_ticks", "min_qty_steps", "max_qty_steps", "min_notional_units",
+        "tick_size", "step_size", "min_qty", "min_notional",
+    )
+
+    def __init__(self, symbol_info):
+        """
+        Args:
+            symbol_info (dict): One entry of exchangeInfo "symbols".
+        """
+        filters = {f["filterType"]: f for f in symbol_info["filters"]}
+        price_filter = filters.get("PRICE_FILTER", {})
+        lot_size = filters.get("LOT_SIZE", {})
+        notional = filters.get("NOTIONAL") or filters.get("MIN_NOTIONAL") or {}
+        self.symbol = symbol_info["symbol"]
+        self.status = symbol_info.get("status", "TRADING")
+        self.base_asset = symbol_info.get("baseAsset")
+        self.quote_asset = symbol_info.get("quoteAsset")
+        # A zero tick or step means the filter is off; fall back to the asset precision
+        self.tick = (to_decimal(price_filter.get("tickSize", "0")).normalize()
+                     or Decimal(1).scaleb(-symbol_info.get("quoteAssetPrecision", 8)))
+        self.step = (to_decimal(lot_size.get("stepSize", "0")).normalize()
+                     or Decimal(1).scaleb(-symbol_info.get("baseAssetPrecision", 8)))
+        self.min_price_ticks = self._units(price_filter.get("minPrice", "0"), self.tick, ROUND_CEILING)
+        self.max_price_ticks = self._units(price_filter.get("maxPrice", "0"), self.tick, ROUND_FLOOR)
+        self.min_qty_steps = self._units(lot_size.get("minQty", "0"), self.step, ROUND_CEILING)
+        self.max_qty_steps = self._units(lot_size.get("maxQty", "0"), self.step, ROUND_FLOOR)
+        # price_ticks * qty_steps is the notional in units of tick * step
+        self.min_notional_units = self._units(notional.get("minNotional", "0"), self.tick * self.step, ROUND_CEILING)
+        self.tick_size = float(self.tick)
+        self.step_size = float(self.step)
+        self.min_qty = float(lot_size.get("minQty", 0))
+        self.min_notional = float(notional.get("minNotional", 0))
+
+    @staticmethod
+    def _units(value, unit, rounding):
+        return int((to_decimal(value) / unit).to_integral_value(rounding))
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self):
+        return (f"SymbolFilters({self.symbol}, tick={self.tick}, step={self.step}, "
+                f"min_qty={self.min_qty}, min_notional={self.min_notional})")
+
+    def price_ticks(self, price, side=None):
+        """
+        Return a price as a whole number of ticks.
+
+        Args:
+            price (float | str | Decimal): The price.
+            side (str, optional): 'BUY' rounds down and 'SELL' rounds up, so a quote
+                never crosses further than asked; nearest tick if None.
+        """
+        return int((to_decimal(price) / self.tick).to_integral_value(PRICE_ROUNDING[side]))
+
+    def qty_steps(self, qty):
+        """Return a quantity as a whole number of steps, rounded down."""
+        return int((to_decimal(qty) / self.step).to_integral_value(ROUND_DOWN))
+
+    def round_price(self, price, side=None):
+        """Return a price rounded onto the tick grid (see price_ticks), as a float."""
+        return float(self.price_ticks(price, side) * self.tick)
+
+    def round_qty(self, qty):
+        """Return a quantity rounded down onto the step grid, as a float."""
+        return float(self.qty_steps(qty) * self.step)
+
+    def format_price(self, ticks):
+        """Format a number of ticks as the exact price string Binance expects."""
+        return f"{ticks * self.tick:f}"
+
+    def format_qty(self, steps):
+        """Format a number of steps as the exact quantity string Binance expects."""
+        return f"{steps * self.step:f}"
+
+    def check(self, price_ticks, qty_steps):
+        """
+        Validate an order against the symbol's filters.
+
+        Args:
+            price_ticks (int): Limit price in ticks, or None for a market order.
+            qty_steps (int): Quantity in steps.
+
+        Raises:
+            FilterViolation: If the exchange would reject the order.
+        """
+        if self.status != "TRADING":
+            raise FilterViolation(f"{self.symbol} is not trading (status {self.status})")
+        if qty_steps <= 0 or qty_steps < self.min_qty_steps:
+            raise FilterViolation(
+                f"{self.symbol} quantity {self.format_qty(qty_steps)} is below minQty {self.format_qty(self.min_qty_steps)}"
+            )
+        if self.max_qty_steps and qty_steps > self.max_qty_steps:
+            raise FilterViolation(
+                f"{self.symbol} quantity {self.format_qty(qty_steps)} is above maxQty {self.format_qty(self.max_qty_steps)}"
+            )
+        if price_ticks is None:
+            return
+        if price_ticks <= 0 or price_ticks < self.min_price_ticks:
+            raise FilterViolation(f"{self.symbol} price {self.format_price(price_ticks)} is below minPrice")
+        if self.max_price_ticks and price_ticks > self.max_price_ticks:
+            raise FilterViolation(f"{self.symbol} price {self.format_price(price_ticks)} is above maxPrice")
+        if price_ticks * qty_steps < self.min_notional_units:
+            raise FilterViolation(
+                f"{self.symbol} notional {price_ticks * qty_steps * self.tick * self.step:f} "
+                f"is below minNotional {self.min_notional:g}"
+            )
+
+    def prepare_order(self, side, price, qty):
+        """
+        Round a limit order onto the symbol's grids, validate it and format it.
+
+        Args:
+            side (str): 'BUY' or 'SELL'.
+            price (float): Limit price; rounded passively for the side.
+            qty (float): Quantity; rounded down to the step size.
+
+        Returns:
+            tuple: (price, quantity) as strings for the order request.
+
+        Raises:
+            FilterViolation: If the exchange would reject the order.
+        """
+        price_ticks, qty_steps = self.price_ticks(price, side), self.qty_steps(qty)
+        self.check(price_ticks, qty_steps)
+        return self.format_price(price_ticks), self.format_qty(qty_steps)
+
+
+class SymbolRegistry:
+    """
+    Filters for every symbol on the exchange, from a single bulk exchangeInfo request.
+
+    The trimmed response is cached to disk, so a restart within the TTL sends
+    no request at all, and every lookup afterwards is a dict access.
+    """
+
+    def __init__(self, cache_path=None, ttl=3600):
+        """
+        Args:
+            cache_path (str, optional): JSON cache file (see default_cache_path). No disk cache if None.
+            ttl (float): Seconds before the exchangeInfo is considered stale and fetched again.
+        """
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.symbols = {}  # Symbol -> SymbolFilters
+        self.rate_limits = []
+        self.fetched_at = None  # time.time() of the exchangeInfo in use
+
+    def __contains__(self, symbol):
+        return symbol in self.symbols
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def get(self, symbol):
+        """Return the SymbolFilters for a symbol, or None if it is not listed."""
+        return self.symbols.get(symbol)
+
+    def is_stale(self):
+        """True before the first load and once the exchangeInfo is older than the TTL."""
+        return self.fetched_at is None or time.time() - self.fetched_at > self.ttl
+
+    def load(self, fetch_exchange_info, force=False):
+        """
+        Load the filters from the disk cache if it is fresh, otherwise from the exchange.
+
+        Args:
+            fetch_exchange_info (callable): Returns the GET /api/v3/exchangeInfo payload.
+            force (bool): Skip the disk cache.
+
+        Returns:
+            bool: True if exchangeInfo was fetched, False if the cache was used.
+        """
+        if not force and self._load_cache():
+            return False
+        exchange_info = fetch_exchange_info()
+        fetched_at = time.time()
+        self.update(exchange_info, fetched_at)
+        self._save_cache(exchange_info, fetched_at)
+        return True
+
+    def update(self, exchange_info, fetched_at=None):
+        """
+        Replace the filters with an exchangeInfo payload.
+
+        Args:
+            exchange_info (dict): exchangeInfo payload (or the cached subset of one).
+            fetched_at (float, optional): time.time() when it was fetched; now if None.
+        """
+        symbols = {}
+        for symbol_info in exchange_info.get("symbols", []):
+            try:
+                symbols[symbol_info["symbol"]] = SymbolFilters(symbol_info)
+            except Exception as e:
+                print(f"Skipping filters for {symbol_info.get('symbol')}: {e}")
+        self.symbols = symbols
+        self.rate_limits = exchange_info.get("rateLimits") or []
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, "r") as file:
+                cached = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable exchangeInfo cache {self.cache_path}: {e}")
+            return False
+        fetched_at = cached.get("fetched_at", 0)
+        if time.time() - fetched_at > self.ttl:
+            return False
+        self.update(cached, fetched_at)
+        return True
+
+    def _save_cache(self, exchange_info, fetched_at):
+        if not self.cache_path:
+            return
+        cached = {
+            "fetched_at": fetched_at,
+            "rateLimits": exchange_info.get("rateLimits") or [],
+            "symbols": [
+                {
+                    **{field: s[field] for field in CACHED_FIELDS if field in s},
+                    "filters": [f for f in s.get("filters", []) if f.get("filterType") in CACHED_FILTERS],
+                }
+                for s in exchange_info.get("symbols", [])
+            ],
+        }
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            # Write then rename, so a crash never leaves a truncated cache behind
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as file:
+                json.dump(cached, file, separators=(",", ":"))
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not write exchangeInfo cache {self.cache_path}: {e}")
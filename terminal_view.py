@@ -2,8 +2,12 @@ import asyncio
 import argparse
 from streamers import stream_book_ticker, stream_depth
 from data_manager import DataManager
+from recorder import MarketDataReader, MarketDataRecorder, replay
+from shared_book import SharedBookReader, default_prefix
 from tabulate import tabulate
 
+DISPLAY_DEPTH = 20  # Levels per side shown in the depth table
+
 
 def display_order_book(top_of_book, order_book_depth):
     """Display the order book in the terminal."""
@@ -31,7 +35,8 @@ def display_order_book(top_of_book, order_book_depth):
     # Display the spread
     print(f"\nSpread: {formatted_spread}\n")
 
-    print("\nEntire Book @100ms:")
+    print(f"\nTop {DISPLAY_DEPTH} Levels @100ms:")
+    order_book_depth = order_book_depth.to_dict(DISPLAY_DEPTH)
     max_rows = max(len(order_book_depth.get("bids", [])), len(order_book_depth.get("asks", [])))
     full_order_book_table = []
     for i in range(max_rows):
@@ -46,30 +51,62 @@ async def main():
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Binance Order Book Viewer (Terminal)")
     parser.add_argument(
-        "--env", choices=["testnet", "real"], default="testnet",
-        help="Specify the environment: 'testnet' or 'real' (default: testnet)"
+        "--env", choices=["testnet", "real", "sim"], default="testnet",
+        help="Specify the environment: 'testnet', 'real' or 'sim' (default: testnet)"
     )
     parser.add_argument(
         "--pair", required=True, help="Trading pair to monitor (e.g., DOGEUSDT)"
     )
+    parser.add_argument(
+        "--record", metavar="DIR", help="Also record the streams to this directory"
+    )
+    parser.add_argument(
+        "--replay", metavar="DIR", help="Replay a recording from this directory instead of streaming"
+    )
+    parser.add_argument(
+        "--speed", type=float, default=1.0,
+        help="Replay speed: 1 for real time, N for N times faster, 0 for as fast as possible (default: 1)"
+    )
+    parser.add_argument(
+        "--shared-book", action="store_true",
+        help="Read the book from a running shared_book.py daemon instead of connecting to Binance"
+    )
     args = parser.parse_args()
 
+    # Initialize data manager to store order book data
+    data_manager = DataManager()
+
+    # Register `display_order_book` to redraw the terminal at most every 100ms
+    data_manager.register_listener(display_order_book, min_interval=0.1)
+
+    if args.replay:
+        await replay(MarketDataReader(args.replay, args.pair), data_manager, speed=args.speed or None)
+        return
+
     # Get configuration for the environment
     from config_manager import ConfigManager
     config_manager = ConfigManager()
     config = config_manager.get_config(args.env)
 
-    # Initialize data manager to store order book data
-    data_manager = DataManager()
-
-    # Register `display_order_book` to update terminal whenever data changes
-    data_manager.register_listener(display_order_book)
+    if args.shared_book:
+        tasks = [SharedBookReader(args.pair, default_prefix(args.env)).feed(data_manager, DISPLAY_DEPTH)]
+    else:
+        tasks = [
+            stream_book_ticker(config["ws_url"], args.pair.lower(), data_manager),
+            stream_depth(config["ws_url"], config["base_url"], args.pair.lower(), data_manager),
+        ]
+    recorder = None
+    if args.record:
+        recorder = MarketDataRecorder(args.record)
+        data_manager.register_recorder(recorder)
+        tasks.append(recorder.flush_periodically())
 
     # Start the WebSocket streams for top-of-book and full-depth
-    await asyncio.gather(
-        stream_book_ticker(config["ws_url"], args.pair.lower(), data_manager),
-        stream_depth(config["ws_url"], args.pair.lower(), data_manager)
-    )
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        if recorder is not None:
+            recorder.close()
 
 
 if __name__ == "__main__":
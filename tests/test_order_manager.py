@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from order_manager import diff_quotes
+
+
+def order(order_id, side, price, orig_qty, executed_qty="0.00000000"):
+    return {"orderId": order_id, "side": side, "price": price, "origQty": orig_qty, "executedQty": executed_qty}
+
+
+def test_orders_at_the_quote_are_left_alone():
+    orders = [order(1, "BUY", "0.10000000", "100.00000000"), order(2, "SELL", "0.10010000", "100.00000000")]
+    quotes = [("BUY", 0.1, 100), ("SELL", 0.1001, 100)]
+    assert diff_quotes(orders, quotes, 0.00001, 1) == ([], [], [])
+
+
+def test_moved_price_is_replaced():
+    orders = [order(1, "BUY", "0.10000000", "100.00000000")]
+    replace, place, cancel = diff_quotes(orders, [("BUY", 0.09999, 100)], 0.00001, 1)
+    assert replace == [(orders[0], ("BUY", 0.09999, 100))] and not place and not cancel
+
+
+def test_partial_fill_is_topped_up():
+    orders = [order(1, "BUY", "0.10000000", "100.00000000", "40.00000000")]
+    replace, place, cancel = diff_quotes(orders, [("BUY", 0.1, 100)], 0.00001, 1)
+    assert replace == [(orders[0], ("BUY", 0.1, 100))] and not place and not cancel
+
+
+def test_new_order_size_is_applied():
+    orders = [order(1, "SELL", "0.10010000", "100.00000000")]
+    replace, place, cancel = diff_quotes(orders, [("SELL", 0.1001, 250)], 0.00001, 1)
+    assert replace == [(orders[0], ("SELL", 0.1001, 250))] and not place and not cancel
+
+
+def test_extra_orders_are_cancelled_and_missing_quotes_placed():
+    orders = [order(1, "BUY", "0.10000000", "100.00000000"), order(2, "BUY", "0.09990000", "100.00000000")]
+    replace, place, cancel = diff_quotes(orders, [("BUY", 0.1, 100), ("SELL", 0.1001, 100)], 0.00001, 1)
+    assert replace == [] and place == [("SELL", 0.1001, 100)] and cancel == [orders[1]]
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from pairs_analytics import PairsAnalytics
+
+
+def simulate(n_pairs, steps, seed):
+    """Return (x, y, independent y): y = 2x + 5 + AR(1) noise with phi 0.95 (half-life ~13.5)."""
+    rng = np.random.default_rng(seed)
+    x = 100 + np.cumsum(rng.normal(0, 1, (steps, n_pairs)), axis=0)
+    noise = np.zeros((steps, n_pairs))
+    shocks = rng.normal(0, 1, (steps, n_pairs))
+    for t in range(1, steps):
+        noise[t] = 0.95 * noise[t - 1] + shocks[t]
+    y = 2 * x + 5 + noise
+    walk = 200 + np.cumsum(rng.normal(0, 2, (steps, n_pairs)), axis=0)
+    return x, y, walk
+
+
+@pytest.mark.parametrize("method", ["kalman", "rls"])
+def test_cointegrated_pairs_are_stationary_and_walks_are_not(method):
+    n_pairs, steps = 200, 3000
+    x, y, walk = simulate(n_pairs, steps, seed=1)
+
+    cointegrated = PairsAnalytics(n_pairs, method=method, stationarity_halflife=1000).run(x, y)
+    independent = PairsAnalytics(n_pairs, method=method, stationarity_halflife=1000).run(x, walk)
+
+    assert cointegrated["stationary"][-1].mean() > 0.8
+    assert independent["stationary"][-1].mean() < 0.1
+    assert abs(np.median(cointegrated["half_life"][-1]) - 13.5) < 4
+    assert np.allclose(np.median(cointegrated["beta"][-1]), 2, atol=0.05)
@@ -0,0 +1,242 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Binance public data dump layouts (data.binance.vision), with compact dtypes
+TRADE_COLUMNS = {
+    "id": "int64",
+    "price": "float64",
+    "qty": "float32",
+    "quote_qty": "float32",
+    "time": "int64",
+    "is_buyer_maker": "bool",
+    "is_best_match": "bool",
+}
+AGG_TRADE_COLUMNS = {
+    "agg_trade_id": "int64",
+    "price": "float64",
+    "qty": "float32",
+    "first_trade_id": "int64",
+    "last_trade_id": "int64",
+    "time": "int64",
+    "is_buyer_maker": "bool",
+    "is_best_match": "bool",
+}
+LAYOUTS = {"trades": TRADE_COLUMNS, "agg_trades": AGG_TRADE_COLUMNS}
+
+CHUNK_ROWS = 1_000_000
+CACHE_VERSION = 1
+# Dumps switched from millisecond to microsecond timestamps; anything above this is in microseconds
+MICROSECOND_THRESHOLD = 10 ** 14
+
+
+def _has_header(path):
+    with open(path) as f:
+        first = f.readline()
+    return bool(first) and not first.split(",")[0].strip().lstrip("-").isdigit()
+
+
+def iter_trades(path, kind="trades", chunk_rows=CHUNK_ROWS):
+    """
+    Stream a Binance trades/aggTrades CSV as typed DataFrame chunks.
+
+    Args:
+        path (str): CSV file, with or without a header row.
+        kind (str): 'trades' or 'agg_trades'.
+        chunk_rows (int): Rows per chunk.
+
+    Yields:
+        DataFrame: Columns as in TRADE_COLUMNS / AGG_TRADE_COLUMNS, time in milliseconds.
+    """
+    columns = LAYOUTS[kind]
+    # Booleans are parsed as text: the dumps use True/False or true/false
+    dtypes = {name: ("str" if dtype == "bool" else dtype) for name, dtype in columns.items()}
+    reader = pd.read_csv(
+        path, header=None, names=list(columns), dtype=dtypes, chunksize=chunk_rows,
+        skiprows=1 if _has_header(path) else 0, engine="c",
+    )
+    for chunk in reader:
+        for name, dtype in columns.items():
+            if dtype == "bool":
+                chunk[name] = chunk[name].str.lower() == "true"
+        time_ms = chunk["time"].to_numpy()
+        if len(time_ms) and time_ms[0] > MICROSECOND_THRESHOLD:
+            chunk["time"] = time_ms // 1000
+        yield chunk
+
+
+def _cache_dir(path):
+    return f"{path}.cache"
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def build_cache(path, kind="trades", chunk_rows=CHUNK_ROWS):
+    """
+    Convert a CSV into one raw binary file per column, next to it in <path>.cache/.
+
+    Parsing streams chunk by chunk, so memory use is bounded by chunk_rows
+    regardless of the file size.
+    """
+    directory = _cache_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    columns = LAYOUTS[kind]
+    files = {name: open(os.path.join(directory, f"{name}.bin"), "wb") for name in columns}
+    rows = 0
+    try:
+        for chunk in iter_trades(path, kind, chunk_rows):
+            for name, dtype in columns.items():
+                files[name].write(np.ascontiguousarray(chunk[name].to_numpy(dtype=dtype)).tobytes())
+            rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+    # Written last, so an interrupted conversion is never mistaken for a complete cache
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({"version": CACHE_VERSION, "kind": kind, "rows": rows, "source": _source_stamp(path)}, f)
+    return rows
+
+
+def _cache_meta(path, kind):
+    meta_path = os.path.join(_cache_dir(path), "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("version") != CACHE_VERSION or meta.get("kind") != kind or meta.get("source") != _source_stamp(path):
+        return None
+    return meta
+
+
+def load_trades(path, kind="trades", columns=None, cache=True):
+    """
+    Load a Binance trades/aggTrades CSV.
+
+    The first load converts the CSV into a columnar cache; later loads
+    memory-map the cached columns, so they are near-instant and only the
+    pages actually used are read. The cache is rebuilt if the CSV changes.
+
+    Args:
+        path (str): CSV file.
+        kind (str): 'trades' or 'agg_trades'.
+        columns (list, optional): Columns to load (all by default).
+        cache (bool): Use and create the columnar cache. If False the CSV is parsed each time.
+
+    Returns:
+        DataFrame: Typed columns, time in milliseconds since the epoch.
+    """
+    layout = LAYOUTS[kind]
+    columns = list(columns or layout)
+    if not cache:
+        return pd.concat([chunk[columns] for chunk in iter_trades(path, kind)], ignore_index=True)
+    meta = _cache_meta(path, kind)
+    if meta is None:
+        build_cache(path, kind)
+        meta = _cache_meta(path, kind)
+    data = {}
+    for name in columns:
+        if meta["rows"] == 0:
+            data[name] = np.empty(0, layout[name])
+        else:
+            data[name] = np.memmap(
+                os.path.join(_cache_dir(path), f"{name}.bin"), dtype=layout[name], mode="r", shape=(meta["rows"],)
+            )
+    return pd.DataFrame(data, copy=False)
+
+
+def _bars(trades, bucket):
+    """Aggregate trades into OHLCV bars over consecutive runs of equal bucket IDs."""
+    price = np.asarray(trades["price"], dtype=np.float64)
+    qty = np.asarray(trades["qty"], dtype=np.float64)
+    time_ms = np.asarray(trades["time"])
+    if len(price) == 0:
+        return pd.DataFrame(columns=["time", "open", "high", "low", "close", "volume", "vwap", "trades"])
+    starts = np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))
+    ends = np.concatenate((starts[1:], [len(price)])) - 1
+    volume = np.add.reduceat(qty, starts)
+    notional = np.add.reduceat(price * qty, starts)
+    return pd.DataFrame({
+        "time": time_ms[starts],
+        "open": price[starts],
+        "high": np.maximum.reduceat(price, starts),
+        "low": np.minimum.reduceat(price, starts),
+        "close": price[ends],
+        "volume": volume,
+        "vwap": np.divide(notional, volume, out=price[ends].copy(), where=volume > 0),
+        "trades": ends - starts + 1,
+    })
+
+
+def time_bars(trades, freq="1min"):
+    """
+    Resample time-ordered trades into OHLCV bars of a fixed duration.
+
+    Args:
+        trades (DataFrame): Output of load_trades (needs time, price and qty).
+        freq (str): Any pandas duration, e.g. '1s', '5min', '1h'.
+
+    Returns:
+        DataFrame: time (bar start, ms), open, high, low, close, volume, vwap, trades.
+            Bars with no trades are omitted.
+    """
+    width = int(pd.Timedelta(freq).total_seconds() * 1000)
+    bucket = np.asarray(trades["time"]) // width
+    bars = _bars(trades, bucket)
+    bars["time"] = bars["time"] // width * width
+    return bars
+
+
+def volume_bars(trades, volume, notional=False):
+    """
+    Group time-ordered trades into bars that each hold a fixed traded volume.
+
+    Args:
+        trades (DataFrame): Output of load_trades.
+        volume (float): Base quantity per bar, or quote value per bar if notional.
+        notional (bool): Measure bars in quote currency (dollar bars).
+
+    Returns:
+        DataFrame: As time_bars, with time the first trade of each bar.
+    """
+    qty = np.asarray(trades["qty"], dtype=np.float64)
+    if notional:
+        qty = qty * np.asarray(trades["price"], dtype=np.float64)
+    # A trade belongs to the bar its cumulative volume started in
+    bucket = (np.cumsum(qty) - qty) // volume
+    return _bars(trades, bucket)
+
+
+def asof_join(left, right, on="time", tolerance=None, suffixes=("_x", "_y")):
+    """
+    Attach to each row of left the last row of right at or before its timestamp.
+
+    Args:
+        left, right (DataFrame): Sorted by `on`.
+        on (str): Timestamp column.
+        tolerance (optional): Maximum age of the matched right row; older matches become NaN.
+        suffixes (tuple): Added to overlapping column names.
+
+    Returns:
+        DataFrame: left's rows with right's columns alongside.
+    """
+    left_ts = np.asarray(left[on])
+    right_ts = np.asarray(right[on])
+    index = np.searchsorted(right_ts, left_ts, side="right") - 1
+    valid = index >= 0
+    if tolerance is not None and len(right_ts):
+        valid &= left_ts - right_ts[np.maximum(index, 0)] <= tolerance
+    right = right.drop(columns=[on])
+    if len(right):
+        taken = right.iloc[np.maximum(index, 0)].reset_index(drop=True)
+        if not valid.all():
+            taken = taken.where(pd.Series(valid), other=np.nan)
+    else:
+        taken = pd.DataFrame(np.nan, index=range(len(left_ts)), columns=right.columns)
+    overlap = set(left.columns) & set(taken.columns)
+    left = left.reset_index(drop=True).rename(columns={c: c + suffixes[0] for c in overlap})
+    taken = taken.rename(columns={c: c + suffixes[1] for c in overlap})
+    return pd.concat([left, taken], axis=1)
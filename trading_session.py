@@ -0,0 +1,204 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from binance.client import Client
+from order_manager import CLOSED_ORDER_STATUSES, OrderManager
+from order_gateway import AsyncOrderManager, OrderGateway
+from rate_limiter import governor
+from symbol_registry import SymbolRegistry
+
+# Minimum seconds between background exchangeInfo requests started by get_filters
+REFRESH_INTERVAL = 60
+
+
+class TradingSession:
+    """
+    Long-lived trading state shared across ticks.
+
+    Owns a single Binance client (and therefore one pooled HTTP session),
+    holds the exchange filters of every symbol in a SymbolRegistry, and keeps
+    balances and open orders up to date from user data stream events (see
+    streamers.stream_user_data), so position and open-order queries are dict
+    lookups and REST is only read at startup and after a reconnect.
+    """
+
+    def __init__(self, client: Client, filter_ttl: float = 3600, gateway: OrderGateway = None,
+                 registry: SymbolRegistry = None):
+        """
+        Initialize the TradingSession.
+
+        Args:
+            client (Client): Binance API client, reused for every request.
+            filter_ttl (float): Seconds before symbol filters are refreshed, when no registry is given.
+            gateway (OrderGateway, optional): When given, orders are sent through
+                AsyncOrderManagers on this gateway instead of the blocking client.
+            registry (SymbolRegistry, optional): Symbol filters, e.g. with a disk cache
+                (see symbol_registry.default_cache_path). An in-memory one if None.
+        """
+        self.client = client
+        self.gateway = gateway
+        self.registry = registry or SymbolRegistry(ttl=filter_ttl)
+        self.balances = {}  # Asset -> {"free": float, "locked": float}
+        self.order_managers = {}  # Symbol -> OrderManager holding its open orders
+        self.fill_listeners = []
+        self._refreshed_at = None  # time.monotonic() of the last refresh_filters
+        self._refresh_executor = None  # Single thread for background refreshes, created on first use
+        self._refresh = None  # Future of the background refresh in flight
+
+    def order_manager(self, symbol: str):
+        """Return the OrderManager (or AsyncOrderManager) for a symbol, creating it on first use."""
+        if symbol not in self.order_managers:
+            filters = self.registry.get(symbol)
+            if self.gateway is not None:
+                self.order_managers[symbol] = AsyncOrderManager(self.gateway, symbol, filters=filters)
+            else:
+                self.order_managers[symbol] = OrderManager(self.client, symbol, filters=filters)
+        return self.order_managers[symbol]
+
+    def load_state(self, symbols):
+        """
+        Load balances and open orders from REST.
+
+        Only needed at startup or after the user data stream reconnects; in
+        between, state is maintained from stream events.
+
+        Args:
+            symbols (list): Trading pairs whose open orders should be loaded.
+        """
+        account_info = self.client.get_account()
+        self.balances = {
+            b["asset"]: {"free": float(b["free"]), "locked": float(b["locked"])}
+            for b in account_info["balances"]
+        }
+        for symbol in symbols:
+            open_orders = self.client.get_open_orders(symbol=symbol)
+            self.order_manager(symbol).active_orders = {order["orderId"]: order for order in open_orders}
+
+    def reconcile(self):
+        """Reload balances and the open orders of every traded symbol from REST, e.g. after a stream gap."""
+        self.load_state(list(self.order_managers))
+
+    def register_fill_listener(self, listener):
+        """
+        Register a callback for fills.
+
+        Args:
+            listener (callable): Called as listener(event) with every executionReport
+                whose execution type is TRADE, after the local state has been updated.
+        """
+        self.fill_listeners.append(listener)
+
+    def refresh_filters(self, force: bool = False):
+        """
+        Load filters for every symbol with a single exchangeInfo request.
+
+        Args:
+            force (bool): Fetch from the exchange even if the registry's disk cache is fresh.
+        """
+        self._refreshed_at = time.monotonic()
+        self.registry.load(self.client.get_exchange_info, force=force)
+        if self.registry.rate_limits:
+            governor.configure(self.registry.rate_limits)
+        for symbol, order_manager in self.order_managers.items():
+            order_manager.filters = self.registry.get(symbol)
+
+    def get_filters(self, symbol: str):
+        """
+        Return the price/quantity filters for a symbol.
+
+        Never blocks on REST: stale filters and unknown symbols start a bulk
+        reload in a background thread, at most once every REFRESH_INTERVAL
+        seconds, and the filters already loaded are served until it lands.
+        Call refresh_filters once at startup so the first lookup has filters.
+
+        Args:
+            symbol (str): The trading pair, e.g., 'BTCUSDT'.
+
+        Returns:
+            SymbolFilters: tick_size, step_size, min_qty and min_notional (also as
+                filters["tick_size"], ...), or None if not (yet) known.
+        """
+        filters = self.registry.get(symbol)
+        if filters is None or self.registry.is_stale():
+            self._refresh_in_background()
+            if filters is None and self.registry.fetched_at is not None:
+                print(f"Trading pair {symbol} not found on Binance.")
+        return filters
+
+    def _refresh_in_background(self):
+        if self._refresh is not None and not self._refresh.done():
+            return
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < REFRESH_INTERVAL:
+            return
+        # Set now so a failing refresh is not retried on every tick
+        self._refreshed_at = time.monotonic()
+        if self._refresh_executor is None:
+            self._refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="filters")
+        self._refresh = self._refresh_executor.submit(self._background_refresh, self.registry.fetched_at is not None)
+
+    def _background_refresh(self, force):
+        try:
+            self.refresh_filters(force=force)
+        except Exception as e:
+            print(f"Error refreshing symbol filters: {e}")
+
+    def get_position(self, symbol: str):
+        """
+        Return the locally tracked position for a trading pair.
+
+        Returns:
+            dict: Position details (free and locked amounts) for base and quote assets.
+        """
+        filters = self.registry.get(symbol)
+        if filters is not None and filters.base_asset:
+            base_asset, quote_asset = filters.base_asset, filters.quote_asset
+        else:
+            base_asset, quote_asset = symbol[:-4], symbol[-4:]
+        empty = {"free": 0, "locked": 0}
+        return {
+            "base": self.balances.get(base_asset, empty),
+            "quote": self.balances.get(quote_asset, empty),
+        }
+
+    def get_active_orders(self, symbol: str):
+        """Return the locally tracked open orders for a trading pair."""
+        return list(self.order_manager(symbol).active_orders.values())
+
+    def get_order(self, symbol: str, order_id):
+        """Return a locally tracked open order by ID, or None if it is not open."""
+        order_manager = self.order_managers.get(symbol)
+        return order_manager.active_orders.get(order_id) if order_manager is not None else None
+
+    def handle_user_event(self, event):
+        """Apply a user data stream event to the local state."""
+        event_type = event.get("e")
+        if event_type == "executionReport":
+            self._apply_execution_report(event)
+        elif event_type == "outboundAccountPosition":
+            for balance in event["B"]:
+                self.balances[balance["a"]] = {"free": float(balance["f"]), "locked": float(balance["l"])}
+
+    def _apply_execution_report(self, event):
+        order_manager = self.order_manager(event["s"])
+        order_id = event["i"]
+        if event["X"] in CLOSED_ORDER_STATUSES:
+            order_manager.order_closed(order_id)
+        else:
+            # Same layout as the REST open orders so callers can treat them alike
+            order_manager.update_order({
+                "symbol": event["s"],
+                "orderId": order_id,
+                "clientOrderId": event["c"],
+                "price": event["p"],
+                "origQty": event["q"],
+                "executedQty": event["z"],
+                "status": event["X"],
+                "timeInForce": event["f"],
+                "type": event["o"],
+                "side": event["S"],
+            })
+        if event.get("x") == "TRADE":
+            for listener in self.fill_listeners:
+                try:
+                    listener(event)
+                except Exception as e:
+                    print(f"Error in fill listener: {e}")
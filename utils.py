@@ -1,11 +1,19 @@
 from binance.client import Client
+from rate_limiter import governor
+from symbol_registry import SymbolRegistry, format_decimal
 
 API_KEY = None
 API_SECRET = None
+_registry = SymbolRegistry()  # Shared by get_tick_size
 
 def load_api_keys(env):
     """Load API keys from the secrets file."""
     global API_KEY, API_SECRET
+    if env == "sim":
+        # The local simulator accepts any key
+        API_KEY = API_SECRET = "sim"
+        return API_KEY, API_SECRET
+
     secrets_file = "binance_secrets.txt"
     keys = {}
 
@@ -24,36 +32,65 @@ def load_api_keys(env):
     return API_KEY, API_SECRET
 
 
-def get_tick_size(client, trading_pair):
+def create_client(env, api_key, api_secret, base_url=None):
+    """
+    Create a python-binance Client for an environment.
+
+    Args:
+        env (str): 'testnet', 'real' or 'sim'.
+        api_key (str): Binance API key.
+        api_secret (str): Binance API secret.
+        base_url (str, optional): REST base URL from ConfigManager, needed for 'sim'.
+
+    Returns:
+        binance.client.Client: The client, throttled by the shared rate-limit governor.
+    """
+    if env == "sim":
+        # Skip the connectivity ping until the client points at the simulator
+        client = Client(api_key, api_secret, ping=False)
+        client.API_URL = base_url
+    else:
+        client = Client(api_key, api_secret, testnet=(env == "testnet"))
+    governor.mount(client.session)
+    return client
+
+
+def get_tick_size(client, trading_pair, registry=None):
     """
     Get the tick size for a given trading pair on Binance.
 
     Args:
         client (binance.client.Client): The initialized Binance client.
         trading_pair (str): The trading pair (e.g., "BTCUSDT").
+        registry (SymbolRegistry, optional): Where filters are looked up; a shared
+            in-memory one, loaded with a single exchangeInfo request, if None.
 
     Returns:
         float: The tick size for the trading pair.
     """
+    registry = registry or _registry
     try:
-        # Fetch symbol information from Binance API
-        symbol_info = client.get_symbol_info(trading_pair)
-        if not symbol_info:
+        if registry.is_stale():
+            registry.load(client.get_exchange_info)
+        filters = registry.get(trading_pair)
+        if filters is None:
             raise ValueError(f"Trading pair {trading_pair} not found on Binance.")
-        
-        # Extract the tick size from the PRICE_FILTER
-        for filter in symbol_info["filters"]:
-            if filter["filterType"] == "PRICE_FILTER":
-                return float(filter["tickSize"])
-
-        # If no PRICE_FILTER is found, raise an exception
-        raise ValueError(f"No PRICE_FILTER found for trading pair {trading_pair}.")
+        return filters.tick_size
 
     except Exception as e:
         print(f"Error fetching tick size: {e}")
         return None
 
 
-def format_price(price, precision=6):
-    """Format price to show a fixed number of decimal places."""
+def format_price(price, precision=None):
+    """
+    Format a price for display or an order request.
+
+    Args:
+        price (float): The price.
+        precision (int, optional): Fixed number of decimal places. If None, exactly
+            the decimals the value has (use SymbolFilters.format_price for order prices).
+    """
+    if precision is None:
+        return format_decimal(price)
     return f"{price:.{precision}f}"
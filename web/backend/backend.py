@@ -2,7 +2,6 @@ import asyncio
 import argparse
 import logging
 import websockets
-import json
 import sys
 import os
 from urllib.parse import urlparse, parse_qs
@@ -10,8 +9,10 @@ from urllib.parse import urlparse, parse_qs
 # Add the root directory to the Python module path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
-from streamers import stream_book_ticker, stream_depth
+from stream_multiplexer import StreamMultiplexer
 from data_manager import DataManager
+from broadcaster import BookBroadcaster, ENCODINGS, PROTOCOL_DELTA, PROTOCOL_FULL
+from shared_book import SharedBookReader, default_prefix
 
 # Initialize the logger
 logging.basicConfig(level=logging.DEBUG)
@@ -19,72 +20,86 @@ logging.basicConfig(level=logging.DEBUG)
 # Data manager instances for managing data per pair
 data_managers = {}
 
-# WebSocket clients
-websocket_clients = {}
-
-
-async def broadcast_order_book(pair):
-    """Broadcast the latest order book to all connected WebSocket clients for the given trading pair."""
-    while True:
-        if pair in websocket_clients and websocket_clients[pair]:
-            data_manager = data_managers.get(pair)
-            if data_manager and data_manager.top_of_book and data_manager.order_book_depth:
-                message = {
-                    "top_of_book": data_manager.top_of_book,
-                    "order_book_depth": data_manager.order_book_depth,
-                }
-                disconnected_clients = set()
-                for client in websocket_clients[pair]:
-                    try:
-                        await client.send(json.dumps(message))
-                    except websockets.exceptions.ConnectionClosed:
-                        logging.warning(f"A WebSocket client disconnected for pair: {pair}")
-                        disconnected_clients.add(client)
-                websocket_clients[pair].difference_update(disconnected_clients)
-        await asyncio.sleep(0.1)  # Broadcast every 100ms
-
-
-async def websocket_handler(websocket, path):
+# Broadcasters fanning each pair out to its WebSocket clients
+broadcasters = {}
+
+# Shared upstream connections for every pair, created in main()
+multiplexer = None
+default_pair = None
+
+# Segment prefix of a shared_book.py daemon to read from instead of Binance, set in main()
+shared_book_prefix = None
+# Pair -> (SharedBookReader, task feeding it into the pair's DataManager)
+shared_book_feeds = {}
+
+# Number of price levels per side sent to the frontend
+BROADCAST_DEPTH = 20
+# Minimum seconds between broadcasts of a pair
+BROADCAST_INTERVAL = 0.05
+
+
+async def websocket_handler(websocket):
     """Handle incoming WebSocket connections."""
-    query = parse_qs(urlparse(path).query)
+    query = parse_qs(urlparse(websocket.request.path).query)
     pair = query.get("pair", ["BTCUSDT"])[0].upper()  # Default to BTCUSDT
+    # ?proto=2 selects snapshot + delta messages, &encoding=binary their compact form
+    protocol = query.get("proto", [str(PROTOCOL_FULL)])[0]
+    encoding = query.get("encoding", ["json"])[0]
+    if protocol not in (str(PROTOCOL_FULL), str(PROTOCOL_DELTA)) or encoding not in ENCODINGS:
+        await websocket.close(code=1008, reason="Unsupported protocol or encoding")
+        return
 
-    logging.info(f"New WebSocket client connected for pair: {pair}")
-
-    # Add the client to the set for this trading pair
-    if pair not in websocket_clients:
-        websocket_clients[pair] = set()
-    websocket_clients[pair].add(websocket)
+    logging.info(f"New WebSocket client connected for pair: {pair} (protocol {protocol}, {encoding})")
 
-    # Ensure a DataManager exists for the pair
+    # Ensure the pair is subscribed upstream
     if pair not in data_managers:
-        data_managers[pair] = DataManager()
-        asyncio.create_task(start_binance_streams(pair))
+        try:
+            await add_pair(pair)
+        except FileNotFoundError:
+            logging.warning(f"Pair {pair} is not published by the shared book daemon")
+            await websocket.close(code=1008, reason="Pair not available")
+            return
+    broadcaster = broadcasters[pair]
+    broadcaster.add_client(websocket, int(protocol), encoding)
 
     try:
         while True:
-            await websocket.recv()  # Keep connection alive
+            # Keep the connection alive and answer resync requests
+            broadcaster.handle_client_message(websocket, await websocket.recv())
     except websockets.exceptions.ConnectionClosed:
         logging.warning(f"WebSocket connection closed for pair: {pair}")
     finally:
-        websocket_clients[pair].remove(websocket)
-
-
-async def start_binance_streams(pair):
-    """Start Binance WebSocket streams for the given trading pair."""
-    env = "testnet"  # Modify this if needed for real environment
-    from config_manager import ConfigManager
-    config_manager = ConfigManager()
-    config = config_manager.get_config(env)
-
-    data_manager = data_managers[pair]
-    logging.info(f"Starting Binance WebSocket streams for pair: {pair}")
-
-    await asyncio.gather(
-        stream_book_ticker(config["ws_url"], pair.lower(), data_manager),
-        stream_depth(config["ws_url"], pair.lower(), data_manager),
-        broadcast_order_book(pair),
-    )
+        broadcaster.remove_client(websocket)
+        # Drop upstream streams nobody is watching any more
+        if not broadcaster.clients and pair != default_pair and broadcasters.get(pair) is broadcaster:
+            await remove_pair(pair)
+
+
+async def add_pair(pair):
+    """Subscribe to Binance streams for the given trading pair and start broadcasting it."""
+    logging.info(f"Subscribing to Binance streams for pair: {pair}")
+    # Raises FileNotFoundError before any state is created if the daemon does not publish the pair
+    reader = SharedBookReader(pair, shared_book_prefix) if shared_book_prefix is not None else None
+    data_managers[pair] = DataManager()
+    broadcasters[pair] = BookBroadcaster(data_managers[pair], BROADCAST_DEPTH, BROADCAST_INTERVAL)
+    broadcasters[pair].start()
+    if reader is not None:
+        shared_book_feeds[pair] = (reader, asyncio.create_task(reader.feed(data_managers[pair], BROADCAST_DEPTH)))
+    else:
+        await multiplexer.add_symbol(pair, data_managers[pair])
+
+
+async def remove_pair(pair):
+    """Unsubscribe from Binance streams for the given trading pair."""
+    logging.info(f"Unsubscribing from Binance streams for pair: {pair}")
+    broadcasters.pop(pair).stop()
+    del data_managers[pair]
+    if pair in shared_book_feeds:
+        reader, task = shared_book_feeds.pop(pair)
+        task.cancel()
+        reader.close()
+    else:
+        await multiplexer.remove_symbol(pair)
 
 
 async def main():
@@ -92,8 +107,8 @@ async def main():
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Binance Order Book Viewer (WebSocket)")
     parser.add_argument(
-        "--env", choices=["testnet", "real"], default="testnet",
-        help="Specify the environment: 'testnet' or 'real' (default: testnet)"
+        "--env", choices=["testnet", "real", "sim"], default="testnet",
+        help="Specify the environment: 'testnet', 'real' or 'sim' (default: testnet)"
     )
     parser.add_argument(
         "--pair", default="BTCUSDT", help="Default trading pair to monitor (e.g., DOGEUSDT)"
@@ -101,6 +116,10 @@ async def main():
     parser.add_argument(
         "--ws-port", type=int, default=8765, help="Port for the WebSocket server (default: 8765)"
     )
+    parser.add_argument(
+        "--shared-book", action="store_true",
+        help="Read books from a running shared_book.py daemon instead of connecting to Binance"
+    )
     args = parser.parse_args()
 
     # Get configuration for the environment
@@ -108,21 +127,18 @@ async def main():
     config_manager = ConfigManager()
     config = config_manager.get_config(args.env)
 
-    # Create a DataManager for the default pair and start Binance streams
+    # All pairs share a few combined-stream connections upstream
+    global multiplexer, default_pair, shared_book_prefix
+    multiplexer = StreamMultiplexer(config["stream_url"], config["base_url"])
+    if args.shared_book:
+        shared_book_prefix = default_prefix(args.env)
     default_pair = args.pair.upper()
-    data_managers[default_pair] = DataManager()
-    asyncio.create_task(start_binance_streams(default_pair))
+    await add_pair(default_pair)
 
     # Start WebSocket server
-    websocket_server = websockets.serve(websocket_handler, "0.0.0.0", args.ws_port)
-    logging.info(f"WebSocket server running on port {args.ws_port}")
-
-    # Start the Binance WebSocket streams and WebSocket server
-    await asyncio.gather(
-        websocket_server,
-        stream_book_ticker(config["ws_url"], default_pair.lower(), data_managers[default_pair]),
-        stream_depth(config["ws_url"], default_pair.lower(), data_managers[default_pair]),
-    )
+    async with websockets.serve(websocket_handler, "0.0.0.0", args.ws_port):
+        logging.info(f"WebSocket server running on port {args.ws_port}")
+        await asyncio.Future()  # Serve until cancelled
 
 
 if __name__ == "__main__":
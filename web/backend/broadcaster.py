@@ -0,0 +1,278 @@
+import asyncio
+import json
+import logging
+import struct
+from collections import deque
+
+from websockets.exceptions import ConnectionClosed
+
+# Top-of-book fields the frontend displays; update IDs and timestamps are left out
+# so that an unchanged book produces an identical message
+TOP_OF_BOOK_FIELDS = ("symbol", "best_bid_price", "best_bid_qty", "best_ask_price", "best_ask_qty")
+
+# Wire protocols: 1 sends the full book every time, 2 sends a snapshot then changed levels
+PROTOCOL_FULL = 1
+PROTOCOL_DELTA = 2
+ENCODINGS = ("json", "binary")
+
+# Protocol 2 message types
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+
+# Binary protocol 2 frame, little-endian:
+#   header  uint8 version, uint8 type (0 snapshot, 1 delta), uint8 flags, pad,
+#           uint32 seq, uint16 bid levels, uint16 ask levels
+#   [flags & 1] float64 best bid price, best bid qty, best ask price, best ask qty
+#   levels  float64 (price, qty) pairs, bids then asks; qty 0 removes the level
+BINARY_HEADER = "<BBBxIHH"
+BINARY_TYPES = {SNAPSHOT: 0, DELTA: 1}
+FLAG_TOP_OF_BOOK = 1
+TOP_OF_BOOK_BINARY = ("best_bid_price", "best_bid_qty", "best_ask_price", "best_ask_qty")
+SEQ_MODULO = 1 << 32
+
+
+def encode_json(message):
+    return json.dumps(message, separators=(",", ":"))
+
+
+def encode_binary(message):
+    """Pack a protocol 2 message into the binary frame described above."""
+    top_of_book = message.get("top_of_book")
+    flags = FLAG_TOP_OF_BOOK if top_of_book else 0
+    bids, asks = message["bids"], message["asks"]
+    values = [top_of_book.get(field, 0.0) for field in TOP_OF_BOOK_BINARY] if top_of_book else []
+    for price, qty in bids:
+        values += (price, qty)
+    for price, qty in asks:
+        values += (price, qty)
+    return struct.pack(
+        f"{BINARY_HEADER}{len(values)}d",
+        PROTOCOL_DELTA, BINARY_TYPES[message["type"]], flags, message["seq"], len(bids), len(asks), *values,
+    )
+
+
+ENCODERS = {"json": encode_json, "binary": encode_binary}
+
+
+def diff_levels(old, new):
+    """
+    Return the (price, qty) changes turning one {price: qty} side into another.
+
+    Levels that disappeared are reported with quantity 0.
+    """
+    changes = [(price, qty) for price, qty in new.items() if old.get(price) != qty]
+    changes += [(price, 0.0) for price in old if price not in new]
+    return changes
+
+
+class ClientChannel:
+    """
+    One websocket client with a bounded outbound buffer drained by its own task.
+
+    Full-book (protocol 1) clients that fall behind lose their oldest buffered
+    messages, so they always receive the newest book. Delta (protocol 2)
+    clients cannot skip a delta, so on overflow their buffer is discarded and
+    they are sent a fresh snapshot instead. A client whose send stalls for
+    longer than send_timeout is disconnected.
+    """
+
+    def __init__(self, websocket, max_pending=4, send_timeout=5.0, on_close=None,
+                 protocol=PROTOCOL_FULL, encoding="json"):
+        """
+        Args:
+            websocket: The client connection.
+            max_pending (int): Messages buffered before the client counts as lagging.
+            send_timeout (float): Seconds a single send may take before the client is dropped.
+            on_close (callable, optional): Called with this channel once its sender stops.
+            protocol (int): PROTOCOL_FULL or PROTOCOL_DELTA.
+            encoding (str): 'json' or 'binary' (protocol 2 only).
+        """
+        self.websocket = websocket
+        self.send_timeout = send_timeout
+        self.on_close = on_close
+        self.protocol = protocol
+        self.encoding = encoding
+        self.pending = deque(maxlen=max_pending)
+        self.dropped = 0
+        self.needs_snapshot = protocol == PROTOCOL_DELTA
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def offer(self, message):
+        """Buffer a serialized message without waiting for the client."""
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+            if self.protocol == PROTOCOL_DELTA:
+                # Skipping a delta would corrupt the client's book; start over from a snapshot
+                self.pending.clear()
+                self.needs_snapshot = True
+                return
+        self.pending.append(message)
+        self._ready.set()
+
+    def close(self):
+        """Stop sending to the client."""
+        self._task.cancel()
+
+    async def _run(self):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self.pending:
+                    await asyncio.wait_for(self.websocket.send(self.pending.popleft()), self.send_timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Dropping slow WebSocket client {self.websocket.remote_address} "
+                            f"({self.dropped} messages skipped)")
+            await self.websocket.close(code=1013, reason="Client too slow")
+        except ConnectionClosed:
+            pass
+        finally:
+            if self.on_close is not None:
+                self.on_close(self)
+
+
+class BookBroadcaster:
+    """
+    Fans one pair's order book out to its WebSocket clients.
+
+    Driven by DataManager updates rather than a poll: each change is serialized
+    once per wire format in use, skipped if the book the clients see has not
+    changed, and handed to every client's ClientChannel so a slow client never
+    delays the others.
+
+    Protocol 2 clients get a snapshot and then, for every update, only the
+    levels that changed, numbered with a sequence so a client that sees a gap
+    can ask for a new snapshot with {"type": "resync"}.
+    """
+
+    def __init__(self, data_manager, depth=20, min_interval=None, max_pending=4, send_timeout=5.0):
+        """
+        Args:
+            data_manager (DataManager): Source of the pair's updates.
+            depth (int): Price levels per side sent to clients.
+            min_interval (float, optional): Minimum seconds between broadcasts.
+            max_pending (int): Per-client buffer size, see ClientChannel.
+            send_timeout (float): Per-send timeout, see ClientChannel.
+        """
+        self.data_manager = data_manager
+        self.depth = depth
+        self.min_interval = min_interval
+        self.max_pending = max_pending
+        self.send_timeout = send_timeout
+        self.clients = {}  # Websocket -> ClientChannel
+        self.seq = 0
+        self.top_of_book = {}
+        self.bids = {}  # Price -> qty of the levels clients currently hold
+        self.asks = {}
+        self.last_message = None
+        self.last_payload = None
+        self._snapshots = {}  # Encoding -> snapshot payload at the current seq
+        self._started = False
+
+    def start(self):
+        """Start listening for updates."""
+        if not self._started:
+            self.data_manager.register_listener(self.on_update, min_interval=self.min_interval)
+            self._started = True
+
+    def stop(self):
+        """Stop listening and disconnect the senders."""
+        if self._started:
+            self.data_manager.unregister_listener(self.on_update)
+            self._started = False
+        for channel in list(self.clients.values()):
+            channel.close()
+        self.clients.clear()
+
+    def add_client(self, websocket, protocol=PROTOCOL_FULL, encoding="json"):
+        """Start sending to a client, beginning with the current book."""
+        if protocol not in (PROTOCOL_FULL, PROTOCOL_DELTA):
+            raise ValueError(f"Unsupported protocol version: {protocol}")
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+        channel = ClientChannel(websocket, self.max_pending, self.send_timeout, self._channel_closed,
+                                protocol, encoding)
+        self.clients[websocket] = channel
+        self._send_current(channel)
+
+    def remove_client(self, websocket):
+        """Stop sending to a client."""
+        channel = self.clients.pop(websocket, None)
+        if channel is not None:
+            channel.close()
+
+    def handle_client_message(self, websocket, raw):
+        """Act on a message from a client; only {"type": "resync"} is understood."""
+        channel = self.clients.get(websocket)
+        if channel is None or channel.protocol != PROTOCOL_DELTA:
+            return
+        try:
+            request = json.loads(raw)
+        except (TypeError, ValueError):
+            return
+        if isinstance(request, dict) and request.get("type") == "resync":
+            channel.pending.clear()
+            channel.needs_snapshot = True
+            self._send_current(channel)
+
+    def build_message(self, top_of_book, order_book_depth):
+        """Return the protocol 1 message clients receive for the current book."""
+        return {
+            "top_of_book": {field: top_of_book[field] for field in TOP_OF_BOOK_FIELDS if field in top_of_book},
+            "order_book_depth": order_book_depth.to_dict(self.depth),
+        }
+
+    def on_update(self, top_of_book, order_book_depth):
+        """DataManager listener: serialize once per format and queue for every client."""
+        if not top_of_book or not len(order_book_depth):
+            return
+        message = self.build_message(top_of_book, order_book_depth)
+        if message == self.last_message:
+            return  # Nothing the clients can see has changed
+        self.last_message = message
+        self.last_payload = json.dumps(message)
+
+        # Work out what changed since the last broadcast
+        depth = message["order_book_depth"]
+        bids, asks = dict(depth["bids"]), dict(depth["asks"])
+        delta = {"v": PROTOCOL_DELTA, "type": DELTA, "seq": (self.seq + 1) % SEQ_MODULO,
+                 "bids": diff_levels(self.bids, bids), "asks": diff_levels(self.asks, asks)}
+        if message["top_of_book"] != self.top_of_book:
+            delta["top_of_book"] = message["top_of_book"]
+        self.seq = delta["seq"]
+        self.top_of_book, self.bids, self.asks = message["top_of_book"], bids, asks
+        self._snapshots.clear()
+
+        deltas = {}
+        for channel in self.clients.values():
+            if channel.protocol == PROTOCOL_FULL:
+                channel.offer(self.last_payload)
+            elif channel.needs_snapshot:
+                self._send_current(channel)
+            else:
+                if channel.encoding not in deltas:
+                    deltas[channel.encoding] = ENCODERS[channel.encoding](delta)
+                channel.offer(deltas[channel.encoding])
+
+    def snapshot(self, encoding="json"):
+        """Return the protocol 2 snapshot of the current book, serialized once per seq."""
+        if encoding not in self._snapshots:
+            self._snapshots[encoding] = ENCODERS[encoding]({
+                "v": PROTOCOL_DELTA, "type": SNAPSHOT, "seq": self.seq, "top_of_book": self.top_of_book,
+                "bids": list(self.bids.items()), "asks": list(self.asks.items()),
+            })
+        return self._snapshots[encoding]
+
+    def _send_current(self, channel):
+        if self.last_message is None:
+            return  # Nothing to send until the first update arrives
+        if channel.protocol == PROTOCOL_FULL:
+            channel.offer(self.last_payload)
+        else:
+            channel.needs_snapshot = False
+            channel.offer(self.snapshot(channel.encoding))
+
+    def _channel_closed(self, channel):
+        if self.clients.get(channel.websocket) is channel:
+            del self.clients[channel.websocket]
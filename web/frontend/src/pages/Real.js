@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState } from "react";
 import {
     Typography,
     Box,
@@ -13,25 +13,12 @@ import {
     TextField,
     Button,
 } from "@mui/material";
+import useOrderBook from "../useOrderBook";
 
 const Testnet = () => {
     const [pair, setPair] = useState("BTCUSDT"); // Default market
     const [searchInput, setSearchInput] = useState("");
-    const [orderBook, setOrderBook] = useState({
-        top_of_book: {},
-        order_book_depth: { bids: [], asks: [] },
-    });
-
-    useEffect(() => {
-        const ws = new WebSocket(`ws://localhost:8766?pair=${pair}`); // Pass the selected pair to the backend
-
-        ws.onmessage = (event) => {
-            const data = JSON.parse(event.data);
-            setOrderBook(data);
-        };
-
-        return () => ws.close();
-    }, [pair]); // Reconnect WebSocket when the pair changes
+    const orderBook = useOrderBook(8766, pair); // Snapshot + delta stream from the backend
 
     const handleSearchSubmit = () => {
         if (searchInput.trim()) {
@@ -115,8 +102,8 @@ const Testnet = () => {
                                     </TableRow>
                                 </TableHead>
                                 <TableBody>
-                                    {order_book_depth.bids.map((bid, index) => (
-                                        <TableRow key={index}>
+                                    {order_book_depth.bids.map((bid) => (
+                                        <TableRow key={bid[0]}>
                                             <TableCell align="center">{bid[1]}</TableCell>
                                             <TableCell align="center">{bid[0]}</TableCell>
                                         </TableRow>
@@ -140,8 +127,8 @@ const Testnet = () => {
                                     </TableRow>
                                 </TableHead>
                                 <TableBody>
-                                    {order_book_depth.asks.map((ask, index) => (
-                                        <TableRow key={index}>
+                                    {order_book_depth.asks.map((ask) => (
+                                        <TableRow key={ask[0]}>
                                             <TableCell align="center">{ask[0]}</TableCell>
                                             <TableCell align="center">{ask[1]}</TableCell>
                                         </TableRow>
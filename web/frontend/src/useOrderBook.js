@@ -0,0 +1,117 @@
+import { useState, useEffect } from "react";
+
+// Protocol 2: one snapshot, then only the price levels that changed (see web/backend/broadcaster.py)
+const PROTOCOL = 2;
+const ENCODING = "binary";
+const HEADER_BYTES = 12;
+const FLAG_TOP_OF_BOOK = 1;
+const SEQ_MODULO = 2 ** 32;
+
+const emptyBook = {
+    top_of_book: {},
+    order_book_depth: { bids: [], asks: [] },
+};
+
+// Decode a binary protocol 2 frame into the same shape as the JSON messages
+const decodeBinary = (buffer) => {
+    const view = new DataView(buffer);
+    const type = view.getUint8(1) === 0 ? "snapshot" : "delta";
+    const flags = view.getUint8(2);
+    const seq = view.getUint32(4, true);
+    const bidCount = view.getUint16(8, true);
+    const askCount = view.getUint16(10, true);
+    let offset = HEADER_BYTES;
+    const next = () => {
+        const value = view.getFloat64(offset, true);
+        offset += 8;
+        return value;
+    };
+    const message = { type, seq };
+    if (flags & FLAG_TOP_OF_BOOK) {
+        message.top_of_book = {
+            best_bid_price: next(),
+            best_bid_qty: next(),
+            best_ask_price: next(),
+            best_ask_qty: next(),
+        };
+    }
+    const readLevels = (count) => Array.from({ length: count }, () => [next(), next()]);
+    message.bids = readLevels(bidCount);
+    message.asks = readLevels(askCount);
+    return message;
+};
+
+// Apply (price, qty) changes to a Map of levels; qty 0 removes the level
+const applyLevels = (levels, changes) => {
+    for (const [price, qty] of changes) {
+        if (qty === 0) {
+            levels.delete(price);
+        } else {
+            levels.set(price, qty);
+        }
+    }
+};
+
+const sortedLevels = (levels, descending) =>
+    Array.from(levels.entries()).sort((a, b) => (descending ? b[0] - a[0] : a[0] - b[0]));
+
+// Subscribe to a pair on the backend and keep a local copy of its order book
+const useOrderBook = (port, pair) => {
+    const [orderBook, setOrderBook] = useState(emptyBook);
+
+    useEffect(() => {
+        const ws = new WebSocket(`ws://localhost:${port}?pair=${pair}&proto=${PROTOCOL}&encoding=${ENCODING}`);
+        ws.binaryType = "arraybuffer";
+
+        const bids = new Map();
+        const asks = new Map();
+        let topOfBook = {};
+        let seq = null;
+        let frame = null;
+
+        // Re-render at most once per animation frame however many messages arrive
+        const render = () => {
+            frame = null;
+            setOrderBook({
+                top_of_book: topOfBook,
+                order_book_depth: { bids: sortedLevels(bids, true), asks: sortedLevels(asks, false) },
+            });
+        };
+
+        ws.onmessage = (event) => {
+            const message = typeof event.data === "string" ? JSON.parse(event.data) : decodeBinary(event.data);
+            if (message.type === "snapshot") {
+                bids.clear();
+                asks.clear();
+            } else if (seq === null) {
+                return; // Still waiting for the snapshot
+            } else if (message.seq !== (seq + 1) % SEQ_MODULO) {
+                // Missed a delta: drop the book and ask for a fresh snapshot
+                seq = null;
+                ws.send(JSON.stringify({ type: "resync" }));
+                return;
+            }
+            seq = message.seq;
+            if (message.top_of_book) {
+                topOfBook = message.top_of_book;
+            }
+            applyLevels(bids, message.bids);
+            applyLevels(asks, message.asks);
+            if (frame === null) {
+                frame = requestAnimationFrame(render);
+            }
+        };
+
+        return () => {
+            if (frame !== null) {
+                cancelAnimationFrame(frame);
+            }
+            ws.close();
+            setOrderBook(emptyBook);
+        };
+    }, [port, pair]); // Reconnect WebSocket when the pair changes
+
+    return orderBook;
+};
+
+export default useOrderBook;
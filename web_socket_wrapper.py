@@ -1,23 +1,28 @@
 import websockets
-import json
+from decoders import loads
 
 
 class BinanceWebSocket:
     """WebSocket handler for Binance."""
 
-    def __init__(self, ws_url, symbol):
+    def __init__(self, ws_url, symbol=None):
+        self.ws_url = ws_url
         self.book_ticker_url = f"{ws_url}/{symbol}@bookTicker"
-        self.depth_url = f"{ws_url}/{symbol}@depth20@100ms"
+        self.depth_url = f"{ws_url}/{symbol}@depth@100ms"
 
     async def connect_book_ticker(self):
         """Establish a WebSocket connection for @bookTicker."""
         return await websockets.connect(self.book_ticker_url)
 
     async def connect_depth(self):
-        """Establish a WebSocket connection for @depth."""
+        """Establish a WebSocket connection for the @depth diff stream."""
         return await websockets.connect(self.depth_url)
 
-    async def receive_message(self, websocket):
-        """Receive a message from a WebSocket."""
+    async def connect_user_data(self, listen_key):
+        """Establish a WebSocket connection for the user data stream."""
+        return await websockets.connect(f"{self.ws_url}/{listen_key}")
+
+    async def receive_message(self, websocket, decode=loads):
+        """Receive a message from a WebSocket and decode it (generic JSON by default)."""
         message = await websocket.recv()
-        return json.loads(message)
+        return decode(message)